@@ -0,0 +1,169 @@
+"""Seeded synthetic museum datasets for benchmarks.
+
+Visits follow a seasonal pattern (summer and December peaks, busier weekends)
+and a skewed popularity across exhibits and visitors, so GROUP BY / ORDER BY
+queries see realistic cardinalities.
+"""
+from __future__ import annotations
+
+import csv
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from dal import repositories as repo
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    visits: int
+    visitors: int
+    exhibits: int
+    artefacts: int
+    years: int = 3
+    feedback_ratio: float = 0.05       # feedback rows per visit
+    ticket_ratio: float = 0.3          # ticket purchases per visit
+    conservation_per_artefact: float = 1.5
+
+SCALES: dict[str, DatasetSpec] = {
+    "tiny": DatasetSpec(visits=10_000, visitors=2_000, exhibits=20, artefacts=2_000),
+    "small": DatasetSpec(visits=100_000, visitors=20_000, exhibits=50, artefacts=20_000),
+    "medium": DatasetSpec(visits=1_000_000, visitors=150_000, exhibits=150, artefacts=100_000),
+    "large": DatasetSpec(visits=10_000_000, visitors=1_000_000, exhibits=400, artefacts=400_000),
+}
+
+# Relative visitor volume per calendar month (Jan..Dec) and weekday (Mon..Sun)
+MONTH_WEIGHTS = [0.6, 0.65, 0.8, 1.0, 1.05, 1.2, 1.55, 1.6, 1.0, 0.9, 0.8, 1.15]
+WEEKDAY_WEIGHTS = [0.7, 0.75, 0.8, 0.85, 1.0, 1.6, 1.5]
+
+REGIONS = ["North", "South", "East", "West", "Midlands", "Scotland", "Wales", "Overseas"]
+AGE_BANDS = ["0-17", "18-24", "25-34", "35-49", "50-64", "65+"]
+MEMBERSHIPS = ["Standard", "Student", "Member", "Concession"]
+MATERIALS = ["Clay", "Bronze", "Iron", "Silver", "Gold", "Wood", "Textile", "Glass", "Stone", "Paper"]
+CONDITIONS = ["Good", "Fair", "Poor", "Critical"]
+TICKET_PRICES = {"Adult": 18.0, "Student": 9.0, "Member": 0.0, "Concession": 12.5}
+
+CHUNK = 50_000
+
+def _skewed_cum_weights(n: int, exponent: float) -> list[float]:
+    # Zipf-like popularity: item k gets weight 1 / k**exponent
+    return list(itertools.accumulate(1.0 / (k ** exponent) for k in range(1, n + 1)))
+
+def _day_cum_weights(start: date, days: int) -> tuple[list[date], list[float]]:
+    all_days = [start + timedelta(days=i) for i in range(days)]
+    weights = [MONTH_WEIGHTS[d.month - 1] * WEEKDAY_WEIGHTS[d.weekday()] for d in all_days]
+    return all_days, list(itertools.accumulate(weights))
+
+def _chunks(total: int, size: int = CHUNK):
+    """Yield (offset, count) pairs covering range(total)."""
+    for offset in range(0, total, size):
+        yield offset, min(size, total - offset)
+
+def generate_dataset(session: Session, spec: DatasetSpec, seed: int = 7, today: date | None = None) -> dict[str, int]:
+    """Populate an empty schema with a synthetic dataset; returns row counts per table.
+
+    All visit dates fall in the `spec.years` years before today, so the
+    no-future-visits trigger is respected. Commits after every chunk.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today - timedelta(days=365 * spec.years)
+    days, day_weights = _day_cum_weights(start, (today - start).days)  # up to yesterday
+
+    span = (today - start).days
+    exhibits = []
+    for i in range(spec.exhibits):
+        opened = start + timedelta(days=rng.randrange(0, span))
+        closes = None if rng.random() < 0.5 else opened + timedelta(days=rng.randrange(30, 720))
+        exhibits.append({"title": f"Exhibit {i + 1:04d}", "start_date": opened, "end_date": closes})
+    repo.create_exhibits_bulk(session, exhibits)
+    session.commit()
+
+    for offset, n in _chunks(spec.visitors):
+        repo.create_visitors_bulk(session, [
+            {
+                "full_name": f"Visitor {i + 1}",
+                "email": f"visitor{i + 1}@example.org",
+                "age_band": rng.choice(AGE_BANDS),
+                "region": rng.choice(REGIONS),
+                "membership_type": rng.choice(MEMBERSHIPS),
+            }
+            for i in range(offset, offset + n)
+        ])
+        session.commit()
+
+    for offset, n in _chunks(spec.artefacts):
+        repo.create_artefacts_bulk(session, [
+            {
+                "name": f"Artefact {i + 1}",
+                "description": None,
+                "material": rng.choice(MATERIALS),
+                "acquisition_date": date(1900, 1, 1) + timedelta(days=rng.randrange(0, 45_000)),
+            }
+            for i in range(offset, offset + n)
+        ])
+        session.commit()
+
+    exhibit_ids = list(range(1, spec.exhibits + 1))
+    exhibit_weights = _skewed_cum_weights(spec.exhibits, 0.7)
+    visitor_ids = list(range(1, spec.visitors + 1))
+    visitor_weights = _skewed_cum_weights(spec.visitors, 0.5)
+
+    counts = {"visits": 0, "feedback": 0, "ticket_purchases": 0}
+    for _, n in _chunks(spec.visits):
+        visit_days = rng.choices(days, cum_weights=day_weights, k=n)
+        visitors = rng.choices(visitor_ids, cum_weights=visitor_weights, k=n)
+        exhibits = rng.choices(exhibit_ids, cum_weights=exhibit_weights, k=n)
+        counts["visits"] += repo.record_visits_bulk(session, [
+            {"visitor_id": v, "exhibit_id": e, "visit_date": d}
+            for v, e, d in zip(visitors, exhibits, visit_days)
+        ])
+
+        feedback, tickets = [], []
+        for v, e, d in zip(visitors, exhibits, visit_days):
+            at = datetime.combine(d, datetime.min.time()) + timedelta(minutes=rng.randrange(540, 1020))
+            if rng.random() < spec.feedback_ratio:
+                feedback.append({"visitor_id": v, "exhibit_id": e, "rating": rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 5, 9, 8])[0], "submitted_at": at})
+            if rng.random() < spec.ticket_ratio:
+                ticket_type = rng.choice(list(TICKET_PRICES))
+                tickets.append({"visitor_id": v, "ticket_type": ticket_type, "price": TICKET_PRICES[ticket_type], "purchase_date": at})
+        counts["feedback"] += repo.record_feedback_bulk(session, feedback)
+        counts["ticket_purchases"] += repo.record_ticket_purchases_bulk(session, tickets)
+        session.commit()
+
+    conservation = int(spec.artefacts * spec.conservation_per_artefact)
+    for _, n in _chunks(conservation):
+        repo.add_conservation_records_bulk(session, [
+            {
+                "artefact_id": rng.randint(1, spec.artefacts),
+                "condition": rng.choice(CONDITIONS),
+                "due_date": today + timedelta(days=rng.randrange(-365, 365)),
+                "recorded_at": datetime.combine(start + timedelta(days=rng.randrange(0, span)), datetime.min.time()),
+            }
+            for _ in range(n)
+        ])
+        session.commit()
+    counts["conservation_records"] = conservation
+
+    counts.update(exhibits=spec.exhibits, visitors=spec.visitors, artefacts=spec.artefacts)
+    return counts
+
+def write_artefacts_csv(path: str | Path, rows: int, seed: int = 7, bad_row_ratio: float = 0.001) -> Path:
+    """Write a catalogue export in the format integrations.csv_import expects."""
+    rng = random.Random(seed)
+    path = Path(path)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "description", "material", "acquisition_date"])
+        for i in range(rows):
+            acquired = date(1900, 1, 1) + timedelta(days=rng.randrange(0, 45_000))
+            writer.writerow([
+                f"Catalogue item {i + 1}",
+                "Imported from catalogue export",
+                rng.choice(MATERIALS),
+                "not-a-date" if rng.random() < bad_row_ratio else acquired.isoformat(),
+            ])
+    return path
@@ -0,0 +1,393 @@
+"""HTTP load test of the web tier: simulated terminals signed in as each role.
+
+Usage:
+    python -m benchmarks.loadtest --terminals front_desk=6,curator=1,admin=1 --duration 30 --out bench/load.json
+    python -m benchmarks.loadtest --serve --scale small --db bench/load.db --requests 5000
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --login front_desk=desk:secret --visitors 2000 --exhibits 20
+    python -m benchmarks.loadtest --baseline bench/load.json --tolerance 0.25
+
+Without --url the app from web.create_app runs in this process against a
+scratch database (--db, or a temporary one), seeded with a synthetic dataset
+and one load_<role> user per role. Requests go through the Flask test client,
+or over HTTP to a local threaded server with --serve. Each terminal signs in
+once, then picks routes from its role's weighted mix until --duration or
+--requests runs out.
+
+The JSON report has throughput, p50/p95/p99 latency and error and lock-error
+rates per route. A lock error is a "database is locked" failure surfaced by
+the app. With --baseline, routes whose p95 grew or whose throughput fell by
+more than the tolerance, or whose lock-error rate rose, are flagged and the
+exit code is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from collections.abc import Callable, Mapping
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from utils.metrics import percentile
+
+LOAD_PASSWORD = "loadtest"  # password of the load_<role> users created in scratch databases
+LOGIN_ATTEMPTS = 20  # a terminal that cannot sign in (wrong password, pool busy) gives up after this many tries
+
+@dataclass(frozen=True)
+class Ids:
+    visitors: int  # ids 1..visitors are picked at random
+    exhibits: int
+
+@dataclass(frozen=True)
+class Route:
+    method: str
+    path: str
+    form: Callable[[random.Random, Ids], dict] | None = None
+
+def _visit_form(rng: random.Random, ids: Ids) -> dict:
+    day = date.today() - timedelta(days=rng.randrange(30))
+    return {"visitor_id": rng.randint(1, ids.visitors), "exhibit_id": rng.randint(1, ids.exhibits), "visit_date": day.isoformat()}
+
+def _ticket_form(rng: random.Random, ids: Ids) -> dict:
+    ticket_type = rng.choice(["Adult", "Student", "Member", "Concession"])
+    return {"visitor_id": rng.randint(1, ids.visitors), "ticket_type": ticket_type, "price": {"Adult": 18, "Student": 9, "Member": 0, "Concession": 12.5}[ticket_type]}
+
+def _feedback_form(rng: random.Random, ids: Ids) -> dict:
+    return {"visitor_id": rng.randint(1, ids.visitors), "exhibit_id": rng.randint(1, ids.exhibits), "rating": rng.randint(1, 5)}
+
+ROUTES: dict[str, Route] = {
+    "GET /dashboard": Route("GET", "/dashboard"),
+    "GET /artefacts": Route("GET", "/artefacts"),
+    "POST /visits/record": Route("POST", "/visits/record", _visit_form),
+    "POST /tickets/record": Route("POST", "/tickets/record", _ticket_form),
+    "POST /feedback/record": Route("POST", "/feedback/record", _feedback_form),
+}
+
+# role -> {route: weight}; only routes the role may use
+ROLE_MIXES: dict[str, dict[str, int]] = {
+    "front_desk": {"POST /visits/record": 45, "POST /tickets/record": 25, "POST /feedback/record": 10, "GET /dashboard": 10, "GET /artefacts": 10},
+    "curator": {"GET /artefacts": 45, "GET /dashboard": 40, "POST /feedback/record": 15},
+    "admin": {"GET /dashboard": 50, "GET /artefacts": 25, "POST /visits/record": 10, "POST /tickets/record": 10, "POST /feedback/record": 5},
+}
+
+LOGIN = "POST /login"
+_LOCK_ERROR = re.compile(r"database (table )?is (locked|busy)", re.IGNORECASE)
+
+def classify(method: str, status: int, body: str) -> str:
+    """Outcome of one response: "ok", "error" or "lock".
+
+    Successful form posts redirect; a failed one re-renders the form with the
+    error flashed. A GET that redirects was bounced (signed out or not allowed).
+    """
+    if _LOCK_ERROR.search(body):
+        return "lock"
+    if status >= 400:
+        return "error"
+    if method == "POST":
+        return "ok" if status in (302, 303) else "error"
+    return "ok" if status == 200 else "error"
+
+# --- Clients ---
+class FlaskClient:
+    """The app's test client: requests run in this process, no sockets."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method: str, path: str, form: dict | None = None) -> tuple[int, str]:
+        r = self._client.open(path, method=method, data=form)
+        return r.status_code, r.get_data(as_text=True)
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # time the route itself, not the page it redirects to
+
+class HttpClient:
+    """urllib with its own cookie jar (one signed-in terminal per client)."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self._base = base_url.rstrip("/")
+        self._timeout = timeout
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method: str, path: str, form: dict | None = None) -> tuple[int, str]:
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        req = urllib.request.Request(self._base + path, data=data, method=method)
+        try:
+            with self._opener.open(req, timeout=self._timeout) as resp:
+                return resp.status, resp.read().decode("utf-8", "replace")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace")
+
+# --- Load ---
+def run_load(
+    make_client: Callable[[], object],
+    logins: Mapping[str, tuple[str, str]],
+    terminals: Mapping[str, int],
+    ids: Ids,
+    duration_s: float | None = None,
+    requests: int | None = None,
+    think_ms: float = 0.0,
+    seed: int = 7,
+) -> dict:
+    """Run the terminals concurrently; returns the report's "results" and "total" sections.
+
+    Each terminal is a thread with its own client. Stops after duration_s
+    seconds or once `requests` route requests (logins excluded) were issued.
+    A terminal retries a failed sign-in up to LOGIN_ATTEMPTS times (or until
+    the deadline), then gives up; failed sign-ins are counted as login_errors.
+    """
+    if duration_s is None and requests is None:
+        raise ValueError("Give duration_s or requests")
+    samples: list[tuple[str, float, float, str]] = []  # (route, start, ms, outcome)
+    lock = threading.Lock()
+    issued = 0
+    stop = threading.Event()
+    deadline = time.perf_counter() + duration_s if duration_s else None
+
+    def expired() -> bool:
+        return deadline is not None and time.perf_counter() >= deadline
+
+    def take() -> bool:
+        nonlocal issued
+        with lock:
+            if stop.is_set() or (requests is not None and issued >= requests) or expired():
+                stop.set()
+                return False
+            issued += 1
+            return True
+
+    def timed(client, name: str, method: str, path: str, form: dict | None) -> str:
+        t0 = time.perf_counter()
+        try:
+            status, body = client.request(method, path, form)
+        except Exception as e:  # connection reset, timeout...
+            status, body = 599, str(e)
+        ms = (time.perf_counter() - t0) * 1000
+        outcome = classify(method, status, body)
+        with lock:
+            samples.append((name, t0, ms, outcome))
+        return outcome
+
+    def terminal(role: str, number: int) -> None:
+        rng = random.Random(f"{seed}-{role}-{number}")
+        client = make_client()
+        username, password = logins[role]
+        for _ in range(LOGIN_ATTEMPTS):
+            if timed(client, LOGIN, "POST", "/login", {"username": username, "password": password}) == "ok":
+                break
+            if stop.wait(0.1) or expired():
+                return
+        else:
+            return  # never signed in: its failures are the report's login_errors
+        names, weights = zip(*ROLE_MIXES[role].items())
+        while take():
+            name = rng.choices(names, weights)[0]
+            route = ROUTES[name]
+            timed(client, name, route.method, route.path, route.form(rng, ids) if route.form else None)
+            if think_ms:
+                time.sleep(think_ms / 1000)
+
+    threads = [threading.Thread(target=terminal, args=(role, n), name=f"load-{role}-{n}") for role, count in terminals.items() for n in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(samples)
+
+def summarize(samples: list[tuple[str, float, float, str]]) -> dict:
+    """Per-route statistics. Throughput is over the window from the first to the
+    last route request, so the sign-ins (timed separately) do not dilute it."""
+    routes = [r for r in samples if r[0] != LOGIN]
+    elapsed_s = max(r[1] + r[2] / 1000 for r in routes) - min(r[1] for r in routes) if routes else 0.0
+
+    def stats(rows: list[tuple[str, float, float, str]]) -> dict:
+        ms = [r[2] for r in rows]
+        outcomes = [r[3] for r in rows]
+        n = len(rows)
+        return {
+            "requests": n,
+            "errors": outcomes.count("error"),
+            "lock_errors": outcomes.count("lock"),
+            "error_rate": round(outcomes.count("error") / n, 4),
+            "lock_error_rate": round(outcomes.count("lock") / n, 4),
+            "throughput_rps": round(n / elapsed_s, 2) if elapsed_s else None,
+            "p50_ms": round(percentile(ms, 50), 3),
+            "p95_ms": round(percentile(ms, 95), 3),
+            "p99_ms": round(percentile(ms, 99), 3),
+            "max_ms": round(max(ms), 3),
+        }
+
+    by_route: dict[str, list] = defaultdict(list)
+    for row in samples:
+        by_route[row[0]].append(row)
+    login_errors = sum(1 for r in samples if r[0] == LOGIN and r[3] != "ok")
+    return {
+        "elapsed_s": round(elapsed_s, 3),
+        "results": {name: stats(rows) for name, rows in sorted(by_route.items())},
+        "total": {**(stats(routes) if routes else {"requests": 0}), "login_errors": login_errors},
+    }
+
+def compare_load_reports(current: dict, baseline: dict, tolerance: float = 0.2) -> list[dict]:
+    """One entry per route in both reports; a regression is a slower p95, lower throughput or more lock errors."""
+    rows = []
+    for name, base in baseline.get("results", {}).items():
+        cur = current.get("results", {}).get(name)
+        if cur is None or name == LOGIN:
+            continue
+        p95_ratio = cur["p95_ms"] / base["p95_ms"] if base["p95_ms"] else 1.0
+        rps_ratio = (cur["throughput_rps"] or 0) / base["throughput_rps"] if base["throughput_rps"] else 1.0
+        rows.append({
+            "name": name,
+            "baseline_p95_ms": base["p95_ms"],
+            "current_p95_ms": cur["p95_ms"],
+            "p95_ratio": round(p95_ratio, 3),
+            "throughput_ratio": round(rps_ratio, 3),
+            "lock_error_rate": cur["lock_error_rate"],
+            "regression": p95_ratio > 1 + tolerance or rps_ratio < 1 - tolerance or cur["lock_error_rate"] > base["lock_error_rate"],
+        })
+    return rows
+
+# --- Scratch database and app ---
+def _prepare_database(spec, seed: int, roles) -> Ids:
+    """Migrate and seed the configured database (if empty) and (re)create the load_<role> users."""
+    from sqlalchemy import delete, func, select
+
+    from benchmarks.datagen import generate_dataset
+    from dal.db import get_session
+    from dal.models import Exhibit, User, Visitor
+    from database.db_init import create_database
+    from security.passwords import hash_password
+
+    create_database()
+    with get_session() as session:
+        if not session.scalar(select(func.count()).select_from(Visitor)):
+            generate_dataset(session, spec, seed=seed)
+        for role in roles:
+            session.execute(delete(User).where(User.username == f"load_{role}"))
+            session.add(User(username=f"load_{role}", password_hash=hash_password(LOAD_PASSWORD), role=role))
+        return Ids(visitors=session.scalar(select(func.max(Visitor.visitor_id))), exhibits=session.scalar(select(func.max(Exhibit.exhibit_id))))
+
+def _serve(app) -> tuple[str, Callable[[], None]]:
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per request
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+def _pairs(value: str) -> dict[str, str]:
+    try:
+        pairs = dict(item.split("=", 1) for item in value.split(",") if item)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected role=value[,role=value...], got {value!r}")
+    unknown = set(pairs) - set(ROLE_MIXES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown role(s) {sorted(unknown)} (expected {sorted(ROLE_MIXES)})")
+    return pairs
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.splitlines()[0])
+    parser.add_argument("--terminals", type=_pairs, default=_pairs("front_desk=6,curator=1,admin=1"), help="Concurrent terminals per role")
+    stop = parser.add_mutually_exclusive_group()
+    stop.add_argument("--duration", type=float, help="Seconds to run (default 20 unless --requests)")
+    stop.add_argument("--requests", type=int, help="Total route requests to issue")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a terminal's requests")
+    parser.add_argument("--seed", type=int, default=7)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Load an already running app instead of an in-process one")
+    target.add_argument("--serve", action="store_true", help="In-process app behind a local threaded HTTP server (default: test client)")
+    parser.add_argument("--db", type=Path, help="Scratch SQLite file for the in-process app (seeded when empty; default: temporary)")
+    parser.add_argument("--scale", default="tiny", help="Dataset for a new scratch database (see benchmarks.runner)")
+    parser.add_argument("--login", type=_pairs, default={}, help="With --url: role=username:password[,...]")
+    parser.add_argument("--visitors", type=int, default=2_000, help="With --url: highest visitor id to use")
+    parser.add_argument("--exhibits", type=int, default=20, help="With --url: highest exhibit id to use")
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="Compare against a saved report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown / throughput drop vs baseline")
+    args = parser.parse_args(argv)
+    duration = args.duration if args.duration or args.requests else 20.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shutdown = None
+        if args.url:
+            missing = set(args.terminals) - set(args.login)
+            if missing:
+                parser.error(f"--login needed for {sorted(missing)}")
+            logins = {role: tuple(value.split(":", 1)) for role, value in args.login.items()}
+            ids, mode = Ids(args.visitors, args.exhibits), "url"
+            make_client = lambda: HttpClient(args.url)  # noqa: E731
+        else:
+            # The DAL reads DATABASE_URL when first imported: point it at the scratch file first
+            db_path = args.db or Path(tmp) / "load.db"
+            os.environ["DATABASE_URL"] = f"sqlite:///{db_path.resolve().as_posix()}"
+            from benchmarks.datagen import SCALES
+            from web import create_app
+
+            if args.scale not in SCALES:
+                parser.error(f"--scale must be one of {sorted(SCALES)}")
+            ids = _prepare_database(SCALES[args.scale], args.seed, args.terminals)
+            logins = {role: (f"load_{role}", LOAD_PASSWORD) for role in args.terminals}
+            app = create_app()
+            if args.serve:
+                base_url, shutdown = _serve(app)
+                make_client, mode = (lambda: HttpClient(base_url)), "serve"
+            else:
+                make_client, mode = (lambda: FlaskClient(app)), "test_client"
+        try:
+            report = run_load(make_client, logins, {r: int(n) for r, n in args.terminals.items()}, ids, duration_s=duration if not args.requests else None, requests=args.requests, think_ms=args.think_ms, seed=args.seed)
+        finally:
+            if shutdown:
+                shutdown()
+
+    report["meta"] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "url": args.url,
+        "scale": None if args.url else args.scale,
+        "terminals": {r: int(n) for r, n in args.terminals.items()},
+        "ids": asdict(ids),
+        "think_ms": args.think_ms,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+    print(f"{'route':24} {'requests':>8} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'locks':>7}")
+    for name, r in [*report["results"].items(), ("total", report["total"])]:
+        if r["requests"]:
+            print(f"{name:24} {r['requests']:>8} {r['throughput_rps']:>8} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['error_rate']:>7.2%} {r['lock_error_rate']:>7.2%}")
+
+    if report["total"]["login_errors"]:
+        print(f"{report['total']['login_errors']} failed sign-ins (check --login, or the password pool is saturated)")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.out}")
+
+    if args.baseline:
+        comparison = compare_load_reports(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for row in comparison:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(f"{row['name']:24} p95 {row['baseline_p95_ms']:>9.1f} -> {row['current_p95_ms']:>9.1f} ms  x{row['p95_ratio']:<6} rps x{row['throughput_ratio']:<6} {flag}")
+        return 1 if any(row["regression"] for row in comparison) else 0
+    return 0 if report["total"]["requests"] else 1  # no terminal could sign in
+
+if __name__ == "__main__":
+    raise SystemExit(main())
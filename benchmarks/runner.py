@@ -0,0 +1,209 @@
+"""Benchmark the DAL analytics and import paths against a synthetic dataset.
+
+Usage:
+    python -m benchmarks.runner --scale small --out bench/small.json
+    python -m benchmarks.runner --scale small --baseline bench/small.json --tolerance 0.25
+
+The report is JSON: dataset metadata plus min/median/p95 milliseconds per
+benchmark. With --baseline, any benchmark whose median is slower than the
+baseline by more than the tolerance is reported and the exit code is 1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.datagen import SCALES, DatasetSpec, generate_dataset, write_artefacts_csv
+from dal.cache import lookup_cache, query_cache
+from dal.db import PROFILES, _create_engines
+from dal import repositories as repo
+from database.db_init import install_schema
+from integrations.csv_import import import_csv
+from utils.metrics import percentile
+
+def time_call(fn: Callable[[], object], repeats: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "repeats": repeats,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+    }
+
+def _analytics_benchmarks(session) -> dict[str, Callable[[], object]]:
+    return {
+        "visit_counts_by_exhibit": lambda: repo.visit_counts_by_exhibit(session),
+        "top_visitors": lambda: repo.top_visitors(session, limit=5),
+        "average_rating_by_exhibit": lambda: repo.average_rating_by_exhibit(session),
+        "conservation_due_soon": lambda: repo.conservation_due_soon(session, within_days=30),
+        "conservation_due_by_condition": lambda: repo.conservation_due_by_condition(session, within_days=30),
+        "page_conservation_due": lambda: repo.page_conservation_due(session, within_days=30),
+        "monthly_visit_counts": lambda: repo.monthly_visit_counts(session),
+        "visit_counts_by_weekday": lambda: repo.visit_counts_by_weekday(session),
+        "monthly_ticket_sales": lambda: repo.monthly_ticket_sales(session),
+        "unique_visitors": lambda: repo.unique_visitors(session),
+        "unique_visitors_exact": lambda: repo.unique_visitors(session, exact=True),
+        "unique_visitors_by_exhibit_month": lambda: repo.unique_visitors_by_exhibit_month(session),
+        "unique_visitors_by_exhibit_month_exact": lambda: repo.unique_visitors_by_exhibit_month(session, exact=True),
+        "unique_visitors_by_region": lambda: repo.unique_visitors_by_region(session),
+        "unique_visitors_by_region_exact": lambda: repo.unique_visitors_by_region(session, exact=True),
+        "page_artefacts_first_page": lambda: repo.page_artefacts(session, limit=50),
+        "page_artefacts_by_name": lambda: repo.page_artefacts(session, limit=50, order="name"),
+        "search_catalogue": lambda: repo.search_catalogue(session, "artefact 12", limit=20),
+        "lookup_visitors_name": lambda: repo.lookup_visitors(session, "vis", limit=10),
+        "lookup_visitors_email": lambda: repo.lookup_visitors(session, "visitor1@", limit=10),
+    }
+
+def run_benchmarks(spec: DatasetSpec, workdir: Path, repeats: int = 5, seed: int = 7, csv_rows: int | None = None, profile: str = "default") -> dict:
+    db_path = workdir / "bench.db"
+    if db_path.exists():
+        db_path.unlink()
+    engine, _ = _create_engines(f"sqlite:///{db_path.as_posix()}", PROFILES[profile], split=False)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+
+    results: dict[str, dict] = {}
+    t0 = time.perf_counter()
+    with Session() as session:
+        counts = generate_dataset(session, spec, seed=seed)
+    results["generate_dataset"] = {"repeats": 1, "seconds": round(time.perf_counter() - t0, 3)}
+
+    # Measure the queries themselves, not the result cache
+    caches = (query_cache, lookup_cache)
+    cache_was_enabled = [c.enabled for c in caches]
+    for c in caches:
+        c.enabled = False
+    try:
+        with Session() as session:
+            for name, fn in _analytics_benchmarks(session).items():
+                results[name] = time_call(fn, repeats)
+    finally:
+        for c, enabled in zip(caches, cache_was_enabled):
+            c.enabled = enabled
+
+    @contextmanager
+    def session_factory():
+        s = Session()
+        try:
+            yield s
+            s.commit()
+        finally:
+            s.close()
+
+    csv_rows = csv_rows if csv_rows is not None else max(1_000, spec.artefacts // 2)
+    csv_path = write_artefacts_csv(workdir / "artefacts.csv", csv_rows, seed=seed)
+    t0 = time.perf_counter()
+    report = import_csv(csv_path, "artefacts", batch_size=5_000, resume=False, session_factory=session_factory)
+    elapsed = time.perf_counter() - t0
+    results["import_csv_artefacts"] = {
+        "repeats": 1,
+        "rows": csv_rows,
+        "created": report.created,
+        "errors": len(report.errors),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(csv_rows / elapsed, 1) if elapsed else None,
+    }
+    engine.dispose()
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "spec": asdict(spec),
+            "seed": seed,
+            "profile": profile,
+            "row_counts": counts,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+def _headline_ms(result: dict) -> float | None:
+    if "median_ms" in result:
+        return result["median_ms"]
+    if "seconds" in result:
+        return result["seconds"] * 1000
+    return None
+
+def compare_reports(current: dict, baseline: dict, tolerance: float = 0.2) -> list[dict]:
+    """Return one entry per benchmark present in both reports, flagging regressions."""
+    rows = []
+    for name, base in baseline.get("results", {}).items():
+        cur = current.get("results", {}).get(name)
+        if cur is None:
+            continue
+        base_ms, cur_ms = _headline_ms(base), _headline_ms(cur)
+        if not base_ms or cur_ms is None:
+            continue
+        ratio = cur_ms / base_ms
+        rows.append({
+            "name": name,
+            "baseline_ms": round(base_ms, 3),
+            "current_ms": round(cur_ms, 3),
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.runner", description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="tiny")
+    parser.add_argument("--visits", type=int, help="Override the number of visits for the chosen scale")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--workdir", type=Path, help="Where to build the benchmark DB (default: a temp dir)")
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="Compare against a saved report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    spec = SCALES[args.scale]
+    if args.visits:
+        spec = DatasetSpec(**{**asdict(spec), "visits": args.visits})
+
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        report = run_benchmarks(spec, args.workdir, repeats=args.repeats, seed=args.seed, profile=args.profile)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run_benchmarks(spec, Path(tmp), repeats=args.repeats, seed=args.seed, profile=args.profile)
+
+    for name, result in report["results"].items():
+        print(f"{name:32} {_headline_ms(result):>12.3f} ms")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.out}")
+
+    if args.baseline:
+        comparison = compare_reports(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        regressions = [row for row in comparison if row["regression"]]
+        for row in comparison:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(f"{row['name']:32} {row['baseline_ms']:>12.3f} -> {row['current_ms']:>12.3f} ms  x{row['ratio']:<6} {flag}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
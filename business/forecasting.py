@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+from collections.abc import Hashable, Iterable
 from dataclasses import dataclass
-from datetime import date
 from math import floor
+from statistics import NormalDist
+
+try:
+    import numpy as np  # type: ignore
+    _HAS_NUMPY = True
+except Exception:
+    np = None
+    _HAS_NUMPY = False
+
+SEASON_LENGTH = 12
 
 @dataclass(frozen=True)
 class ForecastPoint:
     year_month: str  # YYYY-MM
     predicted_visits: int
     method: str
+    lower: int | None = None  # prediction interval, when the method provides one
+    upper: int | None = None
 
 def seasonal_naive_forecast(monthly_counts: list[tuple[str, int]], months_ahead: int = 3) -> list[ForecastPoint]:
     """Simple forecasting without pandas.
@@ -61,3 +73,214 @@ def seasonal_naive_forecast(monthly_counts: list[tuple[str, int]], months_ahead:
         forecasts.append(ForecastPoint(year_month=ym, predicted_visits=pred, method=method))
 
     return forecasts
+
+# --- Month helpers ---
+def add_months(ym: str, k: int) -> str:
+    index = int(ym[:4]) * 12 + int(ym[5:7]) - 1 + k
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def month_range(first: str, last: str) -> list[str]:
+    """Every YYYY-MM from first to last inclusive."""
+    span = (int(last[:4]) * 12 + int(last[5:7])) - (int(first[:4]) * 12 + int(first[5:7]))
+    return [add_months(first, k) for k in range(span + 1)]
+
+# --- Vectorized Holt-Winters (additive ETS(A,A,A)) ---
+# Smoothing parameters are fitted by grid search, evaluated for every series at
+# once: the state arrays are (parameter sets x series), so one pass over the
+# months scores every candidate for every exhibit.
+_ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+_BETA_FRACTIONS = (0.0, 0.05, 0.15, 0.3)     # beta as a fraction of alpha (beta < alpha)
+_GAMMA_FRACTIONS = (0.05, 0.15, 0.3, 0.6)    # gamma as a fraction of 1 - alpha
+_SERIES_CHUNK = 2_000  # bounds memory to ~params x chunk x season floats
+
+@dataclass(frozen=True)
+class HoltWintersFit:
+    """Forecasts for N series over h months; arrays are (N, h) or (N,)."""
+    mean: "np.ndarray"
+    lower: "np.ndarray"
+    upper: "np.ndarray"
+    alpha: "np.ndarray"
+    beta: "np.ndarray"
+    gamma: "np.ndarray"
+    sigma: "np.ndarray"
+    seasonal: bool
+    level: float
+
+    @property
+    def method(self) -> str:
+        return "holt_winters" if self.seasonal else "holt_linear"
+
+def _require_numpy() -> None:
+    if not _HAS_NUMPY:
+        raise RuntimeError("numpy is required for Holt-Winters forecasting (pip install numpy)")
+
+def _parameter_grid(seasonal: bool):
+    combos = []
+    for a in _ALPHAS:
+        for bf in _BETA_FRACTIONS:
+            for gf in (_GAMMA_FRACTIONS if seasonal else (0.0,)):
+                combos.append((a, a * bf, (1 - a) * gf))
+    grid = np.array(combos)
+    return grid[:, 0:1], grid[:, 1:2], grid[:, 2:3]  # each (P, 1), broadcasts against (P, N)
+
+def _initial_state(y, m: int, seasonal: bool):
+    n, t = y.shape
+    if seasonal:
+        first, second = y[:, :m], y[:, m:2 * m]
+        level = first.mean(axis=1)
+        trend = (second.mean(axis=1) - level) / m
+        season = first - level[:, None]
+    else:
+        level = y[:, 0].copy()
+        trend = (y[:, -1] - y[:, 0]) / max(t - 1, 1)
+        season = np.zeros((n, m))
+    return level, trend, season
+
+def _run_filter(y, level0, trend0, season0, alpha, beta, gamma):
+    """One-step-ahead ETS(A,A,A) filter for every (parameter set, series) pair.
+
+    alpha/beta/gamma broadcast to (P, N); returns SSE (P, N) and final states.
+    """
+    shape = np.broadcast_shapes(alpha.shape, (1, y.shape[0]))
+    level = np.broadcast_to(level0, shape).copy()
+    trend = np.broadcast_to(trend0, shape).copy()
+    season = np.broadcast_to(season0, shape + season0.shape[-1:]).copy()
+    m = season.shape[-1]
+    sse = np.zeros(shape)
+    for t in range(y.shape[1]):
+        i = t % m
+        s = season[..., i]
+        err = y[:, t] - (level + trend + s)
+        sse += err * err
+        level = level + trend + alpha * err
+        trend = trend + beta * err
+        season[..., i] = s + gamma * err
+    return sse, level, trend, season
+
+def fit_holt_winters(y, months_ahead: int, season_length: int = SEASON_LENGTH, level: float = 0.95) -> HoltWintersFit:
+    """Fit additive Holt-Winters to each row of y (series x months) and forecast.
+
+    Needs at least two full seasons for the seasonal model; shorter histories
+    use Holt's linear trend (the same filter with no seasonal term). Forecasts
+    and interval bounds are clipped at zero since they are visit counts.
+    """
+    _require_numpy()
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    n, t = y.shape
+    if t < 3:
+        raise ValueError("At least 3 months of history are needed to fit a trend")
+    m = season_length
+    seasonal = t >= 2 * m
+    a_grid, b_grid, g_grid = _parameter_grid(seasonal)
+
+    alpha, beta, gamma = np.empty(n), np.empty(n), np.empty(n)
+    sigma = np.empty(n)
+    final_level, final_trend = np.empty(n), np.empty(n)
+    final_season = np.empty((n, m))
+    for lo in range(0, n, _SERIES_CHUNK):
+        chunk = y[lo:lo + _SERIES_CHUNK]
+        l0, b0, s0 = _initial_state(chunk, m, seasonal)
+        sse, *_ = _run_filter(chunk, l0, b0, s0, a_grid, b_grid, g_grid)
+        best = sse.argmin(axis=0)
+        a, b, g = a_grid[best, 0], b_grid[best, 0], g_grid[best, 0]
+        sse, lv, tr, se = _run_filter(chunk, l0, b0, s0, a[None, :], b[None, :], g[None, :])
+        sl = slice(lo, lo + len(chunk))
+        alpha[sl], beta[sl], gamma[sl] = a, b, g
+        sigma[sl] = np.sqrt(sse[0] / t)
+        final_level[sl], final_trend[sl], final_season[sl] = lv[0], tr[0], se[0]
+
+    steps = np.arange(1, months_ahead + 1)
+    season_idx = (t + steps - 1) % m
+    mean = final_level[:, None] + final_trend[:, None] * steps + final_season[:, season_idx]
+
+    # ETS(A,A,A) forecast variance: sigma^2 * (1 + sum_{j<h} (alpha + beta*j + gamma*[j % m == 0])^2)
+    j = np.arange(1, months_ahead)
+    c = alpha[:, None] + beta[:, None] * j + gamma[:, None] * (j % m == 0)
+    var_factor = 1 + np.concatenate([np.zeros((n, 1)), np.cumsum(c * c, axis=1)], axis=1)
+    half_width = NormalDist().inv_cdf((1 + level) / 2) * sigma[:, None] * np.sqrt(var_factor)
+
+    return HoltWintersFit(
+        mean=np.clip(mean, 0, None),
+        lower=np.clip(mean - half_width, 0, None),
+        upper=np.clip(mean + half_width, 0, None),
+        alpha=alpha,
+        beta=beta,
+        gamma=gamma,
+        sigma=sigma,
+        seasonal=seasonal,
+        level=level,
+    )
+
+# --- Facades ---
+def _points(fit: HoltWintersFit, row: int, months: list[str]) -> list[ForecastPoint]:
+    return [
+        ForecastPoint(
+            year_month=ym,
+            predicted_visits=int(floor(fit.mean[row, h] + 0.5)),
+            method=fit.method,
+            lower=int(floor(fit.lower[row, h])),
+            upper=int(floor(fit.upper[row, h] + 0.999999)),
+        )
+        for h, ym in enumerate(months)
+    ]
+
+def holt_winters_forecast(monthly_counts: list[tuple[str, int]], months_ahead: int = 3, level: float = 0.95) -> list[ForecastPoint]:
+    """Drop-in replacement for seasonal_naive_forecast with prediction intervals.
+
+    Months missing from monthly_counts count as zero visits. Falls back to
+    seasonal_naive_forecast without numpy or with under 3 months of history.
+    """
+    if not monthly_counts or months_ahead <= 0:
+        return []
+    months = month_range(monthly_counts[0][0], monthly_counts[-1][0])
+    if not _HAS_NUMPY or len(months) < 3:
+        return seasonal_naive_forecast(monthly_counts, months_ahead)
+    counts = dict(monthly_counts)
+    fit = fit_holt_winters([[counts.get(ym, 0) for ym in months]], months_ahead, level=level)
+    return _points(fit, 0, [add_months(months[-1], k) for k in range(1, months_ahead + 1)])
+
+@dataclass(frozen=True)
+class SeriesForecasts:
+    keys: list[Hashable]
+    history_months: list[str]
+    months: list[str]
+    fit: HoltWintersFit
+
+    def points(self, key: Hashable) -> list[ForecastPoint]:
+        return _points(self.fit, self.keys.index(key), self.months)
+
+    def as_dict(self) -> dict[Hashable, list[ForecastPoint]]:
+        return {key: _points(self.fit, i, self.months) for i, key in enumerate(self.keys)}
+
+def monthly_matrix(rows: Iterable[tuple[Hashable, str, int]], keys: list[Hashable] | None = None):
+    """Pivot (key, YYYY-MM, count) rows into keys, a gap-free month axis and a keys x months array."""
+    _require_numpy()
+    rows = list(rows)
+    if keys is None:
+        keys = sorted({key for key, _, _ in rows}, key=str)
+    if not rows:
+        return keys, [], np.zeros((len(keys), 0))
+    months = month_range(min(ym for _, ym, _ in rows), max(ym for _, ym, _ in rows))
+    row_of = {key: i for i, key in enumerate(keys)}
+    col_of = {ym: j for j, ym in enumerate(months)}
+    matrix = np.zeros((len(keys), len(months)))
+    for key, ym, count in rows:
+        if key in row_of:
+            matrix[row_of[key], col_of[ym]] += count
+    return keys, months, matrix
+
+TOTAL = "total"
+
+def forecast_series(rows: Iterable[tuple[Hashable, str, int]], months_ahead: int = 3, level: float = 0.95, keys: list[Hashable] | None = None, include_total: bool = True) -> SeriesForecasts:
+    """Forecast every series (e.g. every exhibit) in one batch, plus their total under TOTAL.
+
+    rows are (key, YYYY-MM, visits); pass keys to include series with no
+    visits at all (they forecast zero).
+    """
+    keys, months, matrix = monthly_matrix(rows, keys)
+    if include_total:
+        keys = [*keys, TOTAL]
+        matrix = np.vstack([matrix, matrix.sum(axis=0, keepdims=True)])
+    fit = fit_holt_winters(matrix, months_ahead, level=level)
+    future = [add_months(months[-1], k) for k in range(1, months_ahead + 1)]
+    return SeriesForecasts(keys=keys, history_months=months, months=future, fit=fit)
@@ -7,9 +7,63 @@ DB_PATH = BASE_DIR / "database" / "museum.db"
 # Keep SQLite as required by the brief, but access it through SQLAlchemy for DAL/ORM.
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH.as_posix()}")
 
+# SQLite engine tuning: "default", "performance" or "low_memory" (see utils/sqlite_profiles.py PROFILES)
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+# Route read-intent sessions to a separate read-only pool (file databases only)
+DB_SPLIT_READ_WRITE = os.getenv("DB_SPLIT_READ_WRITE", "1") == "1"
+# Per-year archive files for closed years of visits and ticket purchases (dal/archive.py)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", str(BASE_DIR / "database" / "archive"))
+# Analytics snapshot: dashboard/report sessions read a backup copy instead of the live file (dal/snapshot.py)
+ANALYTICS_SNAPSHOT_ENABLED = os.getenv("ANALYTICS_SNAPSHOT_ENABLED", "0") == "1"
+ANALYTICS_SNAPSHOT_PATH = os.getenv("ANALYTICS_SNAPSHOT_PATH", str(BASE_DIR / "database" / "analytics_snapshot.db"))
+ANALYTICS_SNAPSHOT_MAX_AGE = float(os.getenv("ANALYTICS_SNAPSHOT_MAX_AGE", "300"))  # seconds of staleness allowed
+ANALYTICS_SNAPSHOT_BACKUP_PAGES = int(os.getenv("ANALYTICS_SNAPSHOT_BACKUP_PAGES", "-1"))  # pages per backup step; -1 = all at once
+
+# Repository query cache (analytics reads; invalidated on every committed write)
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "1") == "1"
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))  # seconds
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))  # entries
+LOOKUP_CACHE_ENABLED = os.getenv("LOOKUP_CACHE_ENABLED", "1") == "1"  # typeahead prefix results
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "300"))  # seconds
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "2048"))  # entries
+
+# Group-commit write queue for front-desk writes (visits, tickets, feedback)
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "1") == "1"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "50"))
+WRITE_QUEUE_MAX_LATENCY_MS = float(os.getenv("WRITE_QUEUE_MAX_LATENCY_MS", "20"))
+WRITE_QUEUE_MAX_DEPTH = int(os.getenv("WRITE_QUEUE_MAX_DEPTH", "1000"))
+WRITE_QUEUE_RESULT_TIMEOUT = float(os.getenv("WRITE_QUEUE_RESULT_TIMEOUT", "10"))  # seconds a request waits
+
+# SQL instrumentation: statement timings, slow-query log, per-request query counts (/metrics)
+SQL_METRICS_ENABLED = os.getenv("SQL_METRICS_ENABLED", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "")  # empty = main log only
+QUERY_REPEAT_WARN = int(os.getenv("QUERY_REPEAT_WARN", "10"))  # same statement N times in one request = likely N+1
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # bearer token for /metrics; admins can always view it
+ANALYTICS_API_TOKEN = os.getenv("ANALYTICS_API_TOKEN", "")  # bearer token for /api/analytics (kiosks, BI); signed-in users need none
+CLI_BATCH_TOKEN = os.getenv("CLI_BATCH_TOKEN", "")  # MUSEUM_TOKEN value that lets batch commands (python main.py <command>) skip the password
+CLI_BATCH_ROLE = os.getenv("CLI_BATCH_ROLE", "admin")  # role the batch token acts as
+
+# Per-route request timing (latency, DB vs template time, response size), shown in /metrics
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "1") == "1"
+# Opt-in request profiling: a random fraction of requests and/or every request over PROFILE_SLOW_MS
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")  # "cprofile" or "tracemalloc"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0.01 = 1% of requests
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))  # 0 = off
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
 # Security
 DEFAULT_ADMIN_USERNAME = os.getenv("DEFAULT_ADMIN_USERNAME", "admin")
 DEFAULT_ADMIN_PASSWORD = os.getenv("DEFAULT_ADMIN_PASSWORD", "admin123")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "210000"))
+# Password hashing runs in a process pool; 0 workers = inline
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", "2"))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "8"))
+PASSWORD_POOL_TIMEOUT = float(os.getenv("PASSWORD_POOL_TIMEOUT", "10"))  # seconds
+# Queued background rehashes after login; beyond this they are skipped until the next login
+REHASH_MAX_PENDING = int(os.getenv("REHASH_MAX_PENDING", "32"))
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
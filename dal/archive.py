@@ -0,0 +1,312 @@
+"""Per-year archive files for closed years of visits and ticket purchases.
+
+archive_year() moves one calendar year out of the hot database into its own
+SQLite file (ARCHIVE_DIR/museum-<year>.db) and records it in archive_years;
+restore_year() moves it back. visit_daily_rollups keeps covering archived
+years, so the dashboard's monthly and per-exhibit analytics are unchanged.
+
+Queries that need row-level history use history_session(): its connections
+ATTACH every archive and expose TEMP views visits_all / ticket_purchases_all
+(hot rows UNION ALL archived rows). SQLite cannot enforce foreign keys across
+files, so archived rows whose visitor or exhibit has since been deleted are
+hidden by the views, skipped on restore and physically removed by
+prune_archives() (also run by every archive and restore), which keeps the
+ON DELETE CASCADE semantics of the hot tables.
+
+A year is moved in one transaction per file. In WAL mode SQLite does not
+commit attached databases atomically together, so after a crash re-run the
+same command: archiving and restoring are both idempotent.
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import column, create_engine, event, func, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from config import ARCHIVE_DIR, DATABASE_URL
+from dal.db import _is_file_database, engine, profile, sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+ARCHIVING_FLAG = "archiving"  # suspends the visit rollup triggers (see database/migrations.py)
+
+class ArchiveError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class ArchiveResult:
+    year: int
+    path: str
+    visits: int   # rows moved by this run
+    tickets: int
+    pruned: int   # archived rows of deleted visitors/exhibits dropped instead of moved
+
+VISIT_COLUMNS = ("visit_id", "visitor_id", "exhibit_id", "visit_date")
+TICKET_COLUMNS = ("purchase_id", "visitor_id", "ticket_type", "price", "purchase_date")
+
+# Archive files hold plain copies of the hot tables (no generated columns, no cross-file FKs)
+_ARCHIVE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.visits (
+        visit_id INTEGER PRIMARY KEY,
+        visitor_id INTEGER NOT NULL,
+        exhibit_id INTEGER NOT NULL,
+        visit_date DATE NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.ix_visits_visitor_date ON visits (visitor_id, visit_date)",
+    "CREATE INDEX IF NOT EXISTS {schema}.ix_visits_exhibit_date ON visits (exhibit_id, visit_date)",
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.ticket_purchases (
+        purchase_id INTEGER PRIMARY KEY,
+        visitor_id INTEGER NOT NULL,
+        ticket_type VARCHAR(50) NOT NULL,
+        price NUMERIC(10, 2) NOT NULL,
+        purchase_date DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.ix_ticket_purchases_visitor ON ticket_purchases (visitor_id)",
+    "CREATE INDEX IF NOT EXISTS {schema}.ix_ticket_purchases_date ON ticket_purchases (purchase_date)",
+]
+
+def archive_path(year: int, archive_dir: str | Path = ARCHIVE_DIR) -> Path:
+    return Path(archive_dir) / f"museum-{year}.db"
+
+def _year_bounds(year: int) -> tuple[str, str]:
+    # Dates and timestamps are ISO text in SQLite, so a year is a string range
+    return f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+def _now() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+@contextmanager
+def _raw_connection(bind: Engine) -> Iterator[sqlite3.Connection]:
+    # ATTACH/DETACH must sit outside a transaction, so drive the DBAPI connection directly
+    raw = bind.raw_connection()
+    try:
+        yield raw.driver_connection
+    finally:
+        raw.close()
+
+@contextmanager
+def _attached(db: sqlite3.Connection, path: Path, schema: str = "archive"):
+    db.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    try:
+        yield
+    finally:
+        db.execute(f"DETACH DATABASE {schema}")
+
+@contextmanager
+def _immediate(db: sqlite3.Connection):
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("INSERT INTO maintenance_flags (name, set_at) VALUES (?, ?)", (ARCHIVING_FLAG, _now()))
+        yield
+        db.execute("DELETE FROM maintenance_flags WHERE name = ?", (ARCHIVING_FLAG,))
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+def _count(db: sqlite3.Connection, sql: str, params=()) -> int:
+    return db.execute(sql, params).fetchone()[0]
+
+def _registered(db: sqlite3.Connection) -> list[tuple[int, str]]:
+    return db.execute("SELECT year, path FROM archive_years ORDER BY year").fetchall()
+
+# --- Foreign keys across files ---
+_ORPHAN_VISITS = "visitor_id NOT IN (SELECT visitor_id FROM main.visitors) OR exhibit_id NOT IN (SELECT exhibit_id FROM main.exhibits)"
+_ORPHAN_TICKETS = "visitor_id NOT IN (SELECT visitor_id FROM main.visitors)"
+
+def _prune_attached(db: sqlite3.Connection, schema: str) -> int:
+    """Cascade deletes of visitors/exhibits into one attached archive (inside a transaction)."""
+    # Rollups still count archived visits of deleted visitors (deleted exhibits took their rollups with them)
+    db.execute(f"""
+        WITH orphan AS (
+            SELECT exhibit_id, visit_date, COUNT(*) AS n FROM {schema}.visits
+            WHERE visitor_id NOT IN (SELECT visitor_id FROM main.visitors)
+            GROUP BY exhibit_id, visit_date
+        )
+        UPDATE main.visit_daily_rollups
+        SET visit_count = visit_count - (
+            SELECT n FROM orphan o WHERE o.exhibit_id = visit_daily_rollups.exhibit_id AND o.visit_date = visit_daily_rollups.visit_date
+        )
+        WHERE (exhibit_id, visit_date) IN (SELECT exhibit_id, visit_date FROM orphan)
+    """)
+    db.execute("DELETE FROM main.visit_daily_rollups WHERE visit_count <= 0")
+    pruned = db.execute(f"DELETE FROM {schema}.visits WHERE {_ORPHAN_VISITS}").rowcount
+    pruned += db.execute(f"DELETE FROM {schema}.ticket_purchases WHERE {_ORPHAN_TICKETS}").rowcount
+    return pruned
+
+def prune_archives(bind: Engine = engine) -> int:
+    """Remove archived rows whose visitor or exhibit no longer exists; returns rows removed.
+
+    Run after deleting visitors (e.g. an erasure request) so no copy survives in an archive.
+    """
+    pruned = 0
+    with _raw_connection(bind) as db:
+        for year, path in _registered(db):
+            schema = f"archive_{year}"
+            with _attached(db, Path(path), schema), _immediate(db):
+                pruned += _prune_attached(db, schema)
+    return pruned
+
+# --- Archive / restore ---
+def _check_id_sequence(db: sqlite3.Connection, lo: str, hi: str) -> None:
+    # SQLite hands out max(rowid) + 1; archiving the newest row would let new rows reuse archived ids
+    for tbl, pk, col in (("visits", "visit_id", "visit_date"), ("ticket_purchases", "purchase_id", "purchase_date")):
+        newest = db.execute(f"SELECT {col} FROM main.{tbl} WHERE {pk} = (SELECT MAX({pk}) FROM main.{tbl})").fetchone()
+        if newest is not None and lo <= str(newest[0]) < hi:
+            raise ArchiveError(f"The newest row of {tbl} is from this year; archive it once later rows exist")
+
+def archive_year(year: int, bind: Engine = engine, archive_dir: str | Path = ARCHIVE_DIR, today: date | None = None, vacuum: bool = False) -> ArchiveResult:
+    """Move a closed year's visits and ticket purchases into its archive file."""
+    today = today or date.today()
+    if year >= today.year:
+        raise ArchiveError(f"{year} is not a closed year")
+    path = archive_path(year, archive_dir).resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lo, hi = _year_bounds(year)
+    visits_cols, ticket_cols = ", ".join(VISIT_COLUMNS), ", ".join(TICKET_COLUMNS)
+
+    with _raw_connection(bind) as db:
+        with _attached(db, path):
+            for ddl in _ARCHIVE_DDL:
+                db.execute(ddl.format(schema="archive"))
+            with _immediate(db):
+                _check_id_sequence(db, lo, hi)
+                visits = db.execute(
+                    f"INSERT OR REPLACE INTO archive.visits ({visits_cols}) SELECT {visits_cols} FROM main.visits WHERE visit_date >= ? AND visit_date < ?", (lo, hi)
+                ).rowcount
+                tickets = db.execute(
+                    f"INSERT OR REPLACE INTO archive.ticket_purchases ({ticket_cols}) SELECT {ticket_cols} FROM main.ticket_purchases WHERE purchase_date >= ? AND purchase_date < ?", (lo, hi)
+                ).rowcount
+                db.execute("DELETE FROM main.visits WHERE visit_date >= ? AND visit_date < ?", (lo, hi))
+                db.execute("DELETE FROM main.ticket_purchases WHERE purchase_date >= ? AND purchase_date < ?", (lo, hi))
+                pruned = _prune_attached(db, "archive")
+                db.execute(
+                    """
+                    INSERT INTO archive_years (year, path, visits, tickets, archived_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (year) DO UPDATE SET path = excluded.path, visits = excluded.visits,
+                        tickets = excluded.tickets, archived_at = excluded.archived_at
+                    """,
+                    (year, str(path), _count(db, "SELECT COUNT(*) FROM archive.visits"), _count(db, "SELECT COUNT(*) FROM archive.ticket_purchases"), _now()),
+                )
+        if vacuum:
+            db.execute("VACUUM")  # hand the freed pages back to the filesystem
+    logger.info("Archived %d: %d visits and %d tickets to %s", year, visits, tickets, path)
+    return ArchiveResult(year=year, path=str(path), visits=visits, tickets=tickets, pruned=pruned)
+
+def restore_year(year: int, bind: Engine = engine, delete_file: bool = True) -> ArchiveResult:
+    """Move an archived year back into the hot tables and unregister its archive."""
+    visits_cols, ticket_cols = ", ".join(VISIT_COLUMNS), ", ".join(TICKET_COLUMNS)
+    with _raw_connection(bind) as db:
+        row = db.execute("SELECT path FROM archive_years WHERE year = ?", (year,)).fetchone()
+        if row is None:
+            raise ArchiveError(f"{year} is not archived")
+        path = Path(row[0])
+        if not path.exists():
+            raise ArchiveError(f"Archive file for {year} is missing: {path}")
+        with _attached(db, path), _immediate(db):
+            clashes = _count(db, "SELECT COUNT(*) FROM archive.visits WHERE visit_id IN (SELECT visit_id FROM main.visits)")
+            clashes += _count(db, "SELECT COUNT(*) FROM archive.ticket_purchases WHERE purchase_id IN (SELECT purchase_id FROM main.ticket_purchases)")
+            if clashes:
+                raise ArchiveError(f"{clashes} archived ids of {year} are already in use in the hot tables")
+            pruned = _prune_attached(db, "archive")
+            visits = db.execute(f"INSERT INTO main.visits ({visits_cols}) SELECT {visits_cols} FROM archive.visits").rowcount
+            tickets = db.execute(f"INSERT INTO main.ticket_purchases ({ticket_cols}) SELECT {ticket_cols} FROM archive.ticket_purchases").rowcount
+            db.execute("DELETE FROM archive_years WHERE year = ?", (year,))
+    if delete_file:
+        path.unlink(missing_ok=True)
+    logger.info("Restored %d: %d visits and %d tickets from %s", year, visits, tickets, path)
+    return ArchiveResult(year=year, path=str(path), visits=visits, tickets=tickets, pruned=pruned)
+
+def list_archives(bind: Engine = engine) -> list[tuple]:
+    """(year, path, visits, tickets, archived_at) for every archived year."""
+    with _raw_connection(bind) as db:
+        return db.execute("SELECT year, path, visits, tickets, archived_at FROM archive_years ORDER BY year").fetchall()
+
+# --- History sessions ---
+visits_all = table("visits_all", *(column(c) for c in VISIT_COLUMNS))
+ticket_purchases_all = table("ticket_purchases_all", *(column(c) for c in TICKET_COLUMNS))
+
+def _history_views(schemas: list[str]) -> list[str]:
+    visits_cols, ticket_cols = ", ".join(VISIT_COLUMNS), ", ".join(TICKET_COLUMNS)
+    visits = [f"SELECT {visits_cols} FROM main.visits"]
+    tickets = [f"SELECT {ticket_cols} FROM main.ticket_purchases"]
+    for schema in schemas:
+        visits.append(f"SELECT {visits_cols} FROM {schema}.visits WHERE NOT ({_ORPHAN_VISITS})")
+        tickets.append(f"SELECT {ticket_cols} FROM {schema}.ticket_purchases WHERE NOT ({_ORPHAN_TICKETS})")
+    return [
+        "CREATE TEMP VIEW visits_all AS " + " UNION ALL ".join(visits),
+        "CREATE TEMP VIEW ticket_purchases_all AS " + " UNION ALL ".join(tickets),
+    ]
+
+def _attach_history(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        archives = _registered(dbapi_connection)
+        limit = dbapi_connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(dbapi_connection, "getlimit") else 10
+        if len(archives) > limit:
+            raise ArchiveError(f"{len(archives)} archived years exceed SQLite's limit of {limit} attached databases")
+        schemas = []
+        for year, path in archives:
+            cursor.execute(f"ATTACH DATABASE ? AS archive_{year}", (path,))
+            schemas.append(f"archive_{year}")
+        for ddl in _history_views(schemas):
+            cursor.execute(ddl)
+        for pragma in sqlite_pragmas(profile, readonly=True):
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+_history_engines: dict[str, Engine] = {}
+
+def history_engine(url: str = DATABASE_URL) -> Engine:
+    """Read-only engine whose connections see archived years through visits_all / ticket_purchases_all.
+
+    Connections are not pooled, so each one attaches the archives registered when it opens.
+    """
+    if not _is_file_database(url):
+        raise ArchiveError("Archives need a file database")
+    eng = _history_engines.get(url)
+    if eng is None:
+        eng = create_engine(url, future=True, poolclass=NullPool)
+        event.listen(eng, "connect", _attach_history)
+        _history_engines[url] = eng
+    return eng
+
+@contextmanager
+def history_session(url: str = DATABASE_URL) -> Iterator[Session]:
+    session = Session(bind=history_engine(url))
+    try:
+        yield session
+    finally:
+        session.close()
+
+def yearly_visit_counts(session: Session, exhibit_id: int | None = None):
+    """(year, visits) over hot and archived visits; needs a history_session."""
+    year = func.substr(visits_all.c.visit_date, 1, 4)
+    stmt = select(year.label("year"), func.count().label("visits")).group_by(year).order_by(year)
+    if exhibit_id is not None:
+        stmt = stmt.where(visits_all.c.exhibit_id == exhibit_id)
+    return session.execute(stmt).all()
+
+def yearly_ticket_sales(session: Session):
+    """(year, tickets, revenue) over hot and archived ticket purchases; needs a history_session."""
+    year = func.substr(ticket_purchases_all.c.purchase_date, 1, 4)
+    stmt = (
+        select(year.label("year"), func.count().label("tickets"), func.round(func.sum(ticket_purchases_all.c.price), 2).label("revenue"))
+        .group_by(year)
+        .order_by(year)
+    )
+    return session.execute(stmt).all()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import functools
+import itertools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import LOOKUP_CACHE_ENABLED, LOOKUP_CACHE_SIZE, LOOKUP_CACHE_TTL, QUERY_CACHE_ENABLED, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from utils.db_connection import on_write
+
+_DIRTY_KEY = "query_cache_dirty"
+_DIRTY_CACHES_KEY = "query_cache_dirty_caches"
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    size: int
+    generation: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class QueryCache:
+    """Size-bounded LRU with a TTL, invalidated wholesale by a generation counter.
+
+    Entries remember the generation they were computed under; bumping the
+    generation (after any committed write) turns every older entry into a miss.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0, enabled: bool = True, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[int, float, object]] = OrderedDict()
+        self._generation = 0
+        self._changed_at = time.time()  # wall clock of the last bump, for HTTP Last-Modified
+        self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def changed_at(self) -> float:
+        return self._changed_at
+
+    def bump(self) -> int:
+        with self._lock:
+            self._generation += 1
+            self._changed_at = time.time()
+            self._invalidations += 1
+            return self._generation
+
+    def get(self, key: tuple) -> tuple[bool, object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                generation, stored_at, value = entry
+                if generation == self._generation and self._clock() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, value
+                del self._entries[key]
+                if generation == self._generation:
+                    self._expirations += 1
+            self._misses += 1
+            return False, None
+
+    def put(self, key: tuple, value: object, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return  # a write committed while we were computing; don't cache stale data
+            self._entries[key] = (generation, self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+                size=len(self._entries),
+                generation=self._generation,
+            )
+
+query_cache = QueryCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, enabled=QUERY_CACHE_ENABLED)
+
+# Typeahead results. Kept apart from query_cache because they only go stale when
+# the looked-up table changes, not on every visit or ticket sale.
+lookup_cache = QueryCache(maxsize=LOOKUP_CACHE_SIZE, ttl=LOOKUP_CACHE_TTL, enabled=LOOKUP_CACHE_ENABLED)
+
+# Extra caches to invalidate when ORM instances of a model are flushed
+_model_caches: dict[type, list[QueryCache]] = {}
+
+def invalidate_on(model: type, cache: QueryCache) -> None:
+    """Bump cache's generation whenever a commit changes rows of model through the ORM.
+
+    Core statements (bulk inserts) bypass the flush; call mark_dirty(session, cache) there.
+    """
+    _model_caches.setdefault(model, []).append(cache)
+
+# Results are cached per database: each engine gets a small integer token.
+_bind_tokens: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_token_counter = itertools.count(1)
+_token_lock = threading.Lock()
+
+def _bind_token(session: Session) -> int:
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    with _token_lock:
+        token = _bind_tokens.get(engine)
+        if token is None:
+            token = _bind_tokens[engine] = next(_token_counter)
+        return token
+
+def cached_query(fn=None, *, cache: QueryCache | None = None):
+    """Memoize a read-only repository function taking (session, *args, **kwargs).
+
+    Only use on functions returning plain rows (not ORM instances bound to the session).
+    Results go to query_cache unless another cache is given.
+    """
+    if fn is None:
+        return functools.partial(cached_query, cache=cache)
+
+    @functools.wraps(fn)
+    def wrapper(session: Session, *args, **kwargs):
+        store = cache or query_cache
+        if not store.enabled or session.info.get(_DIRTY_KEY) or session.info.get(_DIRTY_CACHES_KEY):
+            # Uncommitted writes in this session must be visible to its own reads.
+            return fn(session, *args, **kwargs)
+        generation = store.generation
+        key = (fn.__qualname__, _bind_token(session), args, tuple(sorted(kwargs.items())))
+        hit, value = store.get(key)
+        if hit:
+            return list(value)
+        value = fn(session, *args, **kwargs)
+        store.put(key, tuple(value), generation)
+        return value
+    return wrapper
+
+def mark_dirty(session: Session, *caches: QueryCache) -> None:
+    """Invalidate query_cache (and any extra caches given) when the session commits."""
+    session.info[_DIRTY_KEY] = True
+    if caches:
+        session.info.setdefault(_DIRTY_CACHES_KEY, set()).update(caches)
+
+def invalidates_cache(fn):
+    """Mark the session so the cache generation is bumped when it commits."""
+    @functools.wraps(fn)
+    def wrapper(session: Session, *args, **kwargs):
+        mark_dirty(session)
+        return fn(session, *args, **kwargs)
+    return wrapper
+
+@on_write
+def _invalidate_after_pooled_write(tables: set[str]) -> None:
+    # Raw sqlite3 writes (services/visitor_service.py) that no Session hook sees
+    query_cache.bump()
+    for model, caches in _model_caches.items():
+        if model.__tablename__ in tables:
+            for cache in caches:
+                cache.bump()
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session, flush_context):
+    # ORM changes made outside the repository write functions (e.g. session.delete).
+    if session.new or session.dirty or session.deleted:
+        mark_dirty(session)
+        if _model_caches:
+            touched = {type(obj) for obj in (*session.new, *session.dirty, *session.deleted)}
+            mark_dirty(session, *(c for model in touched for c in _model_caches.get(model, ())))
+
+@event.listens_for(Session, "after_commit")
+def _bump_generation_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        query_cache.bump()
+    for cache in session.info.pop(_DIRTY_CACHES_KEY, ()):
+        cache.bump()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_writes(session, previous_transaction):
+    if previous_transaction.parent is None and not previous_transaction.nested:
+        session.info.pop(_DIRTY_KEY, None)
+        session.info.pop(_DIRTY_CACHES_KEY, None)
+
+def cache_stats(cache: QueryCache | None = None) -> CacheStats:
+    return (cache or query_cache).stats()
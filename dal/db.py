@@ -2,40 +2,118 @@ from __future__ import annotations
 
 from contextlib import contextmanager
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session
 
-from config import DATABASE_URL
+from config import DATABASE_URL, DB_SPLIT_READ_WRITE
+from utils.sqlite_profiles import PROFILES, EngineProfile, get_profile, sqlite_pragmas  # noqa: F401 (re-exported)
 
-# Engine configured for SQLite foreign keys and reasonable defaults
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True,
-)
+profile = get_profile()
+
+def _is_file_database(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+def _install_pragmas(eng: Engine, prof: EngineProfile, readonly: bool) -> None:
+    pragmas = sqlite_pragmas(prof, readonly)
+
+    @event.listens_for(eng, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def _use_explicit_begin(eng: Engine) -> None:
+    # pysqlite only opens a transaction lazily before DML, which breaks SAVEPOINT
+    # (per-item isolation in group commits) and lets two writers deadlock when
+    # they upgrade from a read lock. Take the write lock up front instead.
+    @event.listens_for(eng, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(eng, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _create_engines(url: str, prof: EngineProfile, split: bool) -> tuple[Engine, Engine]:
+    if not _is_file_database(url):
+        # In-memory / non-SQLite URLs: one engine serves both intents
+        eng = create_engine(url, echo=False, future=True, pool_pre_ping=prof.pool_pre_ping)
+        _install_pragmas(eng, prof, readonly=False)
+        return eng, eng
+
+    # Single serialized writer: one pooled connection, other writers queue for it in-process
+    writer = create_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=prof.write_wait_s,
+        pool_pre_ping=prof.pool_pre_ping,
+    )
+    _install_pragmas(writer, prof, readonly=False)
+    _use_explicit_begin(writer)
+    if not split:
+        return writer, writer
 
-from sqlalchemy.orm import sessionmaker
+    # WAL readers see the last committed snapshot and never wait for the writer
+    reader = create_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=prof.read_pool_size,
+        max_overflow=prof.read_pool_size,
+        pool_pre_ping=prof.pool_pre_ping,
+    )
+    _install_pragmas(reader, prof, readonly=True)
+    return writer, reader
+
+write_engine, read_engine = _create_engines(DATABASE_URL, profile, DB_SPLIT_READ_WRITE)
+
+# Backwards-compatible name: DDL, migrations and writes go through the writer
+engine = write_engine
 
 SessionLocal = sessionmaker(
-    bind=engine,
+    bind=write_engine,
     autoflush=False,
     autocommit=False,
     expire_on_commit=False,   # ✅ IMPORTANT
     future=True
 )
 
+ReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    autoflush=False,
+    autocommit=False,
+    expire_on_commit=False,
+    future=True
+)
 
-@event.listens_for(engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    # Enable FK enforcement in SQLite
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    cursor.execute("PRAGMA journal_mode = WAL;")
-    cursor.execute("PRAGMA synchronous = NORMAL;")
-    cursor.close()
+def all_engines() -> list[Engine]:
+    return [write_engine] if read_engine is write_engine else [write_engine, read_engine]
 
 @contextmanager
-def get_session() -> Session:
-    session: Session = SessionLocal()
+def get_session(intent: str = "write") -> Session:
+    """Open a session for the given intent.
+
+    "write" (default) uses the single writer connection; "read" uses the
+    read-only pool and must not be used for INSERT/UPDATE/DELETE. "analytics"
+    reads the analytics snapshot (up to ANALYTICS_SNAPSHOT_MAX_AGE seconds
+    old) when it is enabled, and is the same as "read" otherwise.
+    """
+    if intent == "write":
+        factory = SessionLocal
+    elif intent == "read":
+        factory = ReadSessionLocal
+    elif intent == "analytics":
+        from dal.snapshot import get_snapshot  # imports this module
+        snapshot = get_snapshot()
+        factory = snapshot.session if snapshot is not None else ReadSessionLocal
+    else:
+        raise ValueError(f"Unknown session intent '{intent}'")
+    session: Session = factory()
     try:
         yield session
         session.commit()
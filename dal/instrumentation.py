@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import QUERY_REPEAT_WARN, SLOW_QUERY_MS
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("dal.slow_query")
+
+_START_KEY = "instrumentation_query_start"
+OTHER_STATEMENTS = "<other statements>"
+# Statement columns a report may be ordered by (/metrics?sort=, query-report --sort)
+SORT_KEYS = ("total_ms", "p95_ms", "count", "max_ms", "avg_ms")
+
+# --- SQL normalization ---
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_ROWS = re.compile(r"(VALUES\s*\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Reduce a statement to its shape: literals become ?, lists of ? collapse.
+
+    `IN (1, 2, 3)` and a multi-row `VALUES` from a bulk insert both map to the
+    same key however many items they carry, and no literal values survive.
+    """
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(?...)", sql)
+    sql = _VALUES_ROWS.sub(r"\1", sql)
+    return sql
+
+def redact_parameters(parameters, executemany: bool = False) -> str:
+    """Describe bound parameters by type only, so slow-query logs carry no personal data."""
+    if executemany:
+        rows = list(parameters or [])
+        return f"<{len(rows)} rows of {redact_parameters(rows[0]) if rows else '()'}>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in (parameters or ())) + ")"
+
+# --- Per-request query scopes (N+1 detection) ---
+@dataclass
+class QueryScope:
+    label: str
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int = QUERY_REPEAT_WARN) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+_current_scope: contextvars.ContextVar[QueryScope | None] = contextvars.ContextVar("query_scope", default=None)
+
+def current_scope() -> QueryScope | None:
+    return _current_scope.get()
+
+@dataclass
+class _ScopeTotals:
+    scopes: int = 0
+    queries: int = 0
+    max_queries: int = 0
+    db_ms: float = 0.0
+    repeated_statement_scopes: int = 0
+
+class SqlStats:
+    """Process-wide statement timings, slow-query samples and per-scope query counts.
+
+    Distinct statement shapes are capped at max_statements; anything beyond
+    that is folded into one bucket so a query builder gone wrong cannot grow
+    memory without bound.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, repeat_warn: int = QUERY_REPEAT_WARN, max_statements: int = 500, slow_log_size: int = 50):
+        self.slow_ms = slow_ms
+        self.repeat_warn = repeat_warn
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements: dict[str, Histogram] = {}
+        self._slow: deque[dict] = deque(maxlen=slow_log_size)
+        self._scopes: dict[str, _ScopeTotals] = {}
+
+    def record(self, statement: str, elapsed_ms: float, parameters=None, executemany: bool = False) -> None:
+        sql = normalize_sql(statement)
+        hist = self._statements.get(sql)
+        if hist is None:
+            with self._lock:
+                key = sql if len(self._statements) < self.max_statements else OTHER_STATEMENTS
+                hist = self._statements.setdefault(key, Histogram())
+        hist.observe(elapsed_ms)
+
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.count += 1
+            scope.total_ms += elapsed_ms
+            scope.statements[sql] += 1
+
+        if elapsed_ms >= self.slow_ms:
+            params = redact_parameters(parameters, executemany)
+            where = f" [{scope.label}]" if scope is not None else ""
+            slow_query_logger.warning("Slow query %.1f ms%s: %s params=%s", elapsed_ms, where, sql, params)
+            with self._lock:
+                self._slow.append({
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                    "ms": round(elapsed_ms, 3),
+                    "scope": scope.label if scope is not None else None,
+                    "sql": sql,
+                    "params": params,
+                })
+
+    def begin_scope(self, label: str) -> tuple[QueryScope, contextvars.Token]:
+        scope = QueryScope(label)
+        return scope, _current_scope.set(scope)
+
+    def end_scope(self, scope: QueryScope, token: contextvars.Token) -> None:
+        _current_scope.reset(token)
+        repeated = scope.repeated(self.repeat_warn)
+        for sql, n in repeated:
+            logger.warning("Possible N+1 in %s: statement ran %d times: %s", scope.label, n, sql)
+        with self._lock:
+            totals = self._scopes.setdefault(scope.label, _ScopeTotals())
+            totals.scopes += 1
+            totals.queries += scope.count
+            totals.max_queries = max(totals.max_queries, scope.count)
+            totals.db_ms += scope.total_ms
+            if repeated:
+                totals.repeated_statement_scopes += 1
+
+    @contextmanager
+    def scope(self, label: str):
+        """Count the queries run inside the block (e.g. one web request or CLI command)."""
+        scope, token = self.begin_scope(label)
+        try:
+            yield scope
+        finally:
+            self.end_scope(scope, token)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+            self._scopes.clear()
+
+    def snapshot(self, top: int = 25, sort: str = "total_ms") -> dict:
+        if sort not in SORT_KEYS:
+            sort = "total_ms"  # e.g. ?sort=buckets from /metrics: not a sortable number
+        with self._lock:
+            statements = list(self._statements.items())
+            slow = list(self._slow)
+            scopes = {label: vars(t).copy() for label, t in self._scopes.items()}
+        rows = [{"sql": sql, **hist.snapshot()} for sql, hist in statements]
+        rows.sort(key=lambda r: r[sort], reverse=True)
+        for totals in scopes.values():
+            totals["avg_queries"] = round(totals["queries"] / totals["scopes"], 2) if totals["scopes"] else 0.0
+            totals["db_ms"] = round(totals["db_ms"], 3)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "distinct_statements": len(rows),
+            "executions": sum(r["count"] for r in rows),
+            "statements": rows[:top],
+            "slow_queries": slow,
+            "scopes": scopes,
+        }
+
+sql_stats = SqlStats()
+
+# --- Engine hooks ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_START_KEY)
+    if not starts:
+        return
+    sql_stats.record(statement, (time.perf_counter() - starts.pop()) * 1000, parameters, executemany)
+
+def _on_error(exception_context):
+    conn = exception_context.connection
+    starts = conn.info.get(_START_KEY) if conn is not None else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the timing hooks to an engine (idempotent)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+def instrument_engines() -> None:
+    from dal.db import all_engines
+    for engine in all_engines():
+        instrument_engine(engine)
+
+# --- Reporting ---
+def format_report(snapshot: dict, top: int = 20, sort: str = "total_ms") -> str:
+    """Render a /metrics snapshot (or its "sql" section) as a plain-text report."""
+    sql = snapshot.get("sql", snapshot)
+    lines = []
+    routes = snapshot.get("routes")
+    if routes:
+        lines.append(f"{'requests':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'db avg':>8} {'tpl avg':>8} {'KiB avg':>8}  route")
+        for label, r in sorted(routes.items(), key=lambda kv: kv[1]["p95_ms"], reverse=True):
+            lines.append(f"{r['count']:>8} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['db_ms_avg']:>8.1f} {r['template_ms_avg']:>8.1f} {r['bytes_avg'] / 1024:>8.1f}  {label}")
+        lines.append("")
+    lines += [f"{sql['executions']} statements executed, {sql['distinct_statements']} distinct shapes (slow >= {sql['slow_query_ms']} ms)", ""]
+    lines.append(f"{'count':>8} {'total ms':>10} {'avg':>8} {'p95':>8} {'max':>8}  statement")
+    key = sort if sort in SORT_KEYS else "total_ms"
+    for row in sorted(sql["statements"], key=lambda r: r.get(key, 0), reverse=True)[:top]:
+        text = row["sql"] if len(row["sql"]) <= 100 else row["sql"][:97] + "..."
+        lines.append(f"{row['count']:>8} {row['total_ms']:>10.1f} {row['avg_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['max_ms']:>8.2f}  {text}")
+
+    if sql["scopes"]:
+        lines += ["", f"{'requests':>8} {'avg q':>7} {'max q':>7} {'N+1?':>6}  scope"]
+        for label, t in sorted(sql["scopes"].items(), key=lambda kv: kv[1]["avg_queries"], reverse=True):
+            lines.append(f"{t['scopes']:>8} {t['avg_queries']:>7.1f} {t['max_queries']:>7} {t['repeated_statement_scopes']:>6}  {label}")
+
+    if sql["slow_queries"]:
+        lines += ["", "Recent slow queries:"]
+        for q in sql["slow_queries"][-10:]:
+            lines.append(f"  {q['at']} {q['ms']:>9.1f} ms {q['scope'] or '-'}: {q['sql'][:100]} {q['params']}")
+    return "\n".join(lines)
@@ -3,11 +3,13 @@ from __future__ import annotations
 from datetime import date, datetime
 from sqlalchemy import (
     CheckConstraint,
+    Computed,
     Date,
     DateTime,
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     Numeric,
     String,
     Text,
@@ -31,6 +33,13 @@ class Artefact(Base):
     conservation_records = relationship("ConservationRecord", back_populates="artefact", cascade="all, delete-orphan")
     exhibits = relationship("Exhibit", secondary="exhibit_artefacts", back_populates="artefacts")
 
+    # Keyset paging / prefix lookup (SQLite appends the rowid, i.e. artefact_id, to each index)
+    __table_args__ = (
+        Index("ix_artefacts_name", "name"),
+        Index("ix_artefacts_material", "material"),
+        Index("ix_artefacts_acquisition_date", "acquisition_date"),
+    )
+
 class Exhibit(Base):
     __tablename__ = "exhibits"
 
@@ -41,6 +50,7 @@ class Exhibit(Base):
 
     __table_args__ = (
         CheckConstraint("(end_date IS NULL) OR (start_date IS NULL) OR (end_date >= start_date)", name="ck_exhibit_dates"),
+        Index("ix_exhibits_title", "title"),
     )
 
     artefacts = relationship("Artefact", secondary="exhibit_artefacts", back_populates="exhibits")
@@ -63,6 +73,10 @@ class Visitor(Base):
     visitor_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     full_name: Mapped[str] = mapped_column(String(200), nullable=False)
     email: Mapped[str] = mapped_column(String(254), nullable=False, unique=True)
+    # Case-folded copies for typeahead prefix ranges (VIRTUAL: stored only in their indexes).
+    # SQLite's lower() folds ASCII only; repositories.lookup_visitors folds the query the same way.
+    email_lower: Mapped[str] = mapped_column(String(254), Computed("lower(email)", persisted=False))
+    name_lower: Mapped[str] = mapped_column(String(200), Computed("lower(full_name)", persisted=False))
 
     # Demographics (keep minimal to support GDPR discussion)
     age_band: Mapped[str | None] = mapped_column(String(50))
@@ -73,6 +87,11 @@ class Visitor(Base):
     tickets = relationship("TicketPurchase", back_populates="visitor", cascade="all, delete-orphan")
     feedback = relationship("Feedback", back_populates="visitor", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_visitors_email_lower", "email_lower"),
+        Index("ix_visitors_name_lower", "name_lower"),
+    )
+
 class Visit(Base):
     __tablename__ = "visits"
 
@@ -80,6 +99,10 @@ class Visit(Base):
     visitor_id: Mapped[int] = mapped_column(ForeignKey("visitors.visitor_id", ondelete="CASCADE"), nullable=False)
     exhibit_id: Mapped[int] = mapped_column(ForeignKey("exhibits.exhibit_id", ondelete="CASCADE"), nullable=False)
     visit_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Calendar buckets derived by SQLite (VIRTUAL: computed on read, stored only in their indexes)
+    visit_month: Mapped[str] = mapped_column(String(7), Computed("strftime('%Y-%m', visit_date)", persisted=False))  # YYYY-MM
+    visit_week: Mapped[str] = mapped_column(String(7), Computed("strftime('%Y-%W', visit_date)", persisted=False))  # YYYY-WW, weeks start Monday
+    visit_dow: Mapped[int] = mapped_column(Integer, Computed("CAST(strftime('%w', visit_date) AS INTEGER)", persisted=False))  # 0 = Sunday
 
     visitor = relationship("Visitor", back_populates="visits")
     exhibit = relationship("Exhibit", back_populates="visits")
@@ -87,6 +110,49 @@ class Visit(Base):
     __table_args__ = (
         Index("ix_visits_exhibit_date", "exhibit_id", "visit_date"),
         Index("ix_visits_visitor_date", "visitor_id", "visit_date"),
+        Index("ix_visits_month_exhibit", "visit_month", "exhibit_id"),
+        Index("ix_visits_week_exhibit", "visit_week", "exhibit_id"),
+        Index("ix_visits_dow_exhibit", "visit_dow", "exhibit_id"),
+    )
+
+class VisitDailyRollup(Base):
+    """Visits per exhibit per day, kept current by triggers on visits (see database/migrations.py)."""
+    __tablename__ = "visit_daily_rollups"
+
+    exhibit_id: Mapped[int] = mapped_column(ForeignKey("exhibits.exhibit_id", ondelete="CASCADE"), primary_key=True)
+    visit_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    visit_month: Mapped[str] = mapped_column(String(7), Computed("strftime('%Y-%m', visit_date)", persisted=False))
+
+    # The month indexes carry visit_date and visit_count so monthly totals are answered from the index alone
+    __table_args__ = (
+        Index("ix_visit_rollups_date", "visit_date"),
+        Index("ix_visit_rollups_month", "visit_month", "visit_date", "visit_count"),
+        Index("ix_visit_rollups_exhibit_month", "exhibit_id", "visit_month", "visit_date", "visit_count"),
+    )
+
+class VisitSketch(Base):
+    """HyperLogLog sketch of the visitors to an exhibit on a day (dal/sketches.py), merged for unique counts."""
+    __tablename__ = "visit_sketches"
+
+    exhibit_id: Mapped[int] = mapped_column(ForeignKey("exhibits.exhibit_id", ondelete="CASCADE"), primary_key=True)
+    visit_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_visit_sketches_date", "visit_date"),
+    )
+
+class RegionVisitSketch(Base):
+    """HyperLogLog sketch of the visitors from a region on a day ('' = no region recorded)."""
+    __tablename__ = "region_visit_sketches"
+
+    region: Mapped[str] = mapped_column(String(80), primary_key=True)
+    visit_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_region_visit_sketches_date", "visit_date"),
     )
 
 class ConservationRecord(Base):
@@ -106,6 +172,25 @@ class ConservationRecord(Base):
         Index("ix_conservation_due_date", "due_date"),
     )
 
+class ArtefactConservationState(Base):
+    """Latest conservation record per artefact, maintained by triggers on conservation_records.
+
+    record_id is deliberately not a foreign key: the triggers re-point it when
+    the latest record is deleted or edited.
+    """
+    __tablename__ = "artefact_conservation_state"
+
+    artefact_id: Mapped[int] = mapped_column(ForeignKey("artefacts.artefact_id", ondelete="CASCADE"), primary_key=True)
+    record_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    condition: Mapped[str] = mapped_column(String(120), nullable=False)
+    due_date: Mapped[date | None] = mapped_column(Date)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_conservation_state_due", "due_date"),
+        Index("ix_conservation_state_condition_due", "condition", "due_date"),
+    )
+
 class TicketPurchase(Base):
     __tablename__ = "ticket_purchases"
 
@@ -114,12 +199,17 @@ class TicketPurchase(Base):
     ticket_type: Mapped[str] = mapped_column(String(50), nullable=False)  # Adult/Student/Member
     price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     purchase_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    purchase_month: Mapped[str] = mapped_column(String(7), Computed("strftime('%Y-%m', purchase_date)", persisted=False))
+    purchase_week: Mapped[str] = mapped_column(String(7), Computed("strftime('%Y-%W', purchase_date)", persisted=False))
+    purchase_dow: Mapped[int] = mapped_column(Integer, Computed("CAST(strftime('%w', purchase_date) AS INTEGER)", persisted=False))
 
     visitor = relationship("Visitor", back_populates="tickets")
 
     __table_args__ = (
         CheckConstraint("price >= 0", name="ck_ticket_price_nonneg"),
         Index("ix_ticket_purchase_date", "purchase_date"),
+        Index("ix_ticket_purchases_month_type", "purchase_month", "ticket_type", "price"),
+        Index("ix_ticket_purchases_dow_type", "purchase_dow", "ticket_type", "price"),
     )
 
 class Feedback(Base):
@@ -152,3 +242,38 @@ class User(Base):
     __table_args__ = (
         CheckConstraint("role IN ('admin','curator','front_desk')", name="ck_user_role"),
     )
+
+class ArchiveYear(Base):
+    """A closed year whose visits and ticket purchases live in a separate SQLite file (dal/archive.py)."""
+    __tablename__ = "archive_years"
+
+    year: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    path: Mapped[str] = mapped_column(String(500), nullable=False)
+    visits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tickets: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+class MaintenanceFlag(Base):
+    """Set for the duration of a bulk maintenance transaction; triggers consult it (e.g. 'archiving')."""
+    __tablename__ = "maintenance_flags"
+
+    name: Mapped[str] = mapped_column(String(40), primary_key=True)
+    set_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ImportProgress(Base):
+    """Data rows of a CSV file already imported, committed together with them (integrations/csv_import.py)."""
+    __tablename__ = "import_progress"
+
+    source: Mapped[str] = mapped_column(String(1000), primary_key=True)  # resolved file path, or the caller's key
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(100), nullable=False)  # file size and mtime when the import started
+    rows_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+class SchemaVersion(Base):
+    """One row per applied schema migration (database/migrations.py)."""
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String(120), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
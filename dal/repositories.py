@@ -1,21 +1,88 @@
 from __future__ import annotations
 
+import base64
+import json
+import re
+import string
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import date, datetime
-from sqlalchemy import func, select, desc
+from sqlalchemy import func, select, desc, insert, delete, tuple_, literal, literal_column, table, column, union_all, text
 from sqlalchemy.orm import Session
 
+from dal.cache import cached_query, invalidate_on, invalidates_cache, lookup_cache, mark_dirty
+from dal.sketches import add_visits as add_visits_to_sketches, error_bound, estimate_groups, merge_blobs, sketch_visits, store_sketches
 from dal.models import (
+    ArchiveYear,
     Artefact,
     Exhibit,
     ExhibitArtefact,
     Visitor,
     Visit,
+    VisitDailyRollup,
+    VisitSketch,
+    RegionVisitSketch,
     ConservationRecord,
+    ArtefactConservationState,
     TicketPurchase,
     Feedback,
 )
 
+# --- Paging ---
+# Keyset ("seek") pagination: the cursor holds the sort key of the last row shown,
+# and the next page starts strictly after it, so every page costs one index range scan.
+MAX_PAGE_SIZE = 200
+
+@dataclass(frozen=True)
+class Page:
+    items: list
+    next_cursor: str | None
+
+def _encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid page cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid page cursor")
+    return values
+
+def _seek_page(session: Session, stmt, key_columns: list, after: str | None, limit: int) -> Page:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after:
+        values = _decode_cursor(after)
+        if len(values) != len(key_columns):
+            raise ValueError("Invalid page cursor")
+        stmt = stmt.where(tuple_(*key_columns) > tuple_(*[_cursor_value(c, v) for c, v in zip(key_columns, values)]))
+    rows = session.execute(stmt.order_by(*key_columns).limit(limit + 1)).all()
+    if len(rows) <= limit:
+        return Page(items=rows, next_cursor=None)
+    rows = rows[:limit]
+    last = rows[-1]
+    keys = [getattr(last, c.key) for c in key_columns]
+    return Page(items=rows, next_cursor=_encode_cursor([v.isoformat() if isinstance(v, date) else v for v in keys]))
+
+def _cursor_value(column, value):
+    # Date keys travel as ISO strings in the cursor
+    if isinstance(value, str) and column.type.python_type is date:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError("Invalid page cursor")
+    return value
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # Every string starting with prefix sorts below prefix + U+10FFFF (BINARY collation).
+    return prefix + "\U0010ffff"
+
 # --- Artefacts ---
+@invalidates_cache
 def create_artefact(session: Session, name: str, description: str | None, material: str | None, acquisition_date: date | None) -> Artefact:
     artefact = Artefact(name=name, description=description, material=material, acquisition_date=acquisition_date)
     session.add(artefact)
@@ -25,10 +92,59 @@ def create_artefact(session: Session, name: str, description: str | None, materi
 def list_artefacts(session: Session) -> list[Artefact]:
     return list(session.execute(select(Artefact).order_by(Artefact.artefact_id)).scalars())
 
+def page_artefacts(
+    session: Session,
+    after: str | None = None,
+    limit: int = 50,
+    order: str = "id",
+    material: str | None = None,
+    acquired_from: date | None = None,
+    acquired_to: date | None = None,
+) -> Page:
+    """One page of artefacts ordered by id or name, as plain rows.
+
+    Pass the previous page's next_cursor as after to continue.
+    """
+    if order not in ("id", "name"):
+        raise ValueError("order must be 'id' or 'name'")
+    stmt = select(
+        Artefact.artefact_id,
+        Artefact.name,
+        Artefact.material,
+        Artefact.acquisition_date,
+        Artefact.last_conservation_date,
+    )
+    if material:
+        stmt = stmt.where(Artefact.material == material)
+    if acquired_from:
+        stmt = stmt.where(Artefact.acquisition_date >= acquired_from)
+    if acquired_to:
+        stmt = stmt.where(Artefact.acquisition_date <= acquired_to)
+    keys = [Artefact.artefact_id] if order == "id" else [Artefact.name, Artefact.artefact_id]
+    return _seek_page(session, stmt, keys, after, limit)
+
+def lookup_artefacts(session: Session, q: str, limit: int = 20):
+    """Artefacts for a picker: exact id match or case-sensitive name prefix."""
+    q = q.strip()
+    if not q:
+        return []
+    cond = (Artefact.name >= q) & (Artefact.name < _prefix_upper_bound(q))
+    if q.isdigit():
+        cond = cond | (Artefact.artefact_id == int(q))
+    stmt = (
+        select(Artefact.artefact_id, Artefact.name)
+        .where(cond)
+        .order_by(Artefact.name, Artefact.artefact_id)
+        .limit(max(1, min(limit, MAX_PAGE_SIZE)))
+    )
+    return session.execute(stmt).all()
+
+@invalidates_cache
 def link_artefact_to_exhibit(session: Session, artefact_id: int, exhibit_id: int) -> None:
     session.add(ExhibitArtefact(artefact_id=artefact_id, exhibit_id=exhibit_id))
 
 # --- Exhibits ---
+@invalidates_cache
 def create_exhibit(session: Session, title: str, start_date: date | None, end_date: date | None) -> Exhibit:
     exhibit = Exhibit(title=title, start_date=start_date, end_date=end_date)
     session.add(exhibit)
@@ -38,27 +154,101 @@ def create_exhibit(session: Session, title: str, start_date: date | None, end_da
 def list_exhibits(session: Session) -> list[Exhibit]:
     return list(session.execute(select(Exhibit).order_by(Exhibit.exhibit_id)).scalars())
 
+def page_exhibits(session: Session, after: str | None = None, limit: int = 50, order: str = "id") -> Page:
+    if order not in ("id", "title"):
+        raise ValueError("order must be 'id' or 'title'")
+    stmt = select(Exhibit.exhibit_id, Exhibit.title, Exhibit.start_date, Exhibit.end_date)
+    keys = [Exhibit.exhibit_id] if order == "id" else [Exhibit.title, Exhibit.exhibit_id]
+    return _seek_page(session, stmt, keys, after, limit)
+
+def lookup_exhibits(session: Session, q: str, limit: int = 20):
+    q = q.strip()
+    if not q:
+        return []
+    cond = (Exhibit.title >= q) & (Exhibit.title < _prefix_upper_bound(q))
+    if q.isdigit():
+        cond = cond | (Exhibit.exhibit_id == int(q))
+    stmt = (
+        select(Exhibit.exhibit_id, Exhibit.title)
+        .where(cond)
+        .order_by(Exhibit.title, Exhibit.exhibit_id)
+        .limit(max(1, min(limit, MAX_PAGE_SIZE)))
+    )
+    return session.execute(stmt).all()
+
 # --- Visitors / Visits ---
+@invalidates_cache
 def create_visitor(session: Session, full_name: str, email: str, age_band: str | None = None, region: str | None = None, membership_type: str | None = None) -> Visitor:
     visitor = Visitor(full_name=full_name, email=email, age_band=age_band, region=region, membership_type=membership_type)
     session.add(visitor)
     session.flush()
     return visitor
 
+# Typeahead: each match kind is its own range scan on a lowercase index with a LIMIT,
+# so a one-letter prefix reads `limit` index entries however many visitors match.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+invalidate_on(Visitor, lookup_cache)
+
+def _prefix_range(column, prefix: str, limit: int):
+    return (
+        select(Visitor.visitor_id, Visitor.full_name, Visitor.email)
+        .where(column >= prefix)
+        .where(column < _prefix_upper_bound(prefix))
+        .order_by(column, Visitor.visitor_id)
+        .limit(limit)
+    )
+
+@cached_query(cache=lookup_cache)
+def lookup_visitors(session: Session, q: str, limit: int = 10):
+    """Visitors for a picker: exact id, then case-insensitive name prefix, then email prefix.
+
+    A query containing "@" only matches emails. Each visitor appears once.
+    """
+    prefix = q.strip().translate(_ASCII_LOWER)  # fold like SQLite's lower()
+    if not prefix:
+        return []
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = []
+    if prefix.isdigit():
+        rows += session.execute(
+            select(Visitor.visitor_id, Visitor.full_name, Visitor.email).where(Visitor.visitor_id == int(prefix))
+        ).all()
+    if "@" not in prefix:
+        rows += session.execute(_prefix_range(Visitor.name_lower, prefix, limit)).all()
+    rows += session.execute(_prefix_range(Visitor.email_lower, prefix, limit)).all()
+    seen, out = set(), []
+    for row in rows:
+        if row.visitor_id not in seen:
+            seen.add(row.visitor_id)
+            out.append(row)
+    return out[:limit]
+
+@invalidates_cache
 def record_visit(session: Session, visitor_id: int, exhibit_id: int, visit_date: date) -> Visit:
     v = Visit(visitor_id=visitor_id, exhibit_id=exhibit_id, visit_date=visit_date)
     session.add(v)
     session.flush()
+    _add_to_visit_sketches(session, [{"visitor_id": visitor_id, "exhibit_id": exhibit_id, "visit_date": v.visit_date}])
     return v
 
 # --- Tickets ---
-def record_ticket_purchase(session: Session, visitor_id: int, ticket_type: str, price: float) -> TicketPurchase:
+def _as_datetime(value: date | datetime | None) -> datetime | None:
+    # purchase_date is a DATETIME column; plain dates from forms/CSV mean midnight.
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+@invalidates_cache
+def record_ticket_purchase(session: Session, visitor_id: int, ticket_type: str, price: float, purchase_date: date | datetime | None = None) -> TicketPurchase:
     purchase = TicketPurchase(visitor_id=visitor_id, ticket_type=ticket_type, price=price)
+    if purchase_date is not None:
+        purchase.purchase_date = _as_datetime(purchase_date)
     session.add(purchase)
     session.flush()
     return purchase
 
 # --- Feedback ---
+@invalidates_cache
 def record_feedback(session: Session, visitor_id: int, exhibit_id: int, rating: int, comments: str | None = None) -> Feedback:
     fb = Feedback(visitor_id=visitor_id, exhibit_id=exhibit_id, rating=rating, comments=comments)
     session.add(fb)
@@ -66,30 +256,241 @@ def record_feedback(session: Session, visitor_id: int, exhibit_id: int, rating:
     return fb
 
 # --- Conservation ---
+@invalidates_cache
 def add_conservation_record(session: Session, artefact_id: int, condition: str, treatment: str | None = None, due_date: date | None = None, notes: str | None = None) -> ConservationRecord:
     rec = ConservationRecord(artefact_id=artefact_id, condition=condition, treatment=treatment, due_date=due_date, notes=notes)
     session.add(rec)
     session.flush()
     return rec
 
+# --- Batch writes ---
+# Set-based counterparts of the record_* functions for nightly loads: one INSERT
+# executemany per call instead of one flush per row. CHECK constraints and the
+# trg_no_future_visits trigger still run row by row inside SQLite, so a bad row
+# raises IntegrityError and the caller's transaction should be rolled back.
+def _bulk_insert(session: Session, model, rows: list[dict], return_objects: bool):
+    if not rows:
+        return [] if return_objects else 0
+    session.flush()
+    if return_objects:
+        return list(session.scalars(insert(model).returning(model), rows))
+    session.execute(insert(model), rows)
+    return len(rows)
+
+@invalidates_cache
+def create_artefacts_bulk(session: Session, artefacts: Iterable[Mapping], return_objects: bool = False) -> list[Artefact] | int:
+    rows = [
+        {
+            "name": a["name"],
+            "description": a.get("description"),
+            "material": a.get("material"),
+            "acquisition_date": a.get("acquisition_date"),
+        }
+        for a in artefacts
+    ]
+    return _bulk_insert(session, Artefact, rows, return_objects)
+
+@invalidates_cache
+def create_exhibits_bulk(session: Session, exhibits: Iterable[Mapping], return_objects: bool = False) -> list[Exhibit] | int:
+    rows = [
+        {"title": e["title"], "start_date": e.get("start_date"), "end_date": e.get("end_date")}
+        for e in exhibits
+    ]
+    return _bulk_insert(session, Exhibit, rows, return_objects)
+
+@invalidates_cache
+def create_visitors_bulk(session: Session, visitors: Iterable[Mapping], return_objects: bool = False) -> list[Visitor] | int:
+    rows = [
+        {
+            "full_name": v["full_name"],
+            "email": v["email"],
+            "age_band": v.get("age_band"),
+            "region": v.get("region"),
+            "membership_type": v.get("membership_type"),
+        }
+        for v in visitors
+    ]
+    mark_dirty(session, lookup_cache)  # Core insert: the ORM flush hook never sees these rows
+    return _bulk_insert(session, Visitor, rows, return_objects)
+
+@invalidates_cache
+def record_visits_bulk(session: Session, visits: Iterable[Mapping], return_objects: bool = False) -> list[Visit] | int:
+    """Insert many visits at once.
+
+    Each item needs visitor_id, exhibit_id and visit_date. Returns the inserted
+    Visit objects when return_objects is True, otherwise the number of rows.
+    """
+    rows = [
+        {"visitor_id": v["visitor_id"], "exhibit_id": v["exhibit_id"], "visit_date": v["visit_date"]}
+        for v in visits
+    ]
+    result = _bulk_insert(session, Visit, rows, return_objects)
+    _add_to_visit_sketches(session, rows)
+    return result
+
+@invalidates_cache
+def record_ticket_purchases_bulk(session: Session, purchases: Iterable[Mapping], return_objects: bool = False) -> list[TicketPurchase] | int:
+    """Insert many ticket purchases at once.
+
+    Each item needs visitor_id, ticket_type and price; purchase_date is optional
+    and defaults to now.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "visitor_id": p["visitor_id"],
+            "ticket_type": p["ticket_type"],
+            "price": p["price"],
+            "purchase_date": _as_datetime(p.get("purchase_date")) or now,
+        }
+        for p in purchases
+    ]
+    return _bulk_insert(session, TicketPurchase, rows, return_objects)
+
+@invalidates_cache
+def record_feedback_bulk(session: Session, feedback: Iterable[Mapping], return_objects: bool = False) -> list[Feedback] | int:
+    """Insert many feedback rows at once.
+
+    Each item needs visitor_id, exhibit_id and rating; comments and
+    submitted_at are optional.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "visitor_id": f["visitor_id"],
+            "exhibit_id": f["exhibit_id"],
+            "rating": f["rating"],
+            "comments": f.get("comments"),
+            "submitted_at": f.get("submitted_at") or now,
+        }
+        for f in feedback
+    ]
+    return _bulk_insert(session, Feedback, rows, return_objects)
+
+@invalidates_cache
+def add_conservation_records_bulk(session: Session, records: Iterable[Mapping], return_objects: bool = False) -> list[ConservationRecord] | int:
+    """Insert many conservation records at once (trg_update_last_conservation still fires per row)."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "artefact_id": r["artefact_id"],
+            "condition": r["condition"],
+            "treatment": r.get("treatment"),
+            "due_date": r.get("due_date"),
+            "notes": r.get("notes"),
+            "recorded_at": r.get("recorded_at") or now,
+        }
+        for r in records
+    ]
+    return _bulk_insert(session, ConservationRecord, rows, return_objects)
+
+# --- Full-text search ---
+# artefacts_fts / exhibits_fts are FTS5 external-content indexes kept in step by
+# triggers (database/migrations.py); they store only the index, not a copy of the rows.
+artefacts_fts = table("artefacts_fts", column("rowid"))
+exhibits_fts = table("exhibits_fts", column("rowid"))
+SEARCH_KINDS = ("artefact", "exhibit")
+# Markers around matched terms in snippets; the web layer turns them into <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = "\x02", "\x03"
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+@dataclass(frozen=True)
+class SearchHit:
+    kind: str  # "artefact" or "exhibit"
+    id: int
+    title: str
+    snippet: str
+    rank: float
+
+def _fts_query(q: str) -> str | None:
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    terms = _SEARCH_TERM.findall(q)[:16]
+    if not terms:
+        return None
+    return " ".join([*(f'"{term}"' for term in terms[:-1]), f'"{terms[-1]}"*'])
+
+# kind -> (fts table, content id column, title column, bm25 column weights)
+_SEARCH_SOURCES = {
+    "artefact": (artefacts_fts, Artefact.artefact_id, Artefact.name, (10.0, 1.0, 3.0)),
+    "exhibit": (exhibits_fts, Exhibit.exhibit_id, Exhibit.title, (10.0,)),
+}
+
+def search_catalogue(session: Session, q: str, kind: str | None = None, after: str | None = None, limit: int = 20) -> Page:
+    """Ranked full-text search over artefacts (name, description, material) and exhibit titles.
+
+    Items are SearchHit; lower rank is a better match (bm25, name/title
+    weighted highest). Pages are keyset-paged on (rank, kind, id). Ranking
+    reads only the FTS indexes; titles and snippets are fetched for the page's
+    rows alone.
+    """
+    if kind is not None and kind not in SEARCH_KINDS:
+        raise ValueError(f"Unknown search kind: {kind!r}")
+    match = _fts_query(q)
+    if match is None:
+        return Page(items=[], next_cursor=None)
+
+    kinds = [kind] if kind else list(SEARCH_KINDS)
+    ranked = []
+    for k in kinds:
+        fts = _SEARCH_SOURCES[k][0]
+        ranked.append(
+            select(
+                literal(k).label("kind"),
+                fts.c.rowid.label("id"),
+                func.bm25(literal_column(fts.name), *_SEARCH_SOURCES[k][3]).label("rank"),
+            ).where(literal_column(fts.name).op("MATCH")(match))
+        )
+    hits = (union_all(*ranked) if len(ranked) > 1 else ranked[0]).subquery("hits")
+    page = _seek_page(session, select(hits), [hits.c.rank, hits.c.kind, hits.c.id], after, limit)
+
+    details = {}
+    for k in kinds:
+        ids = [row.id for row in page.items if row.kind == k]
+        if not ids:
+            continue
+        fts, id_col, title_col, _ = _SEARCH_SOURCES[k]
+        fts_col = literal_column(fts.name)
+        stmt = (
+            select(id_col, title_col, func.snippet(fts_col, -1, HIGHLIGHT_START, HIGHLIGHT_END, "…", 12))
+            .select_from(fts)
+            .join(id_col.table, id_col == fts.c.rowid)
+            .where(fts_col.op("MATCH")(match))
+            .where(fts.c.rowid.in_(ids))
+        )
+        for row_id, title, snippet in session.execute(stmt):
+            details[(k, row_id)] = (title, snippet)
+    items = [SearchHit(row.kind, row.id, *details[(row.kind, row.id)], rank=row.rank) for row in page.items if (row.kind, row.id) in details]
+    return Page(items=items, next_cursor=page.next_cursor)
+
+@invalidates_cache
+def rebuild_search_index(session: Session, optimize: bool = False) -> None:
+    """Rebuild the FTS5 indexes from the artefacts/exhibits tables (after bulk loads with triggers off)."""
+    for name in ("artefacts_fts", "exhibits_fts"):
+        session.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+        if optimize:
+            session.execute(text(f"INSERT INTO {name}({name}) VALUES ('optimize')"))
+
 # --- Analytics / advanced queries ---
+@cached_query
 def visit_counts_by_exhibit(session: Session, start: date | None = None, end: date | None = None):
+    # Served from visit_daily_rollups (one row per exhibit/day) instead of scanning visits.
     stmt = (
         select(
             Exhibit.exhibit_id,
             Exhibit.title,
-            func.count(Visit.visit_id).label("visit_count"),
+            func.sum(VisitDailyRollup.visit_count).label("visit_count"),
         )
-        .join(Visit, Visit.exhibit_id == Exhibit.exhibit_id)
+        .join(VisitDailyRollup, VisitDailyRollup.exhibit_id == Exhibit.exhibit_id)
         .group_by(Exhibit.exhibit_id, Exhibit.title)
         .order_by(desc("visit_count"))
     )
     if start:
-        stmt = stmt.where(Visit.visit_date >= start)
+        stmt = stmt.where(VisitDailyRollup.visit_date >= start)
     if end:
-        stmt = stmt.where(Visit.visit_date <= end)
+        stmt = stmt.where(VisitDailyRollup.visit_date <= end)
     return session.execute(stmt).all()
 
+@cached_query
 def top_visitors(session: Session, limit: int = 5):
     stmt = (
         select(
@@ -105,6 +506,7 @@ def top_visitors(session: Session, limit: int = 5):
     )
     return session.execute(stmt).all()
 
+@cached_query
 def average_rating_by_exhibit(session: Session):
     stmt = (
         select(
@@ -119,39 +521,423 @@ def average_rating_by_exhibit(session: Session):
     )
     return session.execute(stmt).all()
 
-def conservation_due_soon(session: Session, within_days: int = 30, days: int | None = None):
-    """Return conservation records due soon.
+def _due_cutoff(within_days: int) -> date:
+    today = date.today()
+    return today.fromordinal(today.toordinal() + within_days)
+
+def _conservation_due(within_days: int):
+    # Served from artefact_conservation_state (one row per artefact, maintained by
+    # triggers), so the cost follows the artefacts due, not the length of the history.
+    state = ArtefactConservationState
+    return (
+        select(Artefact.artefact_id, Artefact.name, state.due_date, state.condition)
+        .join(Artefact, Artefact.artefact_id == state.artefact_id)
+        .where(state.due_date.is_not(None))
+        .where(state.due_date <= _due_cutoff(within_days))
+    )
+
+@cached_query
+def conservation_due_soon(session: Session, within_days: int = 30, days: int | None = None, limit: int | None = None):
+    """Return artefacts whose latest conservation record is due (or overdue) soon.
+
+    Superseded records are ignored: an artefact appears at most once, with the
+    due date and condition of its newest record.
 
     Args:
         within_days: Preferred parameter name.
         days: Backwards-compatible alias used by some callers.
+        limit: Return only the first rows by due date.
     """
     if days is not None:
         within_days = days
-    today = date.today()
-    cutoff = today.fromordinal(today.toordinal() + within_days)
+    state = ArtefactConservationState
+    stmt = _conservation_due(within_days).order_by(state.due_date.asc(), state.artefact_id.asc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return session.execute(stmt).all()
+
+def page_conservation_due(session: Session, within_days: int = 30, condition: str | None = None, after: str | None = None, limit: int = 50) -> Page:
+    """One page of the due-soon list, ordered by due date, optionally for one condition."""
+    state = ArtefactConservationState
+    stmt = _conservation_due(within_days)
+    if condition:
+        stmt = stmt.where(state.condition == condition)
+    return _seek_page(session, stmt, [state.due_date, state.artefact_id], after, limit)
+
+@cached_query
+def conservation_due_by_condition(session: Session, within_days: int = 30):
+    """(condition, artefacts, earliest_due) for artefacts due within the window."""
+    state = ArtefactConservationState
+    stmt = (
+        select(state.condition, func.count().label("artefacts"), func.min(state.due_date).label("earliest_due"))
+        .where(state.due_date.is_not(None))
+        .where(state.due_date <= _due_cutoff(within_days))
+        .group_by(state.condition)
+        .order_by(func.count().desc(), state.condition)
+    )
+    return session.execute(stmt).all()
+
+# --- Calendar buckets ---
+# visits, ticket_purchases and visit_daily_rollups carry generated month/week/day-of-week
+# columns with indexes, so these group in index order instead of sorting strftime() results.
+def _bucketed_range(stmt, date_col, month_col, start: date | None, end: date | None):
+    # The month predicates let SQLite range-scan the bucket index; the date ones trim the edges.
+    if start:
+        stmt = stmt.where(month_col >= start.strftime("%Y-%m")).where(date_col >= start)
+    if end:
+        stmt = stmt.where(month_col <= end.strftime("%Y-%m")).where(date_col <= end)
+    return stmt
+
+def _purchase_range(stmt, start: date | None, end: date | None):
+    if start:
+        stmt = stmt.where(TicketPurchase.purchase_month >= start.strftime("%Y-%m"))
+        stmt = stmt.where(TicketPurchase.purchase_date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        stmt = stmt.where(TicketPurchase.purchase_month <= end.strftime("%Y-%m"))
+        stmt = stmt.where(TicketPurchase.purchase_date < datetime.combine(date.fromordinal(end.toordinal() + 1), datetime.min.time()))
+    return stmt
+
+@cached_query
+def monthly_visit_counts(session: Session, start: date | None = None, end: date | None = None):
+    # Rows of (ym, count), over the daily rollups' visit_month bucket
     stmt = (
         select(
-            Artefact.artefact_id,
-            Artefact.name,
-            ConservationRecord.due_date,
-            ConservationRecord.condition,
+            VisitDailyRollup.visit_month.label("ym"),
+            func.sum(VisitDailyRollup.visit_count).label("count"),
         )
-        .join(ConservationRecord, ConservationRecord.artefact_id == Artefact.artefact_id)
-        .where(ConservationRecord.due_date.is_not(None))
-        .where(ConservationRecord.due_date <= cutoff)
-        .order_by(ConservationRecord.due_date.asc())
+        .group_by(VisitDailyRollup.visit_month)
+        .order_by(VisitDailyRollup.visit_month)
     )
-    return session.execute(stmt).all()
+    return session.execute(_bucketed_range(stmt, VisitDailyRollup.visit_date, VisitDailyRollup.visit_month, start, end)).all()
 
-def monthly_visit_counts(session: Session):
-    # SQLite date formatting: strftime('%Y-%m', visit_date)
+@cached_query
+def monthly_visit_counts_by_exhibit(session: Session, start: date | None = None, end: date | None = None):
+    """Rows of (exhibit_id, ym, count) for per-exhibit forecasting; months without visits are absent."""
     stmt = (
         select(
-            func.strftime("%Y-%m", Visit.visit_date).label("ym"),
-            func.count(Visit.visit_id).label("count"),
+            VisitDailyRollup.exhibit_id,
+            VisitDailyRollup.visit_month.label("ym"),
+            func.sum(VisitDailyRollup.visit_count).label("count"),
         )
-        .group_by("ym")
-        .order_by("ym")
+        .group_by(VisitDailyRollup.exhibit_id, VisitDailyRollup.visit_month)
+        .order_by(VisitDailyRollup.exhibit_id, VisitDailyRollup.visit_month)
     )
-    return session.execute(stmt).all()
+    return session.execute(_bucketed_range(stmt, VisitDailyRollup.visit_date, VisitDailyRollup.visit_month, start, end)).all()
+
+@cached_query
+def weekly_visit_counts(session: Session, start: date | None = None, end: date | None = None, exhibit_id: int | None = None):
+    """Rows of (week, count); week is YYYY-WW with weeks starting on Monday (SQLite %W)."""
+    stmt = (
+        select(Visit.visit_week.label("week"), func.count().label("count"))
+        .group_by(Visit.visit_week)
+        .order_by(Visit.visit_week)
+    )
+    if exhibit_id is not None:
+        stmt = stmt.where(Visit.exhibit_id == exhibit_id)
+    return session.execute(_bucketed_range(stmt, Visit.visit_date, Visit.visit_month, start, end)).all()
+
+@cached_query
+def visit_counts_by_weekday(session: Session, start: date | None = None, end: date | None = None, exhibit_id: int | None = None):
+    """Rows of (dow, count) with dow 0 = Sunday .. 6 = Saturday (staffing by day of week)."""
+    stmt = (
+        select(Visit.visit_dow.label("dow"), func.count().label("count"))
+        .group_by(Visit.visit_dow)
+        .order_by(Visit.visit_dow)
+    )
+    if exhibit_id is not None:
+        stmt = stmt.where(Visit.exhibit_id == exhibit_id)
+    return session.execute(_bucketed_range(stmt, Visit.visit_date, Visit.visit_month, start, end)).all()
+
+@cached_query
+def monthly_ticket_sales(session: Session, start: date | None = None, end: date | None = None):
+    """Rows of (ym, ticket_type, tickets, revenue)."""
+    stmt = (
+        select(
+            TicketPurchase.purchase_month.label("ym"),
+            TicketPurchase.ticket_type,
+            func.count().label("tickets"),
+            func.sum(TicketPurchase.price).label("revenue"),
+        )
+        .group_by(TicketPurchase.purchase_month, TicketPurchase.ticket_type)
+        .order_by(TicketPurchase.purchase_month, TicketPurchase.ticket_type)
+    )
+    return session.execute(_purchase_range(stmt, start, end)).all()
+
+@cached_query
+def ticket_sales_by_weekday(session: Session, start: date | None = None, end: date | None = None):
+    """Rows of (dow, ticket_type, tickets, revenue) with dow 0 = Sunday."""
+    stmt = (
+        select(
+            TicketPurchase.purchase_dow.label("dow"),
+            TicketPurchase.ticket_type,
+            func.count().label("tickets"),
+            func.sum(TicketPurchase.price).label("revenue"),
+        )
+        .group_by(TicketPurchase.purchase_dow, TicketPurchase.ticket_type)
+        .order_by(TicketPurchase.purchase_dow, TicketPurchase.ticket_type)
+    )
+    return session.execute(_purchase_range(stmt, start, end)).all()
+
+# --- Unique visitors ---
+# Distinct-visitor counts merge the HyperLogLog sketches kept per (exhibit, day) and
+# per (region, day) instead of running COUNT(DISTINCT visitor_id) over visits.
+# exact=True runs the COUNT(DISTINCT) instead, for audits; it only sees the hot
+# visits table, while the sketches also cover archived years.
+@dataclass(frozen=True)
+class UniqueVisitors:
+    exhibit_id: int | None  # set when grouped by exhibit
+    ym: str | None          # set when grouped by month
+    region: str | None      # set when grouped by region (None = not recorded)
+    visitors: int
+    error: int              # ± bound at ~95% confidence; 0 when exact
+    exact: bool
+
+def _unique(count: int, exact: bool, exhibit_id: int | None = None, ym: str | None = None, region: str | None = None) -> UniqueVisitors:
+    return UniqueVisitors(exhibit_id, ym, region, int(count), 0 if exact else error_bound(int(count)), exact)
+
+def _in_range(stmt, date_col, start: date | None, end: date | None):
+    if start:
+        stmt = stmt.where(date_col >= start)
+    if end:
+        stmt = stmt.where(date_col <= end)
+    return stmt
+
+def _exhibit_key(exhibit_ids: Iterable[int] | None) -> tuple | None:
+    return None if exhibit_ids is None else tuple(sorted(set(exhibit_ids)))
+
+@contextmanager
+def _exact_visits(session: Session, start: date | None, end: date | None):
+    """(session, visits table) for exact counts over start..end.
+
+    The sketches keep archived years, so an audit of a range that reaches one
+    reads visits_all (hot + archived rows) through a history session instead of
+    the hot table alone.
+    """
+    archived = [
+        year for year in session.scalars(select(ArchiveYear.year))
+        if (start is None or year >= start.year) and (end is None or year <= end.year)
+    ]
+    if not archived:
+        yield session, Visit.__table__
+        return
+    from dal.archive import history_session, visits_all  # needs the engines; only once years are archived
+    with history_session(session.get_bind().url.render_as_string(hide_password=False)) as history:
+        yield history, visits_all
+
+def unique_visitors(session: Session, start: date | None = None, end: date | None = None, exhibit_ids: Iterable[int] | None = None, exact: bool = False) -> UniqueVisitors:
+    """Distinct visitors between start and end (inclusive) to any of exhibit_ids (default: all exhibits)."""
+    return _unique_visitors(session, start, end, _exhibit_key(exhibit_ids), exact)[0]
+
+@cached_query
+def _unique_visitors(session: Session, start: date | None, end: date | None, exhibit_ids: tuple | None, exact: bool):
+    if exact:
+        with _exact_visits(session, start, end) as (db, visits):
+            stmt = _in_range(select(func.count(func.distinct(visits.c.visitor_id))), visits.c.visit_date, start, end)
+            if exhibit_ids is not None:
+                stmt = stmt.where(visits.c.exhibit_id.in_(exhibit_ids))
+            return [_unique(db.scalar(stmt), True)]
+    if exhibit_ids is None:
+        # Every visit is in exactly one region sketch per day: far fewer blobs than per exhibit
+        stmt = _in_range(select(RegionVisitSketch.sketch), RegionVisitSketch.visit_date, start, end)
+    else:
+        stmt = _in_range(select(VisitSketch.sketch), VisitSketch.visit_date, start, end).where(VisitSketch.exhibit_id.in_(exhibit_ids))
+    return [_unique(merge_blobs(session.scalars(stmt)).estimate(), False)]
+
+def unique_visitors_by_exhibit_month(session: Session, start: date | None = None, end: date | None = None, exhibit_ids: Iterable[int] | None = None, exact: bool = False) -> list[UniqueVisitors]:
+    """Distinct visitors per exhibit per month, ordered by exhibit then month."""
+    return _unique_visitors_by_exhibit_month(session, start, end, _exhibit_key(exhibit_ids), exact)
+
+@cached_query
+def _unique_visitors_by_exhibit_month(session: Session, start: date | None, end: date | None, exhibit_ids: tuple | None, exact: bool):
+    if exact:
+        with _exact_visits(session, start, end) as (db, visits):
+            # Archive files have no generated visit_month column
+            month = visits.c.visit_month if visits is Visit.__table__ else func.strftime("%Y-%m", visits.c.visit_date)
+            stmt = (
+                select(visits.c.exhibit_id, month, func.count(func.distinct(visits.c.visitor_id)))
+                .group_by(visits.c.exhibit_id, month)
+                .order_by(visits.c.exhibit_id, month)
+            )
+            stmt = _bucketed_range(stmt, visits.c.visit_date, month, start, end)
+            if exhibit_ids is not None:
+                stmt = stmt.where(visits.c.exhibit_id.in_(exhibit_ids))
+            return [_unique(n, True, exhibit_id=exhibit_id, ym=ym) for exhibit_id, ym, n in db.execute(stmt)]
+    stmt = _in_range(
+        select(VisitSketch.exhibit_id, func.strftime("%Y-%m", VisitSketch.visit_date), VisitSketch.sketch),
+        VisitSketch.visit_date, start, end,
+    )
+    if exhibit_ids is not None:
+        stmt = stmt.where(VisitSketch.exhibit_id.in_(exhibit_ids))
+    groups: dict[tuple[int, str], list[bytes]] = defaultdict(list)
+    for exhibit_id, ym, blob in session.connection().execute(stmt):  # Core rows: one per exhibit/day
+        groups[(exhibit_id, ym)].append(blob)
+    estimates = estimate_groups(groups)
+    return [_unique(estimates[key], False, exhibit_id=key[0], ym=key[1]) for key in sorted(estimates)]
+
+@cached_query
+def unique_visitors_by_region(session: Session, start: date | None = None, end: date | None = None, exact: bool = False):
+    """Distinct visitors per visitor region, most visitors first.
+
+    Sketches record the visitor's region when the visit was recorded; exact
+    mode uses their current region.
+    """
+    if exact:
+        with _exact_visits(session, start, end) as (db, visits):
+            stmt = (
+                select(Visitor.region, func.count(func.distinct(visits.c.visitor_id)))
+                .select_from(visits)
+                .join(Visitor, Visitor.visitor_id == visits.c.visitor_id)
+                .group_by(Visitor.region)
+            )
+            rows = [_unique(n, True, region=region) for region, n in db.execute(_in_range(stmt, visits.c.visit_date, start, end))]
+    else:
+        stmt = _in_range(select(RegionVisitSketch.region, RegionVisitSketch.sketch), RegionVisitSketch.visit_date, start, end)
+        groups: dict[str, list[bytes]] = defaultdict(list)
+        for region, blob in session.execute(stmt):
+            groups[region].append(blob)
+        rows = [_unique(n, False, region=region or None) for region, n in estimate_groups(groups).items()]
+    return sorted(rows, key=lambda r: (-r.visitors, r.region or ""))
+
+# --- Exports ---
+# Column-only selects streamed in yield_per batches: no ORM objects are built and
+# only one batch of rows is in memory at a time. Rows come out in primary-key order.
+EXPORT_BATCH_SIZE = 5000
+
+def _export_visits(start: date | None, end: date | None, exhibit_id: int | None):
+    stmt = select(Visit.visit_id, Visit.visitor_id, Visit.exhibit_id, Exhibit.title.label("exhibit_title"), Visit.visit_date).join(Exhibit, Exhibit.exhibit_id == Visit.exhibit_id)
+    if start:
+        stmt = stmt.where(Visit.visit_date >= start)
+    if end:
+        stmt = stmt.where(Visit.visit_date <= end)
+    if exhibit_id is not None:
+        stmt = stmt.where(Visit.exhibit_id == exhibit_id)
+    return stmt.order_by(Visit.visit_id)
+
+def _export_tickets(start: date | None, end: date | None, exhibit_id: int | None):
+    if exhibit_id is not None:
+        raise ValueError("Ticket purchases are not tied to an exhibit")
+    stmt = select(TicketPurchase.purchase_id, TicketPurchase.visitor_id, TicketPurchase.ticket_type, TicketPurchase.price, TicketPurchase.purchase_date)
+    return _purchase_range(stmt, start, end).order_by(TicketPurchase.purchase_id)
+
+def _export_feedback(start: date | None, end: date | None, exhibit_id: int | None):
+    stmt = select(Feedback.feedback_id, Feedback.visitor_id, Feedback.exhibit_id, Feedback.rating, Feedback.comments, Feedback.submitted_at)
+    if start:
+        stmt = stmt.where(Feedback.submitted_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        stmt = stmt.where(Feedback.submitted_at < datetime.combine(date.fromordinal(end.toordinal() + 1), datetime.min.time()))
+    if exhibit_id is not None:
+        stmt = stmt.where(Feedback.exhibit_id == exhibit_id)
+    return stmt.order_by(Feedback.feedback_id)
+
+EXPORTS = {
+    "visits": _export_visits,
+    "tickets": _export_tickets,
+    "feedback": _export_feedback,
+}
+
+def export_statement(kind: str, start: date | None = None, end: date | None = None, exhibit_id: int | None = None):
+    """The select behind an export; dates are inclusive. Raises ValueError for unknown kinds or filters."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export '{kind}' (expected one of {sorted(EXPORTS)})")
+    if start and end and end < start:
+        raise ValueError("end must not be before start")
+    return EXPORTS[kind](start, end, exhibit_id)
+
+def export_columns(kind: str) -> list[str]:
+    return list(export_statement(kind).selected_columns.keys())
+
+def iter_export_batches(session: Session, kind: str, start: date | None = None, end: date | None = None, exhibit_id: int | None = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """Yield lists of up to batch_size plain rows for an export."""
+    stmt = export_statement(kind, start, end, exhibit_id)
+    # Core execution on the session's connection skips the ORM row-loading layer entirely
+    result = session.connection().execute(stmt, execution_options={"yield_per": batch_size, "stream_results": True})
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+# --- Rollup maintenance ---
+@invalidates_cache
+def rebuild_visit_rollups(session: Session, start: date | None = None, end: date | None = None) -> int:
+    """Recompute visit_daily_rollups from visits (all dates, or only start..end).
+
+    Used for backfills and after bulk changes made with triggers disabled.
+    Returns the number of rollup rows written.
+    """
+    clear = delete(VisitDailyRollup)
+    source = (
+        select(Visit.exhibit_id, Visit.visit_date, func.count(Visit.visit_id))
+        .group_by(Visit.exhibit_id, Visit.visit_date)
+    )
+    if start:
+        clear = clear.where(VisitDailyRollup.visit_date >= start)
+        source = source.where(Visit.visit_date >= start)
+    if end:
+        clear = clear.where(VisitDailyRollup.visit_date <= end)
+        source = source.where(Visit.visit_date <= end)
+    session.execute(clear)
+    result = session.execute(
+        insert(VisitDailyRollup).from_select(["exhibit_id", "visit_date", "visit_count"], source)
+    )
+    return result.rowcount
+
+# --- Sketch maintenance ---
+def _dbapi(session: Session):
+    # The session's own sqlite3 connection, inside its transaction (dal/sketches.py works on DB-API)
+    return session.connection().connection.dbapi_connection
+
+def _add_to_visit_sketches(session: Session, rows: list[dict]) -> None:
+    """Add newly recorded visits to the (exhibit, day) and (region, day) sketches."""
+    add_visits_to_sketches(_dbapi(session), ((r["visitor_id"], r["exhibit_id"], r["visit_date"]) for r in rows))
+
+@invalidates_cache
+def rebuild_visit_sketches(session: Session, start: date | None = None, end: date | None = None) -> int:
+    """Recompute the visitor sketches from visits (all dates, or only start..end).
+
+    Sketches of archived years are kept (their visits are no longer in the hot
+    table) and merged with any hot visits on those dates. Returns the number of (exhibit, day) sketches written.
+    """
+    archived = [str(y) for y in session.scalars(select(ArchiveYear.year))]
+    for model in (VisitSketch, RegionVisitSketch):
+        clear = _in_range(delete(model), model.visit_date, start, end)
+        if archived:
+            clear = clear.where(func.strftime("%Y", model.visit_date).not_in(archived))
+        session.execute(clear)
+    source = _in_range(
+        select(Visit.visitor_id, Visit.exhibit_id, Visit.visit_date, Visitor.region).join(Visitor, Visitor.visitor_id == Visit.visitor_id),
+        Visit.visit_date, start, end,
+    )
+    regions: dict[int, str | None] = {}
+    def visits():
+        for visitor_id, exhibit_id, visit_date, region in session.execute(source.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            regions[visitor_id] = region
+            yield visitor_id, exhibit_id, visit_date
+    by_exhibit, by_region = sketch_visits(visits(), regions)
+    store_sketches(_dbapi(session), by_exhibit, by_region)
+    return len(by_exhibit)
+
+@invalidates_cache
+def rebuild_conservation_state(session: Session) -> int:
+    """Recompute artefact_conservation_state from the full conservation history.
+
+    Returns the number of artefacts with a current state.
+    """
+    ranked = select(
+        ConservationRecord.artefact_id,
+        ConservationRecord.record_id,
+        ConservationRecord.condition,
+        ConservationRecord.due_date,
+        ConservationRecord.recorded_at,
+        func.row_number().over(
+            partition_by=ConservationRecord.artefact_id,
+            order_by=(ConservationRecord.recorded_at.desc(), ConservationRecord.record_id.desc()),
+        ).label("rn"),
+    ).subquery()
+    columns = ["artefact_id", "record_id", "condition", "due_date", "recorded_at"]
+    session.execute(delete(ArtefactConservationState))
+    result = session.execute(
+        insert(ArtefactConservationState).from_select(
+            columns, select(*[ranked.c[name] for name in columns]).where(ranked.c.rn == 1)
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,287 @@
+"""HyperLogLog sketches for approximate distinct-visitor counts.
+
+A sketch keeps 2**PRECISION one-byte registers, each holding the longest run
+of leading zero bits seen among the hashed ids routed to it. Sketches merge
+by taking the register-wise maximum, so per-(exhibit, day) sketches can be
+combined for any date range or set of exhibits without touching visits.
+
+The standard error of an estimate is 1.04 / sqrt(2**PRECISION) (about 1.6%);
+ERROR_BOUND is twice that, which covers ~95% of estimates. Small counts fall
+in the linear-counting range and are much closer than the bound.
+
+Stored form (LargeBinary): a format byte, then either the sorted non-zero
+registers as little-endian uint32 (index << 8 | rank) while that is smaller
+than the dense form, or all the registers.
+"""
+from __future__ import annotations
+
+import math
+import struct
+from collections import defaultdict
+from collections.abc import Hashable, Iterable, Iterator, Mapping
+
+try:
+    import numpy as np  # type: ignore
+    _HAS_NUMPY = True
+except Exception:
+    np = None
+    _HAS_NUMPY = False
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+ERROR_BOUND = 2 * STANDARD_ERROR
+
+_SPARSE, _DENSE = 0, 1
+_SPARSE_LIMIT = REGISTERS // 4  # entries at which 4-byte sparse entries stop being smaller
+_MASK64 = (1 << 64) - 1
+_REST_MASK = (1 << (64 - PRECISION)) - 1
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+def _estimate(harmonic: float, zeros: int) -> int:
+    raw = _ALPHA * REGISTERS * REGISTERS / harmonic
+    if raw <= 2.5 * REGISTERS and zeros:
+        return round(REGISTERS * math.log(REGISTERS / zeros))  # linear counting for small cardinalities
+    return round(raw)
+
+def hash_id(value: int) -> int:
+    """splitmix64 finaliser: a well-mixed, process-independent 64-bit hash of an integer id."""
+    z = (value + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+def _register(h: int) -> tuple[int, int]:
+    index = h >> (64 - PRECISION)
+    rest = h & _REST_MASK  # the remaining 52 bits; rank = leading zeros + 1
+    return index, (64 - PRECISION) - rest.bit_length() + 1
+
+class Sketch:
+    """A mutable HyperLogLog sketch; sparse (dict) until it fills up, then a dense bytearray."""
+
+    __slots__ = ("_sparse", "_dense")
+
+    def __init__(self):
+        self._sparse: dict[int, int] | None = {}
+        self._dense: bytearray | None = None
+
+    @classmethod
+    def of(cls, ids: Iterable[int]) -> Sketch:
+        sketch = cls()
+        sketch.add_many(ids)
+        return sketch
+
+    def add(self, visitor_id: int) -> None:
+        self._set(*_register(hash_id(visitor_id)))
+
+    def add_many(self, ids: Iterable[int]) -> None:
+        for visitor_id in ids:
+            self._set(*_register(hash_id(visitor_id)))
+
+    def _set(self, index: int, rank: int) -> None:
+        if self._dense is not None:
+            if rank > self._dense[index]:
+                self._dense[index] = rank
+            return
+        if rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+            if len(self._sparse) >= _SPARSE_LIMIT:
+                self._densify()
+
+    def _densify(self) -> None:
+        dense = bytearray(REGISTERS)
+        for index, rank in self._sparse.items():
+            dense[index] = rank
+        self._dense, self._sparse = dense, None
+
+    def merge(self, other: Sketch) -> Sketch:
+        """Fold other into this sketch (in place) and return self."""
+        if other._dense is None:
+            for index, rank in other._sparse.items():
+                self._set(index, rank)
+            return self
+        if self._dense is None:
+            self._densify()
+        if _HAS_NUMPY:
+            mine = np.frombuffer(self._dense, dtype=np.uint8)
+            np.maximum(mine, np.frombuffer(other._dense, dtype=np.uint8), out=mine)
+        else:
+            self._dense[:] = bytes(map(max, self._dense, other._dense))
+        return self
+
+    def estimate(self) -> int:
+        if self._dense is None:
+            ranks, zeros = list(self._sparse.values()), REGISTERS - len(self._sparse)
+            harmonic = zeros + sum(2.0 ** -r for r in ranks)
+        elif _HAS_NUMPY:
+            regs = np.frombuffer(self._dense, dtype=np.uint8)
+            zeros = int(np.count_nonzero(regs == 0))
+            harmonic = float(np.ldexp(1.0, -regs.astype(np.int32)).sum())
+        else:
+            zeros = self._dense.count(0)
+            harmonic = sum(2.0 ** -r for r in self._dense)
+        return _estimate(harmonic, zeros)
+
+    # --- Storage ---
+    def to_bytes(self) -> bytes:
+        if self._dense is not None:
+            return bytes([_DENSE]) + bytes(self._dense)
+        entries = sorted(index << 8 | rank for index, rank in self._sparse.items())
+        return bytes([_SPARSE]) + struct.pack(f"<{len(entries)}I", *entries)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Sketch:
+        sketch = cls()
+        if data[0] == _DENSE:
+            sketch._dense, sketch._sparse = bytearray(data[1:]), None
+        else:
+            sketch._sparse = {e >> 8: e & 0xFF for e in struct.unpack(f"<{(len(data) - 1) // 4}I", data[1:])}
+        return sketch
+
+    def merge_bytes(self, data: bytes) -> Sketch:
+        """merge(Sketch.from_bytes(data)) without building the intermediate dict for sparse blobs."""
+        if data[0] == _DENSE:
+            return self.merge(Sketch.from_bytes(data))
+        for e in struct.unpack(f"<{(len(data) - 1) // 4}I", data[1:]):
+            self._set(e >> 8, e & 0xFF)
+        return self
+
+def merge_blobs(blobs: Iterable[bytes]) -> Sketch:
+    """Merge stored sketches into a new one.
+
+    The sparse entries of all blobs are joined into one buffer first. Small
+    results stay sparse; larger ones are scattered into a dense register
+    array with numpy in one call rather than one Python call per entry.
+    """
+    dense, payloads = [], []
+    for blob in blobs:
+        if blob[0] == _DENSE:
+            dense.append(blob)
+        else:
+            payloads.append(blob[1:])
+    entries = b"".join(payloads)
+    if not _HAS_NUMPY or (not dense and len(entries) // 4 < _SPARSE_LIMIT):
+        merged = Sketch().merge_bytes(bytes([_SPARSE]) + entries)
+        for blob in dense:
+            merged.merge_bytes(blob)
+        return merged
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    for blob in dense:
+        np.maximum(registers, np.frombuffer(blob, dtype=np.uint8, offset=1), out=registers)
+    if entries:
+        packed = np.frombuffer(entries, dtype="<u4")
+        np.maximum.at(registers, packed >> 8, (packed & 0xFF).astype(np.uint8))
+    merged = Sketch()
+    merged._dense, merged._sparse = bytearray(registers.tobytes()), None
+    return merged
+
+# --- Stored sketches ---
+# Written against a DB-API (sqlite3) connection inside the caller's transaction,
+# so the repository (through its Session's connection) and the plain sqlite3
+# services share one implementation.
+SKETCH_ID_BATCH = 5000  # bound parameters per IN list
+SKETCH_TABLES = (("visit_sketches", "exhibit_id"), ("region_visit_sketches", "region"))
+
+def sketch_visits(rows: Iterable, regions: Mapping[int, str | None]) -> tuple[dict, dict]:
+    """Sketches of (visitor_id, exhibit_id, visit_date) rows keyed by (exhibit, day) and (region, day).
+
+    Days are keyed by their ISO text, the form the sketch tables store.
+    """
+    by_exhibit: dict[tuple, Sketch] = defaultdict(Sketch)
+    by_region: dict[tuple, Sketch] = defaultdict(Sketch)
+    for visitor_id, exhibit_id, visit_date in rows:
+        day = str(visit_date)
+        by_exhibit[(exhibit_id, day)].add(visitor_id)
+        by_region[(regions.get(visitor_id) or "", day)].add(visitor_id)
+    return by_exhibit, by_region
+
+def _in_batches(values: list, size: int = SKETCH_ID_BATCH) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _merge_stored(cursor, table: str, key: str, sketches: dict) -> None:
+    # Fold the stored sketches into the new ones, then write them back in one upsert.
+    dates_by_key: dict = defaultdict(list)
+    for value, day in sketches:
+        dates_by_key[value].append(day)
+    # One primary-key range lookup per exhibit/region (a row-value IN would scan the table)
+    for value, days in dates_by_key.items():
+        for chunk in _in_batches(days):
+            cursor.execute(f"SELECT visit_date, sketch FROM {table} WHERE {key} = ? AND visit_date IN ({', '.join('?' * len(chunk))})", [value, *chunk])
+            for day, blob in cursor.fetchall():
+                sketches[(value, day)].merge_bytes(blob)
+    cursor.executemany(
+        f"INSERT INTO {table} ({key}, visit_date, sketch) VALUES (?, ?, ?) ON CONFLICT ({key}, visit_date) DO UPDATE SET sketch = excluded.sketch",
+        [(value, day, sketch.to_bytes()) for (value, day), sketch in sketches.items()],
+    )
+
+def store_sketches(conn, by_exhibit: dict, by_region: dict) -> None:
+    """Merge sketch_visits() output into visit_sketches and region_visit_sketches."""
+    cursor = conn.cursor()
+    try:
+        for (table, key), sketches in zip(SKETCH_TABLES, (by_exhibit, by_region)):
+            if sketches:
+                _merge_stored(cursor, table, key, sketches)
+    finally:
+        cursor.close()
+
+def add_visits(conn, visits: Iterable) -> None:
+    """Add newly recorded (visitor_id, exhibit_id, visit_date) rows to the stored sketches.
+
+    Sketches only grow: deleted or moved visits stay counted until
+    repositories.rebuild_visit_sketches() is run for their dates.
+    """
+    visits = [(int(visitor_id), int(exhibit_id), visit_date) for visitor_id, exhibit_id, visit_date in visits]  # ids may arrive as text
+    if not visits:
+        return
+    regions: dict[int, str | None] = {}
+    cursor = conn.cursor()
+    try:
+        for chunk in _in_batches(list({visitor_id for visitor_id, _, _ in visits})):
+            cursor.execute(f"SELECT visitor_id, region FROM visitors WHERE visitor_id IN ({', '.join('?' * len(chunk))})", chunk)
+            regions.update((visitor_id, region) for visitor_id, region in cursor.fetchall())
+    finally:
+        cursor.close()
+    store_sketches(conn, *sketch_visits(visits, regions))
+
+GROUP_BLOCK = 2048  # groups merged per numpy pass (GROUP_BLOCK x REGISTERS bytes of registers)
+
+def estimate_groups(groups: Mapping[Hashable, list[bytes]]) -> dict[Hashable, int]:
+    """Merge each group's stored sketches and estimate it, for many groups at once.
+
+    With numpy every block of groups is one register matrix filled by a single
+    scatter of all their sparse entries, instead of a merge per group.
+    """
+    if not _HAS_NUMPY:
+        return {key: merge_blobs(blobs).estimate() for key, blobs in groups.items()}
+    out: dict[Hashable, int] = {}
+    keys = list(groups)
+    inv_pow = np.ldexp(1.0, -np.arange(256))
+    for b in range(0, len(keys), GROUP_BLOCK):
+        block = keys[b:b + GROUP_BLOCK]
+        registers = np.zeros((len(block), REGISTERS), dtype=np.uint8)
+        rows, payloads = [], []
+        for row, key in enumerate(block):
+            for blob in groups[key]:
+                if blob[0] == _DENSE:
+                    np.maximum(registers[row], np.frombuffer(blob, dtype=np.uint8, offset=1), out=registers[row])
+                elif len(blob) > 1:
+                    payloads.append(blob[1:])
+                    rows.append((row, (len(blob) - 1) // 4))
+        if payloads:
+            packed = np.frombuffer(b"".join(payloads), dtype="<u4")
+            row_ids = np.repeat(np.array([r for r, _ in rows], dtype=np.int64), [n for _, n in rows])
+            # flat indexes: ufunc.at is much faster on one dimension
+            np.maximum.at(registers.reshape(-1), row_ids * REGISTERS + (packed >> 8), (packed & 0xFF).astype(np.uint8))
+        # Histogram of register values per row, then sum(count * 2**-value)
+        values = np.bincount((np.arange(len(block), dtype=np.int64)[:, None] * 256 + registers).reshape(-1), minlength=len(block) * 256)
+        values = values.reshape(len(block), 256)
+        harmonic = values @ inv_pow
+        zeros = values[:, 0]
+        for key, h, z in zip(block, harmonic.tolist(), zeros.tolist()):
+            out[key] = _estimate(h, z)
+    return out
+
+def error_bound(estimate: int) -> int:
+    """± visitors around an estimate at ~95% confidence."""
+    return math.ceil(ERROR_BOUND * estimate)
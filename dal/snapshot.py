@@ -0,0 +1,205 @@
+"""Analytics snapshot: a read-only copy of the database for long report scans.
+
+Dashboard and report queries run against a copy made with SQLite's online
+backup API instead of the live file, so they never hold a read transaction
+that stops the WAL from checkpointing. The copy is refreshed when it is
+older than max_age seconds (on the next analytics read, or by the web app's
+background thread) and can be refreshed on demand with refresh(force=True).
+
+A refresh writes a new file next to the snapshot and renames it into place.
+Age is the file's mtime, so a copy refreshed by another process (the
+maintenance command) is picked up on the next read; sessions already open
+finish on the copy they started with.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from config import ANALYTICS_SNAPSHOT_BACKUP_PAGES, ANALYTICS_SNAPSHOT_ENABLED, ANALYTICS_SNAPSHOT_MAX_AGE, ANALYTICS_SNAPSHOT_PATH, DATABASE_URL
+from dal.db import EngineProfile, _install_pragmas, _is_file_database, profile as default_profile
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SnapshotStatus:
+    enabled: bool
+    path: str
+    age_s: float | None  # None until the first refresh
+    max_age_s: float
+    refreshes: int
+    last_refresh_ms: float | None
+
+class AnalyticsSnapshot:
+    def __init__(self, source_url: str = DATABASE_URL, path: str | Path = ANALYTICS_SNAPSHOT_PATH, max_age: float = ANALYTICS_SNAPSHOT_MAX_AGE, backup_pages: int = ANALYTICS_SNAPSHOT_BACKUP_PAGES, prof: EngineProfile = default_profile):
+        if not _is_file_database(source_url):
+            raise ValueError("The analytics snapshot needs a file database")
+        self.source = make_url(source_url).database
+        self.path = Path(path)
+        self.max_age = max_age
+        self.backup_pages = backup_pages
+        self.profile = prof
+        self._refresh_lock = threading.Lock()
+        self._engine: Engine | None = None
+        self._sessionmaker: sessionmaker | None = None
+        self._opened_mtime: float | None = None  # mtime of the file the current engine reads
+        self._refreshes = 0
+        self._last_refresh_ms: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # --- Refresh ---
+    def _mtime(self) -> float | None:
+        try:
+            return self.path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def age(self) -> float | None:
+        mtime = self._mtime()
+        return None if mtime is None else max(0.0, time.time() - mtime)
+
+    def is_stale(self) -> bool:
+        age = self.age()
+        return age is None or age >= self.max_age
+
+    def refresh(self, force: bool = False) -> bool:
+        """Copy the live database if the snapshot is stale (or always, with force).
+
+        Returns False when another thread is already refreshing: callers then
+        read the current copy rather than queueing behind the backup.
+        """
+        if not self._refresh_lock.acquire(blocking=self._engine is None):
+            return False
+        try:
+            if not force and not self.is_stale():
+                return False
+            started = time.perf_counter()
+            self._backup()
+            self._open()
+            self._refreshes += 1
+            self._last_refresh_ms = (time.perf_counter() - started) * 1000
+            logger.info("Refreshed analytics snapshot %s in %.0f ms", self.path, self._last_refresh_ms)
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _backup(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.unlink(missing_ok=True)
+        src = sqlite3.connect(self.source)
+        dst = sqlite3.connect(tmp)
+        try:
+            # pages=-1 copies in one step: a single short read transaction on the live database.
+            # Smaller steps release it in between but restart whenever a write lands mid-copy.
+            src.backup(dst, pages=self.backup_pages)
+            dst.execute("PRAGMA journal_mode = DELETE")  # a self-contained file, no -wal alongside
+        finally:
+            dst.close()
+            src.close()
+        os.replace(tmp, self.path)
+
+    def _open(self) -> None:
+        old = self._engine
+        self._opened_mtime = self._mtime()
+        self._engine = self._create_engine()
+        self._sessionmaker = sessionmaker(bind=self._engine, autoflush=False, expire_on_commit=False, future=True)
+        if old is not None:
+            old.dispose()  # connections still in use close when their sessions end
+
+    def _create_engine(self) -> Engine:
+        uri = f"file:{self.path.resolve().as_posix()}?mode=ro"
+        eng = create_engine(
+            "sqlite://",
+            creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+            poolclass=QueuePool,
+            pool_size=self.profile.read_pool_size,
+            max_overflow=self.profile.read_pool_size,
+            future=True,
+        )
+        _install_pragmas(eng, self.profile, readonly=True)
+        return eng
+
+    # --- Reads ---
+    def session(self) -> Session:
+        """A session on a snapshot no older than max_age (refreshing first if needed)."""
+        if self.is_stale():
+            self.refresh()
+        if self._mtime() != self._opened_mtime:
+            with self._refresh_lock:  # refreshed by another process: read the new file
+                if self._mtime() != self._opened_mtime:
+                    self._open()
+        return self._sessionmaker()
+
+    def version(self) -> float:
+        """mtime of the copy the next session will read (refreshing a stale one first)."""
+        if self.is_stale():
+            self.refresh()
+        return self._mtime() or 0.0
+
+    def status(self) -> SnapshotStatus:
+        age = self.age()
+        return SnapshotStatus(
+            enabled=True,
+            path=str(self.path),
+            age_s=round(age, 3) if age is not None else None,
+            max_age_s=self.max_age,
+            refreshes=self._refreshes,
+            last_refresh_ms=round(self._last_refresh_ms, 3) if self._last_refresh_ms is not None else None,
+        )
+
+    # --- Background refresh ---
+    def start(self) -> None:
+        """Refresh in a daemon thread whenever the snapshot reaches max_age (idempotent)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Analytics snapshot refresh failed")
+            age = self.age() or 0.0
+            self._stop.wait(max(1.0, self.max_age - age))
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._engine is not None:
+            self._engine.dispose()
+
+_snapshot: AnalyticsSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot() -> AnalyticsSnapshot | None:
+    """The process-wide snapshot, or None when ANALYTICS_SNAPSHOT_ENABLED is off or the DB is in memory."""
+    global _snapshot
+    if not ANALYTICS_SNAPSHOT_ENABLED or not _is_file_database(DATABASE_URL):
+        return None
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = AnalyticsSnapshot()
+        return _snapshot
+
+def snapshot_status() -> SnapshotStatus:
+    snap = get_snapshot()
+    if snap is None:
+        return SnapshotStatus(enabled=False, path="", age_s=None, max_age_s=ANALYTICS_SNAPSHOT_MAX_AGE, refreshes=0, last_refresh_ms=None)
+    return snap.status()
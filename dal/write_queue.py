@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from config import (
+    WRITE_QUEUE_ENABLED,
+    WRITE_QUEUE_MAX_BATCH,
+    WRITE_QUEUE_MAX_DEPTH,
+    WRITE_QUEUE_MAX_LATENCY_MS,
+)
+from dal.db import get_session
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[Session], Any]
+
+class WriteQueueFull(Exception):
+    pass
+
+class WritePending(Exception):
+    """The caller stopped waiting, but the write has started and may still commit."""
+
+@dataclass(frozen=True)
+class WriteQueueMetrics:
+    submitted: int
+    committed: int
+    failed: int
+    batches: int
+    queue_depth: int
+    max_queue_depth: int
+    last_batch_size: int
+    max_batch_size: int
+    avg_batch_size: float
+    items_per_second: float  # committed items over the last minute
+    avg_commit_latency_ms: float  # submit -> commit, averaged over the last minute
+
+@dataclass
+class _Item:
+    op: WriteOp
+    future: Future
+    submitted_at: float
+
+class GroupCommitQueue:
+    """Write-behind queue that commits concurrent writes in small group transactions.
+
+    Callers submit a function taking a Session; a single worker thread collects
+    up to max_batch items (waiting at most max_latency_ms after the first one),
+    runs each under its own SAVEPOINT and commits the group once. Each caller's
+    Future receives that op's return value, or the exception that rolled it back.
+    """
+
+    def __init__(
+        self,
+        session_factory=get_session,
+        max_batch: int = WRITE_QUEUE_MAX_BATCH,
+        max_latency_ms: float = WRITE_QUEUE_MAX_LATENCY_MS,
+        max_depth: int = WRITE_QUEUE_MAX_DEPTH,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000.0
+        self._queue: queue.Queue[_Item | None] = queue.Queue(maxsize=max_depth)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._submitted = self._committed = self._failed = self._batches = self._batched_items = 0
+        self._max_depth_seen = self._last_batch = self._max_batch_seen = 0
+        self._recent: deque[tuple[float, int, float]] = deque()  # (commit time, items, summed latency)
+
+    # --- lifecycle ---
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Flush queued writes and stop the worker."""
+        with self._start_lock:
+            if not self._thread:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- producer side ---
+    def submit(self, op: WriteOp) -> Future:
+        self.start()
+        item = _Item(op=op, future=Future(), submitted_at=time.monotonic())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            raise WriteQueueFull(f"Write queue is full ({self._queue.maxsize} pending writes)")
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_depth_seen = max(self._max_depth_seen, self._queue.qsize())
+        return item.future
+
+    # --- worker side ---
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: list[_Item]) -> None:
+        done: list[tuple[_Item, Any]] = []
+        failed = 0
+        try:
+            with self.session_factory() as session:
+                for item in batch:
+                    if not item.future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = item.op(session)
+                        done.append((item, result))
+                    except Exception as e:
+                        failed += 1
+                        item.future.set_exception(e)
+        except Exception as e:
+            # The group commit itself failed (e.g. database locked, or no session could
+            # be opened): nothing was written, so every item still waiting fails with it.
+            logger.exception("Group commit of %d writes failed", len(batch))
+            for item in batch:
+                if item.future.done():
+                    continue  # its own op failed, or the caller cancelled it
+                if item.future.running() or item.future.set_running_or_notify_cancel():
+                    item.future.set_exception(e)
+                    failed += 1
+            done = []
+
+        now = time.monotonic()
+        for item, result in done:
+            item.future.set_result(result)
+        with self._stats_lock:
+            self._batches += 1
+            self._batched_items += len(batch)
+            self._committed += len(done)
+            self._failed += failed
+            self._last_batch = len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._recent.append((now, len(done), sum(now - item.submitted_at for item, _ in done)))
+            while self._recent and now - self._recent[0][0] > 60:
+                self._recent.popleft()
+
+    def metrics(self) -> WriteQueueMetrics:
+        with self._stats_lock:
+            now = time.monotonic()
+            recent = [r for r in self._recent if now - r[0] <= 60]
+            recent_items = sum(n for _, n, _ in recent)
+            window = max(now - recent[0][0], 1.0) if recent else 1.0
+            return WriteQueueMetrics(
+                submitted=self._submitted,
+                committed=self._committed,
+                failed=self._failed,
+                batches=self._batches,
+                queue_depth=self._queue.qsize(),
+                max_queue_depth=self._max_depth_seen,
+                last_batch_size=self._last_batch,
+                max_batch_size=self._max_batch_seen,
+                avg_batch_size=self._batched_items / self._batches if self._batches else 0.0,
+                items_per_second=recent_items / window,
+                avg_commit_latency_ms=1000 * sum(l for _, _, l in recent) / recent_items if recent_items else 0.0,
+            )
+
+_queue: GroupCommitQueue | None = None
+_queue_lock = threading.Lock()
+
+def get_write_queue() -> GroupCommitQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = GroupCommitQueue()
+            atexit.register(_queue.stop)
+        return _queue
+
+def wait_for_write(future: Future, timeout: float | None) -> Any:
+    """Wait for a submitted write; WritePending if it is still running when time is up.
+
+    A write the worker has not picked up yet is cancelled instead, so the caller
+    gets a plain TimeoutError and can safely retry without storing it twice.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        if future.cancel():
+            raise TimeoutError(f"Write not started within {timeout}s; nothing was saved") from None
+        if future.done():
+            return future.result()  # finished just as we gave up
+        raise WritePending(f"Write still in progress after {timeout}s") from None
+
+def submit_write(op: WriteOp) -> Future:
+    """Run a write through the group-commit queue, or inline when it is disabled."""
+    if WRITE_QUEUE_ENABLED:
+        return get_write_queue().submit(op)
+    future: Future = Future()
+    try:
+        with get_session() as session:
+            result = op(session)
+        future.set_result(result)
+    except Exception as e:
+        future.set_exception(e)
+    return future
@@ -1,8 +1,30 @@
-    """)
+from __future__ import annotations
 
-    """)
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
 
+from config import DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD
+from dal.db import engine, get_session, read_engine
+from dal.models import User
+from database.migrations import Migration, migrate
+from security.passwords import hash_password
 
+def install_schema(bind: Engine = engine) -> list[Migration]:
+    """Bring bind's tables, indexes and triggers up to date (see database/migrations.py)."""
+    return migrate(bind)
+
+def _seed_default_admin() -> None:
+    with get_session() as session:
+        exists = session.execute(select(User.user_id).where(User.username == DEFAULT_ADMIN_USERNAME)).first()
+        if not exists:
+            session.add(User(username=DEFAULT_ADMIN_USERNAME, password_hash=hash_password(DEFAULT_ADMIN_PASSWORD), role="admin"))
+
+def create_database() -> list[Migration]:
+    """Startup check: one read of schema_version when current, else migrate and seed the admin."""
+    applied = migrate(engine, check_bind=read_engine)
+    if applied:
+        _seed_default_admin()
+    return applied
 
 if __name__ == "__main__":
     create_database()
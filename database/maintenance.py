@@ -0,0 +1,193 @@
+"""Maintenance commands for operators.
+
+Usage:
+    python -m database.maintenance migrate
+    python -m database.maintenance schema-status
+    python -m database.maintenance rebuild-rollups [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python -m database.maintenance rebuild-search [--optimize]
+    python -m database.maintenance rebuild-conservation-state
+    python -m database.maintenance rebuild-sketches [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python -m database.maintenance archive-year YEAR [--vacuum]
+    python -m database.maintenance restore-year YEAR [--keep-file]
+    python -m database.maintenance archive-list
+    python -m database.maintenance archive-prune
+    python -m database.maintenance refresh-snapshot
+    python -m database.maintenance query-report [--url URL | --file metrics.json] [--top N] [--sort total_ms|p95_ms|count|max_ms|avg_ms]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import urllib.request
+
+from business.validators import ValidationError, parse_date
+from dal.db import engine, get_session
+from dal import repositories as repo
+from dal import archive
+from dal.snapshot import get_snapshot
+from database import migrations
+from database.db_init import create_database
+from dal.instrumentation import SORT_KEYS, format_report
+from utils.logging_config import configure_logging
+
+def _date_arg(value: str):
+    try:
+        return parse_date(value)
+    except ValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _cmd_migrate(args: argparse.Namespace) -> int:
+    applied = create_database()
+    for m in applied:
+        print(f"Applied migration {m.version}: {m.name}")
+    print(f"Schema is at version {migrations.LATEST_VERSION}" + ("" if applied else " (nothing to do)"))
+    return 0
+
+def _cmd_schema_status(args: argparse.Namespace) -> int:
+    applied = {version: applied_at for version, _, applied_at in migrations.history(engine)}
+    for m in migrations.MIGRATIONS:
+        print(f"{m.version:>3}  {m.name:<32} " + (f"applied {applied[m.version]:%Y-%m-%d %H:%M:%S}" if m.version in applied else "pending"))
+    return 0 if len(applied) >= migrations.LATEST_VERSION else 1
+
+def _cmd_rebuild_rollups(args: argparse.Namespace) -> int:
+    with get_session() as session:
+        rows = repo.rebuild_visit_rollups(session, start=args.start, end=args.end)
+    print(f"Rebuilt visit_daily_rollups: {rows} exhibit/day rows")
+    return 0
+
+def _cmd_rebuild_search(args: argparse.Namespace) -> int:
+    with get_session() as session:
+        repo.rebuild_search_index(session, optimize=args.optimize)
+    print("Rebuilt artefacts_fts and exhibits_fts" + (" (optimized)" if args.optimize else ""))
+    return 0
+
+def _cmd_rebuild_conservation_state(args: argparse.Namespace) -> int:
+    with get_session() as session:
+        rows = repo.rebuild_conservation_state(session)
+    print(f"Rebuilt artefact_conservation_state: {rows} artefacts")
+    return 0
+
+def _cmd_rebuild_sketches(args: argparse.Namespace) -> int:
+    with get_session() as session:
+        rows = repo.rebuild_visit_sketches(session, start=args.start, end=args.end)
+    print(f"Rebuilt visit_sketches and region_visit_sketches: {rows} exhibit/day sketches")
+    return 0
+
+def _cmd_archive_year(args: argparse.Namespace) -> int:
+    r = archive.archive_year(args.year, vacuum=args.vacuum)
+    print(f"Archived {r.year}: {r.visits} visits, {r.tickets} ticket purchases to {r.path}" + (f" ({r.pruned} orphaned rows pruned)" if r.pruned else ""))
+    return 0
+
+def _cmd_restore_year(args: argparse.Namespace) -> int:
+    r = archive.restore_year(args.year, delete_file=not args.keep_file)
+    print(f"Restored {r.year}: {r.visits} visits, {r.tickets} ticket purchases" + (f" ({r.pruned} rows of deleted visitors/exhibits dropped)" if r.pruned else ""))
+    return 0
+
+def _cmd_archive_list(args: argparse.Namespace) -> int:
+    rows = archive.list_archives()
+    if not rows:
+        print("No archived years")
+    for year, path, visits, tickets, archived_at in rows:
+        print(f"{year}: {visits} visits, {tickets} ticket purchases in {path} (archived {archived_at[:19]})")
+    with archive.history_session() as session:
+        totals = ", ".join(f"{r.year}: {r.visits}" for r in archive.yearly_visit_counts(session))
+    print(f"Visits per year including archives: {totals or '-'}")
+    return 0
+
+def _cmd_archive_prune(args: argparse.Namespace) -> int:
+    print(f"Removed {archive.prune_archives()} archived rows of deleted visitors/exhibits")
+    return 0
+
+def _cmd_refresh_snapshot(args: argparse.Namespace) -> int:
+    snapshot = get_snapshot()
+    if snapshot is None:
+        print("error: analytics snapshot mode is off (set ANALYTICS_SNAPSHOT_ENABLED=1 with a file database)", file=sys.stderr)
+        return 1
+    snapshot.refresh(force=True)
+    status = snapshot.status()
+    print(f"Refreshed analytics snapshot {status.path} in {status.last_refresh_ms:.0f} ms")
+    return 0
+
+def _cmd_query_report(args: argparse.Namespace) -> int:
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    else:
+        req = urllib.request.Request(f"{args.url}?top=500")
+        if args.token:
+            req.add_header("Authorization", f"Bearer {args.token}")
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            snapshot = json.load(resp)
+    print(format_report(snapshot, top=args.top, sort=args.sort))
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m database.maintenance", description="Museum DB maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="Apply pending schema migrations (the app also does this on start)")
+    p.set_defaults(func=_cmd_migrate)
+
+    p = sub.add_parser("schema-status", help="List schema migrations and whether each is applied (exit 1 if any pending)")
+    p.set_defaults(func=_cmd_schema_status)
+
+    p = sub.add_parser("rebuild-rollups", help="Recompute visit_daily_rollups from visits (backfill)")
+    p.add_argument("--start", type=_date_arg, default=None, help="First visit date to rebuild (YYYY-MM-DD)")
+    p.add_argument("--end", type=_date_arg, default=None, help="Last visit date to rebuild (YYYY-MM-DD)")
+    p.set_defaults(func=_cmd_rebuild_rollups)
+
+    p = sub.add_parser("rebuild-search", help="Rebuild the FTS5 full-text indexes over artefacts and exhibits")
+    p.add_argument("--optimize", action="store_true", help="Also merge index segments (faster queries after big loads)")
+    p.set_defaults(func=_cmd_rebuild_search)
+
+    p = sub.add_parser("rebuild-conservation-state", help="Recompute each artefact's latest conservation record (backfill)")
+    p.set_defaults(func=_cmd_rebuild_conservation_state)
+
+    p = sub.add_parser("rebuild-sketches", help="Recompute the unique-visitor sketches from visits (after deleting or moving visits)")
+    p.add_argument("--start", type=_date_arg, default=None, help="First visit date to rebuild (YYYY-MM-DD)")
+    p.add_argument("--end", type=_date_arg, default=None, help="Last visit date to rebuild (YYYY-MM-DD)")
+    p.set_defaults(func=_cmd_rebuild_sketches)
+
+    p = sub.add_parser("archive-year", help="Move a closed year of visits and ticket purchases into its own archive file")
+    p.add_argument("year", type=int)
+    p.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards to shrink the file")
+    p.set_defaults(func=_cmd_archive_year)
+
+    p = sub.add_parser("restore-year", help="Move an archived year back into the hot tables")
+    p.add_argument("year", type=int)
+    p.add_argument("--keep-file", action="store_true", help="Keep the archive file after restoring")
+    p.set_defaults(func=_cmd_restore_year)
+
+    p = sub.add_parser("archive-list", help="List archived years and visits per year across all archives")
+    p.set_defaults(func=_cmd_archive_list)
+
+    p = sub.add_parser("archive-prune", help="Delete archived rows whose visitor or exhibit was deleted")
+    p.set_defaults(func=_cmd_archive_prune)
+
+    p = sub.add_parser("refresh-snapshot", help="Copy the live database to the analytics snapshot now")
+    p.set_defaults(func=_cmd_refresh_snapshot)
+
+    p = sub.add_parser("query-report", help="Summarise SQL timings and per-request query counts from /metrics")
+    source = p.add_mutually_exclusive_group()
+    source.add_argument("--url", default="http://127.0.0.1:5000/metrics", help="Metrics endpoint of a running app")
+    source.add_argument("--file", help="A saved /metrics JSON snapshot")
+    p.add_argument("--token", default=os.getenv("METRICS_TOKEN", ""), help="Bearer token (default: $METRICS_TOKEN)")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--sort", choices=SORT_KEYS, default="total_ms")
+    p.set_defaults(func=_cmd_query_report)
+
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    configure_logging()
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except archive.ArchiveError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,586 @@
+"""Versioned schema migrations.
+
+schema_version holds one row per applied migration. migrate() reads
+max(version) (the primary key, one index lookup) and returns at once when the
+database is current; otherwise it applies every pending migration, in order,
+inside a single BEGIN IMMEDIATE transaction. A second process starting at the
+same moment waits for that lock, re-reads the version and finds nothing to do,
+and a failed migration leaves the database exactly as it was.
+
+Databases created before schema_version existed start at version 0, so the
+early migrations are written to be re-runnable over the tables they describe:
+tables and indexes are created if missing, columns added if missing, and
+triggers dropped and recreated. New migrations are appended with the next
+version number and must not edit released ones; change a trigger by
+replacing it in a new migration.
+
+Every migration carries its own DDL and backfill SQL, frozen as released, and
+never reads dal.models or calls repository code: editing a model must not
+change what an old migration does. A model change therefore needs a new
+migration, and tests/test_migrations.py fails when the migrated schema and
+the models drift apart.
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from dal import sketches
+from dal.models import SchemaVersion
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+MIGRATIONS: list[Migration] = []
+
+def migration(version: int, name: str):
+    """Register the decorated function as migration `version` (versions must increase by one)."""
+    def register(fn: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        if version != len(MIGRATIONS) + 1:
+            raise RuntimeError(f"migration {version} ({name}) registered out of order")
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return register
+
+# --- Helpers for migration scripts ---
+_TABLE_NAME = re.compile(r"CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+def _has_table(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}).first() is not None
+
+def create_tables(conn: Connection, *ddls: str) -> list[str]:
+    """Run CREATE TABLE IF NOT EXISTS statements; return the tables that were new."""
+    created = []
+    for ddl in ddls:
+        name = _TABLE_NAME.search(ddl).group(1)
+        if not _has_table(conn, name):
+            created.append(name)
+        conn.execute(text(ddl))
+    return created
+
+def add_missing_columns(conn: Connection, table: str, *columns: str) -> list[str]:
+    """ALTER TABLE ADD COLUMN for column definitions an existing table lacks (e.g. generated buckets)."""
+    # table_xinfo, unlike table_info, also lists generated columns
+    existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_xinfo({table})")}
+    added = []
+    for column in columns:
+        name = column.split(None, 1)[0]
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column}"))
+            added.append(f"{table}.{name}")
+    return added
+
+def create_indexes(conn: Connection, *ddls: str) -> None:
+    """Run CREATE INDEX IF NOT EXISTS statements."""
+    for ddl in ddls:
+        conn.execute(text(ddl))
+
+_TRIGGER_NAME = re.compile(r"CREATE\s+TRIGGER\s+(\w+)", re.IGNORECASE)
+
+def replace_triggers(conn: Connection, *ddls: str) -> None:
+    """(Re)create triggers: any older definition under the same name is dropped first."""
+    for ddl in ddls:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {_TRIGGER_NAME.search(ddl).group(1)}"))
+        conn.execute(text(ddl))
+
+# --- Migrations ---
+# Column and index definitions that postdate the first tables, so migration 1 can
+# also bring a pre-schema_version database up to its final shape.
+_ARTEFACT_COLUMNS = ("last_conservation_date DATE",)
+_VISITOR_COLUMNS = (
+    "age_band VARCHAR(50)",
+    "region VARCHAR(80)",
+    "membership_type VARCHAR(40)",
+    "email_lower VARCHAR(254) NOT NULL GENERATED ALWAYS AS (lower(email)) VIRTUAL",
+    "name_lower VARCHAR(200) NOT NULL GENERATED ALWAYS AS (lower(full_name)) VIRTUAL",
+)
+_VISIT_COLUMNS = (
+    "visit_month VARCHAR(7) NOT NULL GENERATED ALWAYS AS (strftime('%Y-%m', visit_date)) VIRTUAL",
+    "visit_week VARCHAR(7) NOT NULL GENERATED ALWAYS AS (strftime('%Y-%W', visit_date)) VIRTUAL",
+    "visit_dow INTEGER NOT NULL GENERATED ALWAYS AS (CAST(strftime('%w', visit_date) AS INTEGER)) VIRTUAL",
+)
+_TICKET_COLUMNS = (
+    "purchase_month VARCHAR(7) NOT NULL GENERATED ALWAYS AS (strftime('%Y-%m', purchase_date)) VIRTUAL",
+    "purchase_week VARCHAR(7) NOT NULL GENERATED ALWAYS AS (strftime('%Y-%W', purchase_date)) VIRTUAL",
+    "purchase_dow INTEGER NOT NULL GENERATED ALWAYS AS (CAST(strftime('%w', purchase_date) AS INTEGER)) VIRTUAL",
+)
+
+_CORE_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER NOT NULL,
+        username VARCHAR(80) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(40) NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (user_id),
+        CONSTRAINT ck_user_role CHECK (role IN ('admin','curator','front_desk')),
+        UNIQUE (username)
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS artefacts (
+        artefact_id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        description TEXT,
+        material VARCHAR(100),
+        acquisition_date DATE,
+        last_conservation_date DATE,
+        PRIMARY KEY (artefact_id)
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS exhibits (
+        exhibit_id INTEGER NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        start_date DATE,
+        end_date DATE,
+        PRIMARY KEY (exhibit_id),
+        CONSTRAINT ck_exhibit_dates CHECK ((end_date IS NULL) OR (start_date IS NULL) OR (end_date >= start_date))
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS exhibit_artefacts (
+        exhibit_id INTEGER NOT NULL,
+        artefact_id INTEGER NOT NULL,
+        PRIMARY KEY (exhibit_id, artefact_id),
+        FOREIGN KEY(exhibit_id) REFERENCES exhibits (exhibit_id) ON DELETE CASCADE,
+        FOREIGN KEY(artefact_id) REFERENCES artefacts (artefact_id) ON DELETE CASCADE
+    )
+    """, f"""
+    CREATE TABLE IF NOT EXISTS visitors (
+        visitor_id INTEGER NOT NULL,
+        full_name VARCHAR(200) NOT NULL,
+        email VARCHAR(254) NOT NULL,
+        {_VISITOR_COLUMNS[3]},
+        {_VISITOR_COLUMNS[4]},
+        {_VISITOR_COLUMNS[0]},
+        {_VISITOR_COLUMNS[1]},
+        {_VISITOR_COLUMNS[2]},
+        PRIMARY KEY (visitor_id),
+        UNIQUE (email)
+    )
+    """, f"""
+    CREATE TABLE IF NOT EXISTS visits (
+        visit_id INTEGER NOT NULL,
+        visitor_id INTEGER NOT NULL,
+        exhibit_id INTEGER NOT NULL,
+        visit_date DATE NOT NULL,
+        {_VISIT_COLUMNS[0]},
+        {_VISIT_COLUMNS[1]},
+        {_VISIT_COLUMNS[2]},
+        PRIMARY KEY (visit_id),
+        FOREIGN KEY(visitor_id) REFERENCES visitors (visitor_id) ON DELETE CASCADE,
+        FOREIGN KEY(exhibit_id) REFERENCES exhibits (exhibit_id) ON DELETE CASCADE
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS conservation_records (
+        record_id INTEGER NOT NULL,
+        artefact_id INTEGER NOT NULL,
+        condition VARCHAR(120) NOT NULL,
+        treatment TEXT,
+        due_date DATE,
+        notes TEXT,
+        recorded_at DATETIME NOT NULL,
+        PRIMARY KEY (record_id),
+        FOREIGN KEY(artefact_id) REFERENCES artefacts (artefact_id) ON DELETE CASCADE
+    )
+    """, f"""
+    CREATE TABLE IF NOT EXISTS ticket_purchases (
+        purchase_id INTEGER NOT NULL,
+        visitor_id INTEGER NOT NULL,
+        ticket_type VARCHAR(50) NOT NULL,
+        price NUMERIC(10, 2) NOT NULL,
+        purchase_date DATETIME NOT NULL,
+        {_TICKET_COLUMNS[0]},
+        {_TICKET_COLUMNS[1]},
+        {_TICKET_COLUMNS[2]},
+        PRIMARY KEY (purchase_id),
+        CONSTRAINT ck_ticket_price_nonneg CHECK (price >= 0),
+        FOREIGN KEY(visitor_id) REFERENCES visitors (visitor_id) ON DELETE CASCADE
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS feedback (
+        feedback_id INTEGER NOT NULL,
+        visitor_id INTEGER NOT NULL,
+        exhibit_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL,
+        comments TEXT,
+        submitted_at DATETIME NOT NULL,
+        PRIMARY KEY (feedback_id),
+        CONSTRAINT ck_feedback_rating_range CHECK (rating BETWEEN 1 AND 5),
+        FOREIGN KEY(visitor_id) REFERENCES visitors (visitor_id) ON DELETE CASCADE,
+        FOREIGN KEY(exhibit_id) REFERENCES exhibits (exhibit_id) ON DELETE CASCADE
+    )
+    """,
+)
+
+_CORE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_artefacts_acquisition_date ON artefacts (acquisition_date)",
+    "CREATE INDEX IF NOT EXISTS ix_artefacts_material ON artefacts (material)",
+    "CREATE INDEX IF NOT EXISTS ix_artefacts_name ON artefacts (name)",
+    "CREATE INDEX IF NOT EXISTS ix_exhibits_title ON exhibits (title)",
+    "CREATE INDEX IF NOT EXISTS ix_exhibit_artefacts_artefact ON exhibit_artefacts (artefact_id)",
+    "CREATE INDEX IF NOT EXISTS ix_exhibit_artefacts_exhibit ON exhibit_artefacts (exhibit_id)",
+    "CREATE INDEX IF NOT EXISTS ix_visitors_email_lower ON visitors (email_lower)",
+    "CREATE INDEX IF NOT EXISTS ix_visitors_name_lower ON visitors (name_lower)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_dow_exhibit ON visits (visit_dow, exhibit_id)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_exhibit_date ON visits (exhibit_id, visit_date)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_month_exhibit ON visits (visit_month, exhibit_id)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_visitor_date ON visits (visitor_id, visit_date)",
+    "CREATE INDEX IF NOT EXISTS ix_visits_week_exhibit ON visits (visit_week, exhibit_id)",
+    "CREATE INDEX IF NOT EXISTS ix_conservation_due_date ON conservation_records (due_date)",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_purchase_date ON ticket_purchases (purchase_date)",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_purchases_dow_type ON ticket_purchases (purchase_dow, ticket_type, price)",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_purchases_month_type ON ticket_purchases (purchase_month, ticket_type, price)",
+    "CREATE INDEX IF NOT EXISTS ix_feedback_exhibit_submitted ON feedback (exhibit_id, submitted_at)",
+)
+
+@migration(1, "core tables")
+def _core_tables(conn: Connection) -> None:
+    create_tables(conn, *_CORE_TABLES)
+    add_missing_columns(conn, "artefacts", *_ARTEFACT_COLUMNS)
+    add_missing_columns(conn, "visitors", *_VISITOR_COLUMNS)
+    add_missing_columns(conn, "visits", *_VISIT_COLUMNS)
+    add_missing_columns(conn, "ticket_purchases", *_TICKET_COLUMNS)
+    create_indexes(conn, *_CORE_INDEXES)
+    replace_triggers(conn, """
+    CREATE TRIGGER trg_no_future_visits
+    BEFORE INSERT ON visits
+    FOR EACH ROW
+    WHEN date(NEW.visit_date) > date('now')
+    BEGIN
+        SELECT RAISE(ABORT, 'visit_date cannot be in the future');
+    END;
+    """, """
+    CREATE TRIGGER trg_update_last_conservation
+    AFTER INSERT ON conservation_records
+    FOR EACH ROW
+    BEGIN
+        UPDATE artefacts
+        SET last_conservation_date = date(NEW.recorded_at)
+        WHERE artefact_id = NEW.artefact_id;
+    END;
+    """)
+
+# visit_daily_rollups: keep per exhibit/day counts in step with visits
+_VISIT_ROLLUP_INSERT = """
+    CREATE TRIGGER trg_visit_rollup_insert
+    AFTER INSERT ON visits
+    FOR EACH ROW{guard}
+    BEGIN
+        INSERT INTO visit_daily_rollups (exhibit_id, visit_date, visit_count)
+        VALUES (NEW.exhibit_id, NEW.visit_date, 1)
+        ON CONFLICT (exhibit_id, visit_date) DO UPDATE SET visit_count = visit_count + 1;
+    END;
+    """
+_VISIT_ROLLUP_DELETE = """
+    CREATE TRIGGER trg_visit_rollup_delete
+    AFTER DELETE ON visits
+    FOR EACH ROW{guard}
+    BEGIN
+        UPDATE visit_daily_rollups SET visit_count = visit_count - 1
+        WHERE exhibit_id = OLD.exhibit_id AND visit_date = OLD.visit_date;
+        DELETE FROM visit_daily_rollups
+        WHERE exhibit_id = OLD.exhibit_id AND visit_date = OLD.visit_date AND visit_count <= 0;
+    END;
+    """
+
+@migration(2, "visit daily rollups")
+def _visit_rollups(conn: Connection) -> None:
+    created = create_tables(conn, """
+    CREATE TABLE IF NOT EXISTS visit_daily_rollups (
+        exhibit_id INTEGER NOT NULL,
+        visit_date DATE NOT NULL,
+        visit_count INTEGER NOT NULL,
+        visit_month VARCHAR(7) NOT NULL GENERATED ALWAYS AS (strftime('%Y-%m', visit_date)) VIRTUAL,
+        PRIMARY KEY (exhibit_id, visit_date),
+        FOREIGN KEY(exhibit_id) REFERENCES exhibits (exhibit_id) ON DELETE CASCADE
+    )
+    """)
+    create_indexes(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_visit_rollups_date ON visit_daily_rollups (visit_date)",
+        "CREATE INDEX IF NOT EXISTS ix_visit_rollups_exhibit_month ON visit_daily_rollups (exhibit_id, visit_month, visit_date, visit_count)",
+        "CREATE INDEX IF NOT EXISTS ix_visit_rollups_month ON visit_daily_rollups (visit_month, visit_date, visit_count)",
+    )
+    replace_triggers(conn, _VISIT_ROLLUP_INSERT.format(guard=""), _VISIT_ROLLUP_DELETE.format(guard=""), """
+    CREATE TRIGGER trg_visit_rollup_update
+    AFTER UPDATE OF exhibit_id, visit_date ON visits
+    FOR EACH ROW
+    BEGIN
+        UPDATE visit_daily_rollups SET visit_count = visit_count - 1
+        WHERE exhibit_id = OLD.exhibit_id AND visit_date = OLD.visit_date;
+        DELETE FROM visit_daily_rollups
+        WHERE exhibit_id = OLD.exhibit_id AND visit_date = OLD.visit_date AND visit_count <= 0;
+        INSERT INTO visit_daily_rollups (exhibit_id, visit_date, visit_count)
+        VALUES (NEW.exhibit_id, NEW.visit_date, 1)
+        ON CONFLICT (exhibit_id, visit_date) DO UPDATE SET visit_count = visit_count + 1;
+    END;
+    """)
+    if created:
+        conn.execute(text("""
+        INSERT INTO visit_daily_rollups (exhibit_id, visit_date, visit_count)
+        SELECT exhibit_id, visit_date, count(visit_id) FROM visits GROUP BY exhibit_id, visit_date
+        """))
+
+@migration(3, "catalogue full-text search")
+def _catalogue_search(conn: Connection) -> None:
+    # FTS5 external-content indexes: the index only, rows stay in artefacts/exhibits.
+    # Prefix indexes make the typeahead-style "term*" queries cheap.
+    missing = not (_has_table(conn, "artefacts_fts") and _has_table(conn, "exhibits_fts"))
+    conn.execute(text("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS artefacts_fts USING fts5(
+        name, description, material,
+        content='artefacts', content_rowid='artefact_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    """))
+    conn.execute(text("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS exhibits_fts USING fts5(
+        title,
+        content='exhibits', content_rowid='exhibit_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    """))
+    replace_triggers(conn, """
+    CREATE TRIGGER trg_artefacts_fts_insert AFTER INSERT ON artefacts BEGIN
+        INSERT INTO artefacts_fts (rowid, name, description, material)
+        VALUES (NEW.artefact_id, NEW.name, NEW.description, NEW.material);
+    END;
+    """, """
+    CREATE TRIGGER trg_artefacts_fts_delete AFTER DELETE ON artefacts BEGIN
+        INSERT INTO artefacts_fts (artefacts_fts, rowid, name, description, material)
+        VALUES ('delete', OLD.artefact_id, OLD.name, OLD.description, OLD.material);
+    END;
+    """,
+    # Only the indexed columns: last_conservation_date updates must not touch the index
+    """
+    CREATE TRIGGER trg_artefacts_fts_update AFTER UPDATE OF name, description, material ON artefacts BEGIN
+        INSERT INTO artefacts_fts (artefacts_fts, rowid, name, description, material)
+        VALUES ('delete', OLD.artefact_id, OLD.name, OLD.description, OLD.material);
+        INSERT INTO artefacts_fts (rowid, name, description, material)
+        VALUES (NEW.artefact_id, NEW.name, NEW.description, NEW.material);
+    END;
+    """, """
+    CREATE TRIGGER trg_exhibits_fts_insert AFTER INSERT ON exhibits BEGIN
+        INSERT INTO exhibits_fts (rowid, title) VALUES (NEW.exhibit_id, NEW.title);
+    END;
+    """, """
+    CREATE TRIGGER trg_exhibits_fts_delete AFTER DELETE ON exhibits BEGIN
+        INSERT INTO exhibits_fts (exhibits_fts, rowid, title) VALUES ('delete', OLD.exhibit_id, OLD.title);
+    END;
+    """, """
+    CREATE TRIGGER trg_exhibits_fts_update AFTER UPDATE OF title ON exhibits BEGIN
+        INSERT INTO exhibits_fts (exhibits_fts, rowid, title) VALUES ('delete', OLD.exhibit_id, OLD.title);
+        INSERT INTO exhibits_fts (rowid, title) VALUES (NEW.exhibit_id, NEW.title);
+    END;
+    """)
+    if missing:
+        conn.execute(text("INSERT INTO artefacts_fts (artefacts_fts) VALUES ('rebuild')"))
+        conn.execute(text("INSERT INTO exhibits_fts (exhibits_fts) VALUES ('rebuild')"))
+
+# Re-derive one artefact's conservation state from its remaining records. The EXISTS guard
+# skips artefacts being deleted (their records cascade away after the artefact row is gone).
+_RECOMPUTE_CONSERVATION_STATE = """
+        DELETE FROM artefact_conservation_state WHERE artefact_id = {artefact};
+        INSERT INTO artefact_conservation_state (artefact_id, record_id, condition, due_date, recorded_at)
+        SELECT artefact_id, record_id, condition, due_date, recorded_at
+        FROM conservation_records
+        WHERE artefact_id = {artefact}
+          AND EXISTS (SELECT 1 FROM artefacts WHERE artefact_id = {artefact})
+        ORDER BY recorded_at DESC, record_id DESC
+        LIMIT 1;"""
+
+@migration(4, "artefact conservation state")
+def _conservation_state(conn: Connection) -> None:
+    # The newest record (by recorded_at, then record_id) per artefact
+    created = create_tables(conn, """
+    CREATE TABLE IF NOT EXISTS artefact_conservation_state (
+        artefact_id INTEGER NOT NULL,
+        record_id INTEGER NOT NULL,
+        condition VARCHAR(120) NOT NULL,
+        due_date DATE,
+        recorded_at DATETIME NOT NULL,
+        PRIMARY KEY (artefact_id),
+        FOREIGN KEY(artefact_id) REFERENCES artefacts (artefact_id) ON DELETE CASCADE
+    )
+    """)
+    create_indexes(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_conservation_state_condition_due ON artefact_conservation_state (condition, due_date)",
+        "CREATE INDEX IF NOT EXISTS ix_conservation_state_due ON artefact_conservation_state (due_date)",
+    )
+    replace_triggers(conn, """
+    CREATE TRIGGER trg_conservation_state_insert
+    AFTER INSERT ON conservation_records
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO artefact_conservation_state (artefact_id, record_id, condition, due_date, recorded_at)
+        VALUES (NEW.artefact_id, NEW.record_id, NEW.condition, NEW.due_date, NEW.recorded_at)
+        ON CONFLICT (artefact_id) DO UPDATE SET
+            record_id = excluded.record_id,
+            condition = excluded.condition,
+            due_date = excluded.due_date,
+            recorded_at = excluded.recorded_at
+        WHERE (excluded.recorded_at, excluded.record_id)
+            > (artefact_conservation_state.recorded_at, artefact_conservation_state.record_id);
+    END;
+    """, f"""
+    CREATE TRIGGER trg_conservation_state_delete
+    AFTER DELETE ON conservation_records
+    FOR EACH ROW
+    WHEN OLD.record_id = (SELECT record_id FROM artefact_conservation_state WHERE artefact_id = OLD.artefact_id)
+    BEGIN
+        {_RECOMPUTE_CONSERVATION_STATE.format(artefact="OLD.artefact_id")}
+    END;
+    """, f"""
+    CREATE TRIGGER trg_conservation_state_update
+    AFTER UPDATE OF artefact_id, condition, due_date, recorded_at ON conservation_records
+    FOR EACH ROW
+    BEGIN
+        {_RECOMPUTE_CONSERVATION_STATE.format(artefact="OLD.artefact_id")}
+        {_RECOMPUTE_CONSERVATION_STATE.format(artefact="NEW.artefact_id")}
+    END;
+    """)
+    if created:
+        conn.execute(text("""
+        INSERT INTO artefact_conservation_state (artefact_id, record_id, condition, due_date, recorded_at)
+        SELECT artefact_id, record_id, condition, due_date, recorded_at FROM (
+            SELECT *, row_number() OVER (PARTITION BY artefact_id ORDER BY recorded_at DESC, record_id DESC) AS rn
+            FROM conservation_records
+        ) WHERE rn = 1
+        """))
+
+@migration(5, "year archives")
+def _year_archives(conn: Connection) -> None:
+    # Moving a year to or from an archive file (dal/archive.py) sets the 'archiving'
+    # flag: the rollups keep covering the moved visits.
+    create_tables(conn, """
+    CREATE TABLE IF NOT EXISTS archive_years (
+        year INTEGER NOT NULL,
+        path VARCHAR(500) NOT NULL,
+        visits INTEGER NOT NULL,
+        tickets INTEGER NOT NULL,
+        archived_at DATETIME NOT NULL,
+        PRIMARY KEY (year)
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS maintenance_flags (
+        name VARCHAR(40) NOT NULL,
+        set_at DATETIME NOT NULL,
+        PRIMARY KEY (name)
+    )
+    """)
+    guard = "\n    WHEN NOT EXISTS (SELECT 1 FROM maintenance_flags WHERE name = 'archiving')"
+    replace_triggers(conn, _VISIT_ROLLUP_INSERT.format(guard=guard), _VISIT_ROLLUP_DELETE.format(guard=guard))
+
+@migration(6, "unique-visitor sketches")
+def _visit_sketches(conn: Connection) -> None:
+    created = create_tables(conn, """
+    CREATE TABLE IF NOT EXISTS visit_sketches (
+        exhibit_id INTEGER NOT NULL,
+        visit_date DATE NOT NULL,
+        sketch BLOB NOT NULL,
+        PRIMARY KEY (exhibit_id, visit_date),
+        FOREIGN KEY(exhibit_id) REFERENCES exhibits (exhibit_id) ON DELETE CASCADE
+    )
+    """, """
+    CREATE TABLE IF NOT EXISTS region_visit_sketches (
+        region VARCHAR(80) NOT NULL,
+        visit_date DATE NOT NULL,
+        sketch BLOB NOT NULL,
+        PRIMARY KEY (region, visit_date)
+    )
+    """)
+    create_indexes(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_visit_sketches_date ON visit_sketches (visit_date)",
+        "CREATE INDEX IF NOT EXISTS ix_region_visit_sketches_date ON region_visit_sketches (visit_date)",
+    )
+    if created:
+        # The sketches are computed in Python (dal/sketches.py), on the migration's own connection
+        regions: dict[int, str | None] = {}
+        def visits():
+            rows = conn.exec_driver_sql(
+                "SELECT v.visitor_id, v.exhibit_id, v.visit_date, r.region FROM visits v JOIN visitors r ON r.visitor_id = v.visitor_id"
+            )
+            for visitor_id, exhibit_id, visit_date, region in rows:
+                regions[visitor_id] = region
+                yield visitor_id, exhibit_id, visit_date
+        sketches.store_sketches(conn.connection.dbapi_connection, *sketches.sketch_visits(visits(), regions))
+
+@migration(7, "csv import progress")
+def _import_progress(conn: Connection) -> None:
+    # Resumable CSV imports store rows_done in the same transaction as each chunk
+    create_tables(conn, """
+    CREATE TABLE IF NOT EXISTS import_progress (
+        source VARCHAR(1000) NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        fingerprint VARCHAR(100) NOT NULL,
+        rows_done INTEGER NOT NULL,
+        updated_at DATETIME NOT NULL,
+        PRIMARY KEY (source, kind)
+    )
+    """)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+_SCHEMA_VERSION = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER NOT NULL,
+    name VARCHAR(120) NOT NULL,
+    applied_at DATETIME NOT NULL,
+    PRIMARY KEY (version)
+)
+"""
+
+# --- Runner ---
+def current_version(bind: Engine | Connection) -> int:
+    """max(version) from schema_version; 0 for a new or pre-migration database."""
+    try:
+        if isinstance(bind, Connection):
+            return bind.execute(select(SchemaVersion.version).order_by(SchemaVersion.version.desc()).limit(1)).scalar() or 0
+        with bind.connect() as conn:
+            return current_version(conn)
+    except OperationalError:  # no schema_version table yet
+        return 0
+
+def _begin_immediate(conn: Connection) -> None:
+    # Engines with pysqlite's default transaction handling issue BEGIN only before DML,
+    # which would leave the DDL in autocommit; take the write lock up front instead.
+    dbapi = conn.connection.dbapi_connection
+    if not dbapi.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def migrate(bind: Engine, check_bind: Engine | None = None) -> list[Migration]:
+    """Apply pending migrations to bind in one transaction; return the ones applied.
+
+    check_bind (e.g. the read-only pool) serves the up-to-date check, so a
+    current database costs one read and never takes the write lock.
+    """
+    if current_version(check_bind or bind) >= LATEST_VERSION:
+        return []
+    with bind.begin() as conn:
+        _begin_immediate(conn)
+        create_tables(conn, _SCHEMA_VERSION)
+        version = current_version(conn)  # another process may have migrated while we waited
+        pending = [m for m in MIGRATIONS if m.version > version]
+        for m in pending:
+            m.apply(conn)
+            conn.execute(SchemaVersion.__table__.insert().values(version=m.version, name=m.name, applied_at=datetime.utcnow()))
+    return pending
+
+def history(bind: Engine) -> list[tuple[int, str, datetime]]:
+    """Applied migrations, oldest first."""
+    try:
+        with bind.connect() as conn:
+            return conn.execute(select(SchemaVersion.version, SchemaVersion.name, SchemaVersion.applied_at).order_by(SchemaVersion.version)).all()
+    except OperationalError:
+        return []
@@ -1,32 +1,229 @@
 from __future__ import annotations
 
 import csv
-from pathlib import Path
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
 from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.exc import IntegrityError
 
+from business.validators import ValidationError, parse_date, validate_email
 from dal.db import get_session
+from dal.models import ImportProgress
 from dal import repositories as repo
 
-def import_artefacts_csv(csv_path: str | Path) -> int:
-    """Import artefacts from a CSV file.
+logger = logging.getLogger(__name__)
 
-    Expected headers: name, description, material, acquisition_date(YYYY-MM-DD)
+DEFAULT_BATCH_SIZE = 1000
+
+@dataclass(frozen=True)
+class RowError:
+    line: int  # physical line in the CSV file (header is line 1)
+    message: str
+
+@dataclass
+class ImportReport:
+    kind: str
+    rows_read: int = 0
+    created: int = 0
+    skipped: int = 0
+    resumed_from: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+ProgressCallback = Callable[[ImportReport], None]
+
+class CsvImportError(ValueError):
+    """Some rows could not be imported; the valid rows are committed."""
+
+    def __init__(self, report: ImportReport):
+        first = report.errors[0]
+        super().__init__(f"{len(report.errors)} row(s) not imported (line {first.line}: {first.message})")
+        self.report = report
+
+class _SkipRow(Exception):
+    """Row is intentionally ignored (e.g. blank name), not an error."""
+
+def _clean(row: dict, key: str) -> str | None:
+    return (row.get(key) or "").strip() or None
+
+def _optional_date(row: dict, key: str):
+    raw = _clean(row, key)
+    return parse_date(raw) if raw else None
+
+def _parse_artefact(row: dict) -> dict:
+    name = _clean(row, "name")
+    if not name:
+        raise _SkipRow()
+    return {
+        "name": name,
+        "description": _clean(row, "description"),
+        "material": _clean(row, "material"),
+        "acquisition_date": _optional_date(row, "acquisition_date"),
+    }
+
+def _parse_exhibit(row: dict) -> dict:
+    title = _clean(row, "title")
+    if not title:
+        raise _SkipRow()
+    start = _optional_date(row, "start_date")
+    end = _optional_date(row, "end_date")
+    if start and end and end < start:
+        raise ValidationError("end_date must not be before start_date")
+    return {"title": title, "start_date": start, "end_date": end}
+
+def _parse_visitor(row: dict) -> dict:
+    full_name = _clean(row, "full_name")
+    email = _clean(row, "email")
+    if not full_name and not email:
+        raise _SkipRow()
+    if not full_name:
+        raise ValidationError("full_name is required")
+    validate_email(email or "")
+    return {
+        "full_name": full_name,
+        "email": email,
+        "age_band": _clean(row, "age_band"),
+        "region": _clean(row, "region"),
+        "membership_type": _clean(row, "membership_type"),
+    }
+
+# kind -> (row parser, bulk insert)
+_IMPORTERS = {
+    "artefacts": (_parse_artefact, repo.create_artefacts_bulk),
+    "exhibits": (_parse_exhibit, repo.create_exhibits_bulk),
+    "visitors": (_parse_visitor, repo.create_visitors_bulk),
+}
+
+# --- Checkpoints ---
+# import_progress records how many data rows have been imported, in the same
+# transaction as the chunk that reached it, so a crashed import skips exactly
+# the committed rows on the next run. The row is removed once the file completes.
+def _fingerprint(path: Path) -> str:
+    st = path.stat()
+    return json.dumps({"size": st.st_size, "mtime_ns": st.st_mtime_ns})
+
+def _load_checkpoint(session, source: str, kind: str, path: Path) -> int:
+    progress = session.get(ImportProgress, (source, kind))
+    if progress is None:
+        return 0
+    if progress.fingerprint != _fingerprint(path):
+        raise ValueError(f"Import progress for {source} ({kind}) does not match the file; run with resume=False to start over")
+    return progress.rows_done
+
+def _save_checkpoint(session, source: str, kind: str, path: Path, rows_done: int) -> None:
+    session.merge(ImportProgress(source=source, kind=kind, fingerprint=_fingerprint(path), rows_done=rows_done, updated_at=datetime.utcnow()))
+
+def _clear_checkpoint(session, source: str, kind: str) -> None:
+    progress = session.get(ImportProgress, (source, kind))
+    if progress is not None:
+        session.delete(progress)
+
+def _insert_chunk(session, bulk_insert, chunk: list[tuple[int, dict]], report: ImportReport) -> None:
+    # Nothing since the last commit but this chunk, so a failed bulk insert can
+    # roll the whole transaction back.
+    try:
+        report.created += bulk_insert(session, [values for _, values in chunk])
+        return
+    except IntegrityError:
+        session.rollback()
+
+    # Something in the chunk violates a DB constraint (e.g. duplicate email):
+    # retry row by row under savepoints so only the offending rows are reported.
+    for line, values in chunk:
+        try:
+            with session.begin_nested():
+                bulk_insert(session, [values])
+            report.created += 1
+        except IntegrityError as e:
+            report.errors.append(RowError(line, str(e.orig)))
+
+def import_csv(
+    csv_path: str | Path,
+    kind: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: ProgressCallback | None = None,
+    checkpoint_key: str | None = None,
+    resume: bool = True,
+    session_factory=get_session,
+) -> ImportReport:
+    """Stream a CSV file into the database in committed chunks.
+
+    kind is one of "artefacts", "exhibits" or "visitors". Bad rows are collected
+    in ImportReport.errors instead of aborting the import. Each chunk is committed
+    together with the import's progress (keyed by checkpoint_key, default the
+    resolved file path), then on_progress (if given) is called with the running
+    report.
     """
+    if kind not in _IMPORTERS:
+        raise ValueError(f"Unknown import kind '{kind}' (expected one of {sorted(_IMPORTERS)})")
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
     path = Path(csv_path)
     if not path.exists():
         raise FileNotFoundError(path)
 
-    created = 0
-    with path.open("r", encoding="utf-8-sig", newline="") as f, get_session() as session:
+    parse_row, bulk_insert = _IMPORTERS[kind]
+    source = checkpoint_key or str(path.resolve())
+
+    with path.open("r", encoding="utf-8-sig", newline="") as f, session_factory() as session:
+        if resume:
+            rows_done = _load_checkpoint(session, source, kind, path)
+        else:
+            _clear_checkpoint(session, source, kind)
+            rows_done = 0
+        report = ImportReport(kind=kind, rows_read=rows_done, resumed_from=rows_done)
+        if rows_done:
+            logger.info("Resuming %s import of %s after %d rows", kind, path, rows_done)
+
+        def flush(chunk):
+            if chunk:
+                _insert_chunk(session, bulk_insert, chunk, report)
+            _save_checkpoint(session, source, kind, path, report.rows_read)
+            session.commit()  # the chunk and its progress, or neither
+            if on_progress:
+                on_progress(report)
+
         reader = csv.DictReader(f)
-        for row in reader:
-            name = (row.get("name") or "").strip()
-            if not name:
+        chunk: list[tuple[int, dict]] = []
+        for index, row in enumerate(reader):
+            if index < rows_done:
                 continue
-            description = (row.get("description") or "").strip() or None
-            material = (row.get("material") or "").strip() or None
-            acq_raw = (row.get("acquisition_date") or "").strip()
-            acq_date = datetime.strptime(acq_raw, "%Y-%m-%d").date() if acq_raw else None
-            repo.create_artefact(session, name, description, material, acq_date)
-            created += 1
-    return created
+            report.rows_read += 1
+            try:
+                chunk.append((reader.line_num, parse_row(row)))
+            except _SkipRow:
+                report.skipped += 1
+            except ValidationError as e:
+                report.errors.append(RowError(reader.line_num, str(e)))
+            if report.rows_read - rows_done >= batch_size:
+                flush(chunk)
+                rows_done = report.rows_read
+                chunk = []
+        flush(chunk)
+        _clear_checkpoint(session, source, kind)
+        session.commit()
+
+    return report
+
+def import_artefacts_csv(csv_path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Import artefacts from a CSV file; returns the number created.
+
+    Expected headers: name, description, material, acquisition_date(YYYY-MM-DD)
+    Raises CsvImportError (a ValueError, as before) if any row was rejected;
+    its report lists them. The valid rows stay imported.
+    """
+    report = import_csv(csv_path, "artefacts", batch_size=batch_size)
+    if report.errors:
+        raise CsvImportError(report)
+    return report.created
+
+def import_exhibits_csv(csv_path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """Expected headers: title, start_date, end_date (dates YYYY-MM-DD)."""
+    return import_csv(csv_path, "exhibits", batch_size=batch_size)
+
+def import_visitors_csv(csv_path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """Expected headers: full_name, email, age_band, region, membership_type."""
+    return import_csv(csv_path, "visitors", batch_size=batch_size)
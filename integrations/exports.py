@@ -0,0 +1,162 @@
+"""Streaming CSV / JSONL extracts of visits, ticket sales and feedback.
+
+Usage:
+    python -m integrations.exports visits|tickets|feedback [--format csv|jsonl] [--gzip]
+        [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--exhibit-id N] [--out FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from pathlib import Path
+
+from business.validators import ValidationError, parse_date
+from dal.db import get_session
+from dal import repositories as repo
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _csv_chunks(columns: list[str], batches: Iterable[list]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def _jsonl_chunks(columns: list[str], batches: Iterable[list]) -> Iterator[str]:
+    encode = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+    for batch in batches:
+        yield "".join([encode(dict(zip(columns, row))) + "\n" for row in batch])
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream on the fly (one compressor, output flushed only when it has data)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 16+15: gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+def stream_export(
+    kind: str,
+    fmt: str = "csv",
+    start: date | None = None,
+    end: date | None = None,
+    exhibit_id: int | None = None,
+    compress: bool = False,
+    batch_size: int = repo.EXPORT_BATCH_SIZE,
+    on_batch: Callable[[int], None] | None = None,
+    session_factory=partial(get_session, "read"),
+) -> Iterator[bytes]:
+    """Encoded export as an iterator of byte chunks, one per batch of rows.
+
+    Arguments are checked before the first chunk, so a bad kind, format or
+    filter raises ValueError immediately rather than mid-stream. The session
+    is opened when iteration starts and closed when it ends. on_batch is
+    called with the size of each batch written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (expected one of {sorted(FORMATS)})")
+    repo.export_statement(kind, start, end, exhibit_id)  # validate now
+    columns = repo.export_columns(kind)
+    encode = _csv_chunks if fmt == "csv" else _jsonl_chunks
+
+    def batches(session):
+        for batch in repo.iter_export_batches(session, kind, start, end, exhibit_id, batch_size):
+            yield batch
+            if on_batch:
+                on_batch(len(batch))
+
+    def chunks():
+        with session_factory() as session:
+            for text in encode(columns, batches(session)):
+                yield text.encode("utf-8")
+
+    return gzip_chunks(chunks()) if compress else chunks()
+
+def export_filename(kind: str, fmt: str, compress: bool = False) -> str:
+    return f"{kind}-{date.today():%Y%m%d}.{fmt}" + (".gz" if compress else "")
+
+def write_export(path: str | Path | None, kind: str, fmt: str = "csv", **options) -> int:
+    """Write an export to path (stdout when None or "-"); returns the number of rows."""
+    rows = 0
+    def count(n: int) -> None:
+        nonlocal rows
+        rows += n
+    chunks = stream_export(kind, fmt, on_batch=count, **options)
+    if path in (None, "-"):
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+    else:
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    return rows
+
+# --- CLI ---
+def _date_arg(value: str):
+    try:
+        return parse_date(value)
+    except ValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def add_export_arguments(p: argparse.ArgumentParser) -> None:
+    p.add_argument("kind", choices=sorted(repo.EXPORTS))
+    p.add_argument("--format", dest="fmt", choices=sorted(FORMATS), default="csv")
+    p.add_argument("--gzip", action="store_true", help="Compress on the fly")
+    p.add_argument("--start", type=_date_arg, default=None, help="First date to include (YYYY-MM-DD)")
+    p.add_argument("--end", type=_date_arg, default=None, help="Last date to include (YYYY-MM-DD)")
+    p.add_argument("--exhibit-id", type=int, default=None, help="Only this exhibit (visits and feedback)")
+    p.add_argument("--batch-size", type=int, default=repo.EXPORT_BATCH_SIZE)
+    p.add_argument("--out", default=None, help="Output file (default: stdout)")
+
+def run_export(args: argparse.Namespace) -> int:
+    rows = write_export(
+        args.out,
+        args.kind,
+        args.fmt,
+        start=args.start,
+        end=args.end,
+        exhibit_id=args.exhibit_id,
+        compress=args.gzip,
+        batch_size=args.batch_size,
+    )
+    if args.out not in (None, "-"):
+        print(f"Exported {rows} {args.kind} rows to {args.out}")
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m integrations.exports", description="Stream a CSV/JSONL extract")
+    add_export_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        return run_export(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import sys
+
 from utils.logging_config import configure_logging
 from database.db_init import create_database
+from presentation.batch import main as batch_main
 from presentation.cli import run
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
     configure_logging()
     create_database()
+    if argv:
+        return batch_main(argv)
     run()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,322 @@
+"""Non-interactive CLI for scripts and cron jobs.
+
+Usage:
+    python main.py add-visits --file visits.csv|visits.jsonl|- [--format csv|jsonl] [--json]
+    python main.py apply --file operations.jsonl|- [--json]
+    python main.py reports [--json] [--top N] [--within-days N]
+    python main.py forecast [--months N] [--json]
+    python main.py export visits|tickets|feedback [--format csv|jsonl] [--gzip] [--out FILE] ...
+
+Credentials are read from the environment once per run: MUSEUM_TOKEN equal to
+CLI_BATCH_TOKEN acts as CLI_BATCH_ROLE without a password check; otherwise
+MUSEUM_USERNAME and MUSEUM_PASSWORD are verified once. All writes of a run
+share one session and transaction, so a bad row stores nothing. With --json,
+output is JSON lines (one object per row or operation, then a summary).
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hmac
+import json
+import os
+import sys
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import asdict
+from datetime import date
+from typing import Any, TextIO
+
+from sqlalchemy.exc import IntegrityError
+
+from business.forecasting import holt_winters_forecast
+from business.validators import ValidationError, parse_date, validate_email, validate_price, validate_rating
+from config import CLI_BATCH_ROLE, CLI_BATCH_TOKEN
+from dal.db import get_session
+from dal import repositories as repo
+from integrations.exports import add_export_arguments, run_export
+from security.auth import AuthenticationError, authenticate
+from security.rbac import Actor, PermissionError, require_role
+
+VISIT_BATCH_SIZE = 5000  # visits per bulk INSERT (all in the run's one transaction)
+
+class BatchError(Exception):
+    """A row or operation of the input could not be applied; nothing was committed."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+# --- Authentication ---
+def authenticate_from_env(environ: Mapping[str, str] = os.environ) -> Actor:
+    token = environ.get("MUSEUM_TOKEN", "")
+    if token:
+        if not CLI_BATCH_TOKEN or not hmac.compare_digest(token.encode(), CLI_BATCH_TOKEN.encode()):
+            raise AuthenticationError("MUSEUM_TOKEN does not match CLI_BATCH_TOKEN")
+        return Actor(username="batch", role=CLI_BATCH_ROLE)
+    username, password = environ.get("MUSEUM_USERNAME", ""), environ.get("MUSEUM_PASSWORD", "")
+    if not (username and password):
+        raise AuthenticationError("Set MUSEUM_TOKEN, or MUSEUM_USERNAME and MUSEUM_PASSWORD")
+    with get_session("read") as session:
+        return authenticate(session, username, password, rehash_session_factory=get_session)
+
+# --- Output ---
+class Output:
+    """JSON lines with --json, otherwise short human-readable lines."""
+
+    def __init__(self, as_json: bool, stream: TextIO | None = None):
+        self.as_json = as_json
+        self.stream = stream or sys.stdout
+
+    def row(self, obj: dict, text: str) -> None:
+        self.stream.write((json.dumps(obj) if self.as_json else text) + "\n")
+
+    def heading(self, text: str) -> None:
+        if not self.as_json:
+            self.stream.write(f"\n-- {text} --\n")
+
+# --- Input ---
+def _read_records(path: str, fmt: str | None) -> Iterator[tuple[int, dict]]:
+    """(line number, record) from a CSV file with a header or a JSON lines file; "-" is stdin."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line, raw in enumerate(f, start=1):
+                if raw.strip():
+                    try:
+                        yield line, json.loads(raw)
+                    except json.JSONDecodeError as e:
+                        raise BatchError(line, f"invalid JSON: {e.msg}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _int(record: dict, key: str) -> int:
+    try:
+        return int(record[key])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError(f"{key} must be an integer")
+
+def _text(record: dict, key: str, required: bool = False) -> str | None:
+    value = str(record.get(key) or "").strip() or None
+    if required and value is None:
+        raise ValidationError(f"{key} is required")
+    return value
+
+def _date(record: dict, key: str, required: bool = False) -> date | None:
+    value = _text(record, key, required)
+    return parse_date(value) if value else None
+
+# --- add-visits ---
+def add_visits(session, records: Iterator[tuple[int, dict]], batch_size: int = VISIT_BATCH_SIZE) -> int:
+    """Validate and bulk-insert visits into session (the caller commits); returns the count."""
+    total, chunk, first = 0, [], None
+
+    def flush() -> None:
+        try:
+            repo.record_visits_bulk(session, chunk)
+        except IntegrityError as e:
+            raise BatchError(first, f"a visit from here to line {line} was rejected: {e.orig}")
+
+    for line, record in records:
+        try:
+            visit = {"visitor_id": _int(record, "visitor_id"), "exhibit_id": _int(record, "exhibit_id"), "visit_date": _date(record, "visit_date", True)}
+        except ValidationError as e:
+            raise BatchError(line, str(e))
+        first = first or line
+        chunk.append(visit)
+        if len(chunk) >= batch_size:
+            flush()
+            total, chunk, first = total + len(chunk), [], None
+    if chunk:
+        flush()
+        total += len(chunk)
+    return total
+
+def _cmd_add_visits(actor: Actor, args: argparse.Namespace, out: Output) -> int:
+    require_role(actor, {"admin", "front_desk"})
+    with get_session() as session:
+        count = add_visits(session, _read_records(args.file, args.format), args.batch_size)
+    out.row({"visits": count, "committed": True}, f"Recorded {count} visits")
+    return 0
+
+# --- apply: mixed write operations ---
+ADMIN_CURATOR, ADMIN_FRONT_DESK, ANYONE = {"admin", "curator"}, {"admin", "front_desk"}, {"admin", "curator", "front_desk"}
+
+def _op_add_artefact(s, r):
+    return repo.create_artefact(s, _text(r, "name", True), _text(r, "description"), _text(r, "material"), _date(r, "acquisition_date")).artefact_id
+
+def _op_add_exhibit(s, r):
+    return repo.create_exhibit(s, _text(r, "title", True), _date(r, "start_date"), _date(r, "end_date")).exhibit_id
+
+def _op_add_visitor(s, r):
+    email = _text(r, "email", True)
+    validate_email(email)
+    return repo.create_visitor(s, _text(r, "full_name", True), email, _text(r, "age_band"), _text(r, "region"), _text(r, "membership_type")).visitor_id
+
+def _op_record_visit(s, r):
+    return repo.record_visit(s, _int(r, "visitor_id"), _int(r, "exhibit_id"), _date(r, "visit_date", True)).visit_id
+
+def _op_sell_ticket(s, r):
+    try:
+        price = float(r["price"])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError("price must be a number")
+    validate_price(price)
+    return repo.record_ticket_purchase(s, _int(r, "visitor_id"), _text(r, "ticket_type", True), price, _date(r, "purchase_date")).purchase_id
+
+def _op_leave_feedback(s, r):
+    rating = _int(r, "rating")
+    validate_rating(rating)
+    return repo.record_feedback(s, _int(r, "visitor_id"), _int(r, "exhibit_id"), rating, _text(r, "comments")).feedback_id
+
+def _op_add_conservation(s, r):
+    return repo.add_conservation_record(s, _int(r, "artefact_id"), _text(r, "condition", True), _text(r, "treatment"), _date(r, "due_date"), _text(r, "notes")).record_id
+
+# op -> (roles allowed, fn(session, record) -> id of the new row); the same roles as the menu
+OPERATIONS: dict[str, tuple[set[str], Callable[[Any, dict], int]]] = {
+    "add-artefact": (ADMIN_CURATOR, _op_add_artefact),
+    "add-exhibit": (ADMIN_CURATOR, _op_add_exhibit),
+    "add-visitor": (ADMIN_FRONT_DESK, _op_add_visitor),
+    "record-visit": (ADMIN_FRONT_DESK, _op_record_visit),
+    "sell-ticket": (ADMIN_FRONT_DESK, _op_sell_ticket),
+    "leave-feedback": (ANYONE, _op_leave_feedback),
+    "add-conservation": (ADMIN_CURATOR, _op_add_conservation),
+}
+
+def apply_operations(session, actor: Actor, records: Iterator[tuple[int, dict]], on_result: Callable[[int, str, int], None] | None = None) -> int:
+    """Run {"op": ..., field: value} records against session (the caller commits); returns the count."""
+    count = 0
+    for line, record in records:
+        op = record.get("op")
+        if op not in OPERATIONS:
+            raise BatchError(line, f"unknown op {op!r} (expected one of {sorted(OPERATIONS)})")
+        roles, fn = OPERATIONS[op]
+        try:
+            require_role(actor, roles)
+            new_id = fn(session, record)
+        except (ValidationError, PermissionError) as e:
+            raise BatchError(line, str(e))
+        except IntegrityError as e:
+            raise BatchError(line, f"rejected by the database: {e.orig}")
+        count += 1
+        if on_result:
+            on_result(line, op, new_id)
+    return count
+
+def _cmd_apply(actor: Actor, args: argparse.Namespace, out: Output) -> int:
+    def done(line: int, op: str, new_id: int) -> None:
+        out.row({"line": line, "op": op, "id": new_id}, f"line {line}: {op} -> id {new_id}")
+    with get_session() as session:
+        count = apply_operations(session, actor, _read_records(args.file, "jsonl"), done)
+    out.row({"operations": count, "committed": True}, f"Committed {count} operations")
+    return 0
+
+# --- reports / forecast ---
+def _reports(top: int, within_days: int) -> list[tuple[str, str, Callable[[Any], list[dict]], Callable[[dict], str]]]:
+    # (key, heading, rows from the session, text line for a row)
+    return [
+        ("visits_by_exhibit", "Top exhibits by visits",
+         lambda s: [{"exhibit_id": r.exhibit_id, "title": r.title, "visits": int(r.visit_count)} for r in repo.visit_counts_by_exhibit(s)],
+         lambda r: f"{r['title']}: {r['visits']}"),
+        ("top_visitors", "Top visitors",
+         lambda s: [{"visitor_id": r.visitor_id, "full_name": r.full_name, "email": r.email, "visits": int(r.visits)} for r in repo.top_visitors(s, limit=top)],
+         lambda r: f"{r['full_name']} ({r['email']}): {r['visits']}"),
+        ("ratings", "Average rating by exhibit",
+         lambda s: [{"exhibit_id": r.exhibit_id, "title": r.title, "avg_rating": round(float(r.avg_rating), 2), "reviews": int(r.num_feedback)} for r in repo.average_rating_by_exhibit(s)],
+         lambda r: f"{r['title']}: {r['avg_rating']:.2f} ({r['reviews']} reviews)"),
+        ("conservation_due", f"Conservation due in {within_days} days",
+         lambda s: [{"artefact_id": r.artefact_id, "name": r.name, "due_date": r.due_date.isoformat(), "condition": r.condition} for r in repo.conservation_due_soon(s, within_days=within_days)],
+         lambda r: f"{r['name']}: due {r['due_date']} (condition: {r['condition']})"),
+    ]
+
+def _forecast_rows(session, months: int) -> list[dict]:
+    monthly = [(r.ym, int(r.count)) for r in repo.monthly_visit_counts(session)]
+    return [asdict(fp) for fp in holt_winters_forecast(monthly, months_ahead=months)]
+
+def _forecast_text(r: dict) -> str:
+    interval = f", 95% range {r['lower']}-{r['upper']}" if r["lower"] is not None else ""
+    return f"{r['year_month']}: {r['predicted_visits']} ({r['method']}{interval})"
+
+def _cmd_reports(actor: Actor, args: argparse.Namespace, out: Output) -> int:
+    require_role(actor, ADMIN_CURATOR)
+    with get_session("analytics") as session:
+        for key, heading, rows, text in _reports(args.top, args.within_days):
+            out.heading(heading)
+            for r in rows(session):
+                out.row({"report": key, **r}, text(r))
+        out.heading(f"Forecast (next {args.months} months visits)")
+        for r in _forecast_rows(session, args.months):
+            out.row({"report": "forecast", **r}, _forecast_text(r))
+    return 0
+
+def _cmd_forecast(actor: Actor, args: argparse.Namespace, out: Output) -> int:
+    require_role(actor, ADMIN_CURATOR)
+    with get_session("analytics") as session:
+        for r in _forecast_rows(session, args.months):
+            out.row(r, _forecast_text(r))
+    return 0
+
+def _cmd_export(actor: Actor, args: argparse.Namespace, out: Output) -> int:
+    require_role(actor, {"admin"})
+    return run_export(args)
+
+# --- Parser ---
+def _months(value: str) -> int:
+    months = int(value)
+    if not 1 <= months <= 24:
+        raise argparse.ArgumentTypeError("months must be between 1 and 24")
+    return months
+
+COMMANDS = ("add-visits", "apply", "reports", "forecast", "export")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python main.py", description="HeritagePlus batch commands (no arguments: interactive menu)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add-visits", help="Record many visits (visitor_id, exhibit_id, visit_date) in one transaction")
+    p.add_argument("--file", required=True, help="CSV with a header or JSON lines; - for stdin")
+    p.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Default: from the file extension (csv for stdin)")
+    p.add_argument("--batch-size", type=int, default=VISIT_BATCH_SIZE)
+    p.add_argument("--json", action="store_true", help="JSON lines output")
+    p.set_defaults(func=_cmd_add_visits)
+
+    p = sub.add_parser("apply", help=f"Run JSON lines of operations in one transaction ({', '.join(OPERATIONS)})")
+    p.add_argument("--file", required=True, help='One {"op": ..., ...} object per line; - for stdin')
+    p.add_argument("--json", action="store_true", help="JSON lines output")
+    p.set_defaults(func=_cmd_apply)
+
+    p = sub.add_parser("reports", help="Visit, visitor, rating and conservation reports plus the visit forecast")
+    p.add_argument("--json", action="store_true", help="JSON lines output, one row per line tagged with its report")
+    p.add_argument("--top", type=int, default=5, help="Top visitors to list")
+    p.add_argument("--within-days", type=int, default=30, help="Conservation due window")
+    p.add_argument("--months", type=_months, default=3, help="Forecast horizon")
+    p.set_defaults(func=_cmd_reports)
+
+    p = sub.add_parser("forecast", help="Forecast monthly visits")
+    p.add_argument("--months", type=_months, default=3)
+    p.add_argument("--json", action="store_true", help="JSON lines output")
+    p.set_defaults(func=_cmd_forecast)
+
+    p = sub.add_parser("export", help="Stream a CSV/JSONL extract (same options as python -m integrations.exports)")
+    add_export_arguments(p)
+    p.set_defaults(func=_cmd_export, json=False)
+
+    return parser
+
+def main(argv: list[str] | None = None, environ: Mapping[str, str] = os.environ) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    out = Output(args.json)
+    try:
+        actor = authenticate_from_env(environ)
+        return args.func(actor, args, out)
+    except (AuthenticationError, PermissionError, BatchError, ValueError) as e:
+        if args.json:
+            out.row({"error": str(e), "line": getattr(e, "line", None), "committed": False}, "")
+        print(f"error: {e}", file=sys.stderr)
+        return 1
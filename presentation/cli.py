@@ -11,7 +11,7 @@ from business.validators import (
     ValidationError, parse_date, validate_email, validate_rating, validate_price
 )
 from dal import repositories as repo
-from business.forecasting import seasonal_naive_forecast
+from business.forecasting import holt_winters_forecast
 
 def _input(prompt: str) -> str:
     return input(prompt).strip()
@@ -20,7 +20,7 @@ def login() -> Actor:
     print("=== HeritagePlus Museum System ===")
     username = _input("Username: ")
     password = getpass.getpass("Password: ")
-    with get_session() as session:
+    with get_session("read") as session:
         return authenticate(session, username, password)
 
 def run() -> None:
@@ -149,7 +149,7 @@ def _add_conservation():
         print(f"Conservation record created with id={rec.record_id}")
 
 def _reports():
-    with get_session() as session:
+    with get_session("analytics") as session:
         print("\n-- Top exhibits by visits --")
         for row in repo.visit_counts_by_exhibit(session):
             print(f"{row.title}: {row.visit_count}")
@@ -168,5 +168,6 @@ def _reports():
 
         print("\n-- Forecast (next 3 months visits) --")
         monthly = [(r.ym, int(r.count)) for r in repo.monthly_visit_counts(session)]
-        for fp in seasonal_naive_forecast(monthly, months_ahead=3):
-            print(f"{fp.year_month}: {fp.predicted_visits} ({fp.method})")
+        for fp in holt_winters_forecast(monthly, months_ahead=3):
+            interval = f", 95% range {fp.lower}-{fp.upper}" if fp.lower is not None else ""
+            print(f"{fp.year_month}: {fp.predicted_visits} ({fp.method}{interval})")
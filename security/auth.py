@@ -1,17 +1,77 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
+from config import REHASH_MAX_PENDING
 from dal.models import User
-from security.passwords import verify_password
+from security.passwords import get_password_pool, needs_rehash
 from security.rbac import Actor
 
+logger = logging.getLogger(__name__)
+
 class AuthenticationError(Exception):
     pass
 
-def authenticate(session: Session, username: str, password: str) -> Actor:
+def authenticate(session: Session, username: str, password: str, rehash_session_factory=None) -> Actor:
+    """Check credentials; verification runs in the password pool (may raise PasswordPoolBusy).
+
+    On success, a hash made with an outdated algorithm or cost is upgraded in the
+    background using rehash_session_factory (defaults to dal.db.get_session).
+    """
     user = session.execute(select(User).where(User.username == username)).scalar_one_or_none()
-    if not user or not verify_password(password, user.password_hash):
+    if not user or not get_password_pool().verify(password, user.password_hash):
         raise AuthenticationError("Invalid username or password")
+    if needs_rehash(user.password_hash):
+        schedule_rehash(user.username, user.password_hash, password, rehash_session_factory)
     return Actor(username=user.username, role=user.role)
+
+# --- Background rehash on login ---
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-rehash")
+_pending: dict[str, Future] = {}  # username -> queued or running rehash
+_pending_lock = threading.Lock()
+
+def _rehash(username: str, old_hash: str, password: str, session_factory) -> bool:
+    if session_factory is None:
+        from dal.db import get_session
+        session_factory = get_session
+    new_hash = get_password_pool().hash(password)
+    with session_factory() as session:
+        # Compare-and-swap: skip if the password was changed meanwhile
+        result = session.execute(
+            update(User)
+            .where(User.username == username, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+        )
+        return result.rowcount == 1
+
+def schedule_rehash(username: str, old_hash: str, password: str, session_factory=None) -> Future | None:
+    """Queue a rehash; None if one is already pending for username or the queue is full.
+
+    A skipped rehash is retried on the user's next login, so the queue never holds
+    more than REHASH_MAX_PENDING plaintext passwords.
+    """
+    with _pending_lock:
+        if username in _pending or len(_pending) >= REHASH_MAX_PENDING:
+            return None
+        future = _rehash_executor.submit(_rehash, username, old_hash, password, session_factory)
+        _pending[username] = future
+
+    def _done(f: Future) -> None:
+        with _pending_lock:
+            if _pending.get(username) is f:
+                del _pending[username]
+        if f.exception():
+            logger.warning("Password rehash for %s failed: %s", username, f.exception())
+
+    future.add_done_callback(_done)
+    return future
+
+def wait_for_rehashes(timeout: float | None = None) -> None:
+    with _pending_lock:
+        pending = list(_pending.values())
+    wait(pending, timeout=timeout)
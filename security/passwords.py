@@ -2,7 +2,18 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import multiprocessing
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from config import (
+    BCRYPT_ROUNDS,
+    PBKDF2_ITERATIONS,
+    PASSWORD_POOL_MAX_PENDING,
+    PASSWORD_POOL_TIMEOUT,
+    PASSWORD_POOL_WORKERS,
+)
 
 try:
     import bcrypt  # type: ignore
@@ -11,24 +22,26 @@ except Exception:
     bcrypt = None
     _HAS_BCRYPT = False
 
-_PBKDF2_ITERATIONS = 210_000
+_PBKDF2_ITERATIONS = PBKDF2_ITERATIONS
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int | None = None) -> str:
     """Return a portable password hash string.
 
     Prefer bcrypt when available (allowed at 80-100 level), otherwise PBKDF2-HMAC-SHA256.
+    rounds overrides the configured bcrypt cost / PBKDF2 iteration count.
     """
     password_bytes = password.encode("utf-8")
 
     if _HAS_BCRYPT:
-        salt = bcrypt.gensalt(rounds=12)
+        salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password_bytes, salt)
         return "bcrypt$" + hashed.decode("utf-8")
 
+    iterations = rounds or _PBKDF2_ITERATIONS
     salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password_bytes, salt, _PBKDF2_ITERATIONS, dklen=32)
+    dk = hashlib.pbkdf2_hmac("sha256", password_bytes, salt, iterations, dklen=32)
     return "pbkdf2$%d$%s$%s" % (
-        _PBKDF2_ITERATIONS,
+        iterations,
         base64.b64encode(salt).decode("ascii"),
         base64.b64encode(dk).decode("ascii"),
     )
@@ -51,3 +64,83 @@ def verify_password(password: str, password_hash: str) -> bool:
         return hashlib.compare_digest(dk, expected)
 
     return False
+
+def needs_rehash(password_hash: str) -> bool:
+    """True when the hash uses an older algorithm or cost than currently configured."""
+    if password_hash.startswith("bcrypt$"):
+        if not _HAS_BCRYPT:
+            return False  # cannot verify it here, so cannot upgrade it either
+        # bcrypt$$2b$12$<salt+hash>: the cost is the third "$" field of the bcrypt part
+        parts = password_hash.split("$")
+        return len(parts) < 4 or not parts[3].isdigit() or int(parts[3]) < BCRYPT_ROUNDS  # never downgrade a stronger hash
+    if password_hash.startswith("pbkdf2$"):
+        if _HAS_BCRYPT:
+            return True  # algorithm upgrade
+        iters = password_hash.split("$", 2)[1]
+        return not iters.isdigit() or int(iters) < _PBKDF2_ITERATIONS  # malformed: replace it
+    return False
+
+# --- Off-thread hashing ---
+class PasswordPoolBusy(Exception):
+    pass
+
+class PasswordHasherPool:
+    """Runs hash/verify in worker processes so request threads are not blocked.
+
+    At most max_pending operations may be queued or running; beyond that callers
+    get PasswordPoolBusy immediately instead of piling up behind slow hashes.
+    With workers=0 everything runs inline (tests, single-user CLI).
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING, timeout: float = PASSWORD_POOL_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a multi-threaded web server is not safe
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy("Too many password operations in progress, try again shortly")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Workers are saturated: same answer as a full queue, not a server error
+            raise PasswordPoolBusy(f"Password check took longer than {self.timeout}s, try again shortly") from None
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self._run(verify_password, password, password_hash)
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+_pool: PasswordHasherPool | None = None
+_pool_lock = threading.Lock()
+
+def get_password_pool() -> PasswordHasherPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PasswordHasherPool()
+        return _pool
@@ -1,55 +1,82 @@
-from utils.db_connection import get_connection
+from dal import sketches
+from utils.db_connection import notify_write, pooled_connection
 
 
 def add_visitor(full_name, email):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        INSERT INTO visitors (full_name, email)
-        VALUES (?, ?)
-        """,
-        (full_name, email)
-    )
-
-    conn.commit()
-    conn.close()
+    with pooled_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO visitors (full_name, email)
+            VALUES (?, ?)
+            """,
+            (full_name, email)
+        )
+    notify_write("visitors")  # new name/email for the typeahead
+
     print("Visitor added successfully.")
 
 
+def add_visitors_bulk(visitors):
+    """Insert many (full_name, email) pairs in one transaction; returns the row count."""
+    with pooled_connection() as conn:
+        cursor = conn.executemany(
+            """
+            INSERT INTO visitors (full_name, email)
+            VALUES (?, ?)
+            """,
+            visitors
+        )
+        count = cursor.rowcount
+    notify_write("visitors")
+
+    print(f"{count} visitors added successfully.")
+    return count
+
+
 def add_visit(visitor_id, exhibit_id, visit_date):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        INSERT INTO visits (visitor_id, exhibit_id, visit_date)
-        VALUES (?, ?, ?)
-        """,
-        (visitor_id, exhibit_id, visit_date)
-    )
-
-    conn.commit()
-    conn.close()
+    with pooled_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO visits (visitor_id, exhibit_id, visit_date)
+            VALUES (?, ?, ?)
+            """,
+            (visitor_id, exhibit_id, visit_date)
+        )
+        sketches.add_visits(conn, [(visitor_id, exhibit_id, visit_date)])  # no trigger can keep them
+    notify_write("visits")
+
     print("Visit recorded successfully.")
 
 
+def add_visits_bulk(visits):
+    """Insert many (visitor_id, exhibit_id, visit_date) rows in one transaction; returns the row count."""
+    visits = list(visits)
+    with pooled_connection() as conn:
+        cursor = conn.executemany(
+            """
+            INSERT INTO visits (visitor_id, exhibit_id, visit_date)
+            VALUES (?, ?, ?)
+            """,
+            visits
+        )
+        count = cursor.rowcount
+        sketches.add_visits(conn, visits)
+    notify_write("visits")
+
+    print(f"{count} visits recorded successfully.")
+    return count
+
+
 def get_visit_counts_by_exhibit():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT e.title, COUNT(v.visit_id) AS visit_count
-        FROM visits v
-        JOIN exhibits e ON v.exhibit_id = e.exhibit_id
-        GROUP BY e.title
-        ORDER BY visit_count DESC
-        """
-    )
-
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT e.title, COUNT(v.visit_id) AS visit_count
+            FROM visits v
+            JOIN exhibits e ON v.exhibit_id = e.exhibit_id
+            GROUP BY e.title
+            ORDER BY visit_count DESC
+            """
+        ).fetchall()
 
+    return rows
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.http import http_date
+
+from dal import repositories as repo
+from dal.cache import query_cache
+from database.db_init import install_schema
+from web import create_app, routes
+
+AUTH = {"Authorization": "Bearer kiosk"}
+
+def _client(monkeypatch):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True, expire_on_commit=False)
+    s = Session()
+    v = repo.create_visitor(s, "Ana", "ana@example.org")
+    ex = repo.create_exhibit(s, "Romans", None, None)
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date(2024, 1, 5))
+    s.commit()
+
+    opened = []
+
+    @contextmanager
+    def fake_get_session(intent="write"):
+        opened.append(intent)
+        yield s
+
+    monkeypatch.setattr(routes, "get_session", fake_get_session)
+    monkeypatch.setattr(routes, "ANALYTICS_API_TOKEN", "kiosk")
+    monkeypatch.setattr(query_cache, "ttl", 1e9)  # no TTL window rollover mid-test
+    query_cache.clear()
+    return create_app().test_client(), s, v, ex, opened
+
+def test_etag_revalidation_skips_queries_until_a_write(monkeypatch):
+    client, s, v, ex, opened = _client(monkeypatch)
+    monkeypatch.setattr(query_cache, "_changed_at", time.time() - 5)  # last write a few seconds ago
+    r = client.get("/api/analytics/visits-by-exhibit", headers=AUTH)
+    assert r.status_code == 200 and opened == ["analytics"]
+    assert r.json["rows"] == [{"exhibit_id": ex.exhibit_id, "title": "Romans", "visits": 1}]
+    etag, modified = r.headers["ETag"], r.headers["Last-Modified"]
+    assert "no-cache" in r.headers["Cache-Control"]
+
+    again = client.get("/api/analytics/visits-by-exhibit", headers={**AUTH, "If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b"" and again.headers["ETag"] == etag
+    since = client.get("/api/analytics/visits-by-exhibit", headers={**AUTH, "If-Modified-Since": modified})
+    assert since.status_code == 304
+    assert opened == ["analytics"]  # neither revalidation opened a session
+
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date(2024, 1, 6))
+    s.commit()
+    changed = client.get("/api/analytics/visits-by-exhibit", headers={**AUTH, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.json["rows"][0]["visits"] == 2
+
+    # Until the write's second is over a later write would share its Last-Modified: only the ETag validates
+    monkeypatch.setattr(query_cache, "_changed_at", time.time() + 5)  # a second that has not passed yet
+    fresh = client.get("/api/analytics/visits-by-exhibit", headers={**AUTH, "If-Modified-Since": http_date(query_cache.changed_at)})
+    assert fresh.status_code == 200 and "Last-Modified" not in fresh.headers
+
+def test_endpoints_serialise_rows_and_reject_bad_requests(monkeypatch):
+    client, s, v, ex, _ = _client(monkeypatch)
+    a = repo.create_artefact(s, "Vase", None, None, None)
+    due = date.today() + timedelta(days=3)
+    repo.add_conservation_record(s, a.artefact_id, "Poor", due_date=due)
+    repo.record_feedback(s, v.visitor_id, ex.exhibit_id, 4, None)
+    s.commit()
+
+    assert client.get("/api/analytics/conservation-due", headers=AUTH).json["rows"] == [
+        {"artefact_id": a.artefact_id, "name": "Vase", "due_date": due.isoformat(), "condition": "Poor"},
+    ]
+    assert client.get("/api/analytics/ratings", headers=AUTH).json["rows"][0]["avg_rating"] == 4.0
+    assert client.get("/api/analytics/top-visitors?limit=1", headers=AUTH).json["rows"] == [{"visitor_id": v.visitor_id, "full_name": "Ana", "visits": 1}]
+    assert client.get("/api/analytics/monthly-visits", headers=AUTH).json["rows"] == [{"ym": "2024-01", "visits": 1}]
+    assert len(client.get("/api/analytics/forecast?months=2", headers=AUTH).json["rows"]) == 2
+
+    assert client.get("/api/analytics/ratings").status_code == 403
+    assert client.get("/api/analytics/ratings", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/api/analytics/nope", headers=AUTH).status_code == 404
+    assert client.get("/api/analytics/forecast?months=99", headers=AUTH).status_code == 400
+    assert client.get("/api/analytics/monthly-visits?start=soon", headers=AUTH).status_code == 400
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from dal import archive
+from dal import repositories as repo
+from dal.models import Visit, VisitDailyRollup, TicketPurchase
+from database.db_init import install_schema
+
+def _setup(tmp_path):
+    url = f"sqlite:///{(tmp_path / 'museum.db').as_posix()}"
+    engine = create_engine(url, future=True)
+    event.listen(engine, "connect", lambda conn, rec: conn.execute("PRAGMA foreign_keys = ON"))
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    s = Session()
+    ana = repo.create_visitor(s, "Ana", "ana@example.org")
+    ben = repo.create_visitor(s, "Ben", "ben@example.org")
+    ex = repo.create_exhibit(s, "Romans", None, None)
+    repo.record_visits_bulk(s, [
+        {"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": d}
+        for v in (ana, ben) for d in (date(2022, 6, 1), date(2023, 3, 1), date(2023, 12, 31))
+    ] + [{"visitor_id": ana.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": date(2024, 1, 1)}])
+    repo.record_ticket_purchases_bulk(s, [
+        {"visitor_id": ana.visitor_id, "ticket_type": "Adult", "price": 18, "purchase_date": datetime(2023, 12, 31, 23, 59)},
+        {"visitor_id": ben.visitor_id, "ticket_type": "Child", "price": 9, "purchase_date": datetime(2023, 5, 1, 10, 0)},
+        {"visitor_id": ana.visitor_id, "ticket_type": "Adult", "price": 18, "purchase_date": datetime(2024, 1, 1, 0, 0)},
+    ])
+    s.commit()
+    return url, engine, s, ana, ben
+
+def _counts(s):
+    rollups = s.execute(select(func.sum(VisitDailyRollup.visit_count))).scalar()
+    return s.execute(select(func.count(Visit.visit_id))).scalar(), s.execute(select(func.count(TicketPurchase.purchase_id))).scalar(), rollups
+
+def test_archive_history_prune_and_restore(tmp_path):
+    url, engine, s, ana, ben = _setup(tmp_path)
+    monthly_before = [tuple(r) for r in repo.monthly_visit_counts(s)]
+
+    result = archive.archive_year(2023, bind=engine, archive_dir=tmp_path / "archive", today=date(2025, 1, 1))
+    assert (result.visits, result.tickets, result.pruned) == (4, 2, 0)
+    assert archive.archive_path(2023, tmp_path / "archive").exists()
+    s.expire_all()
+    assert _counts(s) == (3, 1, 7)  # hot rows left; rollups still cover the archived year
+    assert [tuple(r) for r in repo.monthly_visit_counts(s)] == monthly_before
+    assert [(y, v, t) for y, _, v, t, _ in archive.list_archives(engine)] == [(2023, 4, 2)]
+
+    with archive.history_session(url) as h:
+        assert [tuple(r) for r in archive.yearly_visit_counts(h)] == [("2022", 2), ("2023", 4), ("2024", 1)]
+        assert [(r.year, r.tickets) for r in archive.yearly_ticket_sales(h)] == [("2023", 2), ("2024", 1)]
+
+    # Deleting a visitor cascades: hidden from history at once, pruned from the archive (and rollups) later
+    s.delete(ben)
+    s.commit()
+    with archive.history_session(url) as h:
+        assert [tuple(r) for r in archive.yearly_visit_counts(h)] == [("2022", 1), ("2023", 2), ("2024", 1)]
+    assert archive.prune_archives(engine) == 3
+    s.expire_all()
+    assert _counts(s) == (2, 1, 4)
+
+    restored = archive.restore_year(2023, bind=engine)
+    assert (restored.visits, restored.tickets) == (2, 1)
+    assert not archive.archive_path(2023, tmp_path / "archive").exists()
+    s.expire_all()
+    assert _counts(s) == (4, 2, 4)  # rollups were not counted twice
+    assert archive.list_archives(engine) == []
+
+def test_exact_unique_visitors_include_archived_years(tmp_path):
+    url, engine, s, ana, ben = _setup(tmp_path)
+    archive.archive_year(2023, bind=engine, archive_dir=tmp_path / "archive", today=date(2025, 1, 1))
+    s.expire_all()
+
+    # The sketches keep 2023: the exact audit must read the archived rows too
+    for start, end in [(None, None), (date(2023, 1, 1), date(2023, 12, 31)), (date(2023, 12, 1), None)]:
+        approx, exact = (repo.unique_visitors(s, start, end, exact=e).visitors for e in (False, True))
+        assert approx == exact == 2
+        months = [[(r.exhibit_id, r.ym, r.visitors) for r in repo.unique_visitors_by_exhibit_month(s, start, end, exact=e)] for e in (False, True)]
+        assert months[0] == months[1]
+        regions = [[(r.region, r.visitors) for r in repo.unique_visitors_by_region(s, start, end, exact=e)] for e in (False, True)]
+        assert regions[0] == regions[1] == [(None, 2)]
+    assert repo.unique_visitors(s, date(2024, 1, 1), exact=True).visitors == 1  # hot-only range
+
+def test_archive_refuses_open_years_and_the_newest_rows(tmp_path):
+    _, engine, s, ana, _ = _setup(tmp_path)
+    with pytest.raises(archive.ArchiveError):
+        archive.archive_year(2024, bind=engine, archive_dir=tmp_path, today=date(2024, 6, 1))
+    # 2024 is closed, but it holds the newest ids: new rows would reuse them
+    with pytest.raises(archive.ArchiveError, match="newest row"):
+        archive.archive_year(2024, bind=engine, archive_dir=tmp_path, today=date(2025, 6, 1))
+    with pytest.raises(archive.ArchiveError):
+        archive.restore_year(2021, bind=engine)
+    s.expire_all()
+    assert _counts(s) == (7, 3, 7)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import io
+import json
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal.cache import query_cache
+from dal.models import User, Visit, Visitor
+from database.db_init import install_schema
+from presentation import batch
+from security import passwords
+from security.passwords import hash_password
+
+def _setup(monkeypatch):
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 4)  # cheap hashes that need no upgrade on login
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True, expire_on_commit=False)
+    with Session() as s:
+        v = repo.create_visitor(s, "Ana", "ana@example.org")
+        ex = repo.create_exhibit(s, "Romans", None, None)
+        s.add(User(username="desk", password_hash=hash_password("pw", rounds=4), role="front_desk"))
+        s.commit()
+
+    opened = []
+
+    @contextmanager
+    def fake_get_session(intent="write"):
+        opened.append(intent)
+        session = Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    monkeypatch.setattr(batch, "get_session", fake_get_session)
+    monkeypatch.setattr(batch, "CLI_BATCH_TOKEN", "s3cret")
+    query_cache.clear()
+    return Session, v, ex, opened
+
+def _run(capsys, argv, env=None) -> tuple[int, list[dict]]:
+    code = batch.main(argv, environ=env or {"MUSEUM_TOKEN": "s3cret"})
+    return code, [json.loads(line) for line in capsys.readouterr().out.splitlines() if line]
+
+def test_add_visits_is_one_transaction_and_reports_stream_json(monkeypatch, tmp_path, capsys):
+    Session, v, ex, opened = _setup(monkeypatch)
+    good = tmp_path / "visits.csv"
+    good.write_text("visitor_id,exhibit_id,visit_date\n" + f"{v.visitor_id},{ex.exhibit_id},2024-01-05\n" * 3)
+    assert _run(capsys, ["add-visits", "--file", str(good), "--batch-size", "2", "--json"]) == (0, [{"visits": 3, "committed": True}])
+    assert opened == ["write"]
+
+    # A bad date on line 4 after valid rows: nothing of this file is stored
+    bad = tmp_path / "bad.jsonl"
+    bad.write_text("\n".join(json.dumps({"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": d}) for d in ["2024-02-01"] * 3 + ["02/01/2024"]))
+    code, out = _run(capsys, ["add-visits", "--file", str(bad), "--batch-size", "2", "--json"])
+    assert code == 1 and out[-1]["line"] == 4 and out[-1]["committed"] is False
+    with Session() as s:
+        assert s.execute(select(func.count()).select_from(Visit)).scalar() == 3
+
+    code, out = _run(capsys, ["reports", "--json", "--months", "2"])
+    assert code == 0 and opened[-1] == "analytics"
+    assert {"report": "visits_by_exhibit", "exhibit_id": ex.exhibit_id, "title": "Romans", "visits": 3} in out
+    assert [r["report"] for r in out].count("forecast") == 2
+
+def test_apply_checks_roles_per_operation_and_authenticates_once(monkeypatch, capsys):
+    Session, v, ex, _ = _setup(monkeypatch)
+    ops = [
+        {"op": "add-visitor", "full_name": "Ben", "email": "ben@example.org"},
+        {"op": "record-visit", "visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": date(2024, 3, 1).isoformat()},
+        {"op": "leave-feedback", "visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "rating": 5},
+    ]
+    desk = {"MUSEUM_USERNAME": "desk", "MUSEUM_PASSWORD": "pw"}
+    monkeypatch.setattr("sys.stdin", io.StringIO("\n".join(map(json.dumps, ops))))
+    code, out = _run(capsys, ["apply", "--file", "-", "--json"], desk)
+    assert code == 0 and [r.get("op") for r in out] == ["add-visitor", "record-visit", "leave-feedback", None]
+    assert out[-1] == {"operations": 3, "committed": True}
+
+    # front_desk may not add artefacts: the whole batch is rolled back
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(ops[0] | {"email": "cy@example.org"}) + "\n" + json.dumps({"op": "add-artefact", "name": "Vase"})))
+    code, out = _run(capsys, ["apply", "--file", "-", "--json"], desk)
+    assert code == 1 and out[-1]["line"] == 2
+    with Session() as s:
+        assert s.execute(select(func.count()).select_from(Visitor)).scalar() == 2
+
+    assert _run(capsys, ["forecast"], {"MUSEUM_USERNAME": "desk", "MUSEUM_PASSWORD": "wrong"})[0] == 1
+    assert _run(capsys, ["forecast"], {"MUSEUM_TOKEN": "nope"})[0] == 1
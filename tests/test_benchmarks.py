@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.datagen import DatasetSpec, generate_dataset
+from benchmarks.runner import compare_reports
+from dal.models import Visit
+from database.db_init import install_schema
+
+SPEC = DatasetSpec(visits=500, visitors=50, exhibits=5, artefacts=40, years=1)
+
+def _generate(seed):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    s = sessionmaker(bind=engine, future=True)()
+    counts = generate_dataset(s, SPEC, seed=seed, today=date(2024, 6, 1))
+    return s, counts
+
+def test_generated_dataset_is_deterministic_and_in_the_past():
+    s1, counts = _generate(seed=3)
+    s2, _ = _generate(seed=3)
+    assert counts["visits"] == 500 and counts["conservation_records"] == 60
+    assert s1.scalar(select(func.max(Visit.visit_date))) < date(2024, 6, 1)
+
+    def fingerprint(s):
+        return s.execute(select(Visit.visitor_id, Visit.exhibit_id, Visit.visit_date).order_by(Visit.visit_id)).all()
+    assert fingerprint(s1) == fingerprint(s2)
+
+def test_compare_reports_flags_slowdowns_beyond_tolerance():
+    baseline = {"results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "gen": {"seconds": 1.0}}}
+    current = {"results": {"a": {"median_ms": 11.0}, "b": {"median_ms": 15.0}, "gen": {"seconds": 0.9}}}
+    rows = {r["name"]: r for r in compare_reports(current, baseline, tolerance=0.2)}
+    assert not rows["a"]["regression"]
+    assert rows["b"]["regression"]
+    assert not rows["gen"]["regression"]
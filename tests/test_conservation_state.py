@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete, select, text, update
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal.cache import query_cache
+from dal.models import Artefact, ArtefactConservationState, ConservationRecord
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA foreign_keys=ON;"))
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    query_cache.clear()
+    return engine, Session()
+
+def _state(s):
+    rows = s.execute(select(ArtefactConservationState.artefact_id, ArtefactConservationState.record_id, ArtefactConservationState.condition)).all()
+    return {r.artefact_id: (r.record_id, r.condition) for r in rows}
+
+def test_state_tracks_latest_record_through_inserts_updates_and_deletes():
+    _, s = _setup()
+    a = repo.create_artefact(s, "Vase", None, None, None)
+    b = repo.create_artefact(s, "Helmet", None, None, None)
+    t0 = datetime(2024, 1, 1, 9, 0)
+    old = repo.add_conservation_records_bulk(s, [
+        {"artefact_id": a.artefact_id, "condition": "Poor", "recorded_at": t0 + timedelta(days=10)},
+        {"artefact_id": a.artefact_id, "condition": "Fair", "recorded_at": t0},  # back-dated: does not supersede
+        {"artefact_id": b.artefact_id, "condition": "Good", "recorded_at": t0},
+    ], return_objects=True)
+    newest_a = old[0].record_id
+    assert _state(s) == {a.artefact_id: (newest_a, "Poor"), b.artefact_id: (old[2].record_id, "Good")}
+
+    # Deleting the current record falls back to the next newest one
+    s.execute(delete(ConservationRecord).where(ConservationRecord.record_id == newest_a))
+    assert _state(s)[a.artefact_id] == (old[1].record_id, "Fair")
+
+    # Moving b's only record onto a makes it a's newest and leaves b without a state
+    s.execute(update(ConservationRecord).where(ConservationRecord.record_id == old[2].record_id).values(artefact_id=a.artefact_id, recorded_at=t0 + timedelta(days=20)))
+    assert _state(s) == {a.artefact_id: (old[2].record_id, "Good")}
+
+    # Deleting the artefact cascades through records and state without FK errors
+    s.execute(delete(Artefact).where(Artefact.artefact_id == a.artefact_id))
+    assert _state(s) == {}
+
+    s.commit()
+
+def test_due_soon_ignores_superseded_records_and_supports_paging_and_grouping():
+    _, s = _setup()
+    today = date.today()
+    arts = [repo.create_artefact(s, f"Artefact {i}", None, None, None) for i in range(5)]
+    t0 = datetime(2024, 1, 1)
+    repo.add_conservation_records_bulk(s, [
+        # Artefact 0 was due, but a newer record pushed its due date out of the window
+        {"artefact_id": arts[0].artefact_id, "condition": "Poor", "due_date": today + timedelta(days=3), "recorded_at": t0},
+        {"artefact_id": arts[0].artefact_id, "condition": "Good", "due_date": today + timedelta(days=300), "recorded_at": t0 + timedelta(days=1)},
+        {"artefact_id": arts[1].artefact_id, "condition": "Poor", "due_date": today - timedelta(days=2), "recorded_at": t0},
+        {"artefact_id": arts[2].artefact_id, "condition": "Fair", "due_date": today + timedelta(days=10), "recorded_at": t0},
+        {"artefact_id": arts[3].artefact_id, "condition": "Poor", "due_date": today + timedelta(days=10), "recorded_at": t0},
+        {"artefact_id": arts[4].artefact_id, "condition": "Fair", "due_date": None, "recorded_at": t0},
+    ])
+    s.commit()
+
+    due = repo.conservation_due_soon(s, within_days=30)
+    assert [r.artefact_id for r in due] == [arts[1].artefact_id, arts[2].artefact_id, arts[3].artefact_id]
+    assert [r.artefact_id for r in repo.conservation_due_soon(s, days=30, limit=1)] == [arts[1].artefact_id]
+
+    seen, after = [], None
+    while True:
+        page = repo.page_conservation_due(s, within_days=30, after=after, limit=2)
+        seen += [r.artefact_id for r in page.items]
+        if page.next_cursor is None:
+            break
+        after = page.next_cursor
+    assert seen == [r.artefact_id for r in due]
+
+    poor = repo.page_conservation_due(s, within_days=30, condition="Poor")
+    assert [r.artefact_id for r in poor.items] == [arts[1].artefact_id, arts[3].artefact_id]
+
+    by_condition = {r.condition: (r.artefacts, r.earliest_due) for r in repo.conservation_due_by_condition(s, within_days=30)}
+    assert by_condition == {"Poor": (2, today - timedelta(days=2)), "Fair": (1, today + timedelta(days=10))}
+
+def test_due_soon_is_an_index_range_scan_and_rebuild_matches_triggers():
+    engine, s = _setup()
+    a = repo.create_artefact(s, "Vase", None, None, None)
+    for days in (5, 1, 9):
+        repo.add_conservation_record(s, a.artefact_id, "Fair", due_date=date.today() + timedelta(days=days))
+    s.commit()
+
+    sql = str(repo._conservation_due(30).compile(engine, compile_kwargs={"literal_binds": True}))
+    plan = "\n".join(r[3] for r in s.execute(text("EXPLAIN QUERY PLAN " + sql)).all())
+    assert "INDEX ix_conservation_state_due (due_date>? AND due_date<?)" in plan, plan
+    assert "conservation_records" not in plan, plan
+
+    before = _state(s)
+    assert repo.rebuild_conservation_state(s) == 1
+    assert _state(s) == before
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+
+from dal.db import _use_explicit_begin
+from dal.models import Base, Artefact, Exhibit, ImportProgress, Visitor
+from integrations import csv_import
+from integrations.csv_import import CsvImportError, import_artefacts_csv, import_csv
+
+def _session_factory():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    _use_explicit_begin(engine)  # as on the app's writer engine, so savepoints nest inside the chunk's transaction
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, future=True)
+
+    @contextmanager
+    def factory():
+        s = Session()
+        try:
+            yield s
+            s.commit()
+        finally:
+            s.close()
+
+    return factory
+
+def _count(factory, model) -> int:
+    with factory() as s:
+        return s.execute(select(func.count()).select_from(model)).scalar_one()
+
+def test_import_reports_bad_rows_and_commits_in_chunks(tmp_path):
+    csv_file = tmp_path / "artefacts.csv"
+    csv_file.write_text(
+        "name,description,material,acquisition_date\n"
+        "Vase,,Clay,2020-01-01\n"
+        "Coin,,Silver,not-a-date\n"
+        ",blank name is skipped,,\n"
+        "Helmet,,Bronze,\n"
+        "Sword,,Iron,1999-12-31\n",
+        encoding="utf-8",
+    )
+    factory = _session_factory()
+    progress = []
+
+    report = import_csv(csv_file, "artefacts", batch_size=2, on_progress=lambda r: progress.append(r.rows_read), session_factory=factory)
+
+    assert report.created == 3
+    assert report.skipped == 1
+    assert [e.line for e in report.errors] == [3]
+    assert progress == [2, 4, 5]
+    assert _count(factory, Artefact) == 3
+    assert _count(factory, ImportProgress) == 0
+
+def test_import_isolates_duplicate_emails(tmp_path):
+    csv_file = tmp_path / "visitors.csv"
+    csv_file.write_text(
+        "full_name,email,region\n"
+        "Alice,alice@example.com,North\n"
+        "Alice Again,alice@example.com,North\n"
+        "Bob,bob@example.com,\n"
+        "Eve,not-an-email,\n",
+        encoding="utf-8",
+    )
+    factory = _session_factory()
+
+    report = import_csv(csv_file, "visitors", batch_size=10, session_factory=factory)
+
+    assert report.created == 2
+    assert sorted(e.line for e in report.errors) == [3, 5]
+    assert _count(factory, Visitor) == 2
+
+def test_import_resumes_from_checkpoint(tmp_path):
+    csv_file = tmp_path / "exhibits.csv"
+    csv_file.write_text("title,start_date,end_date\n" + "".join(f"Ex{i},,\n" for i in range(5)), encoding="utf-8")
+    factory = _session_factory()
+
+    class Crash(Exception):
+        pass
+
+    def crash_after_first_chunk(report):
+        raise Crash()
+
+    try:
+        import_csv(csv_file, "exhibits", batch_size=2, on_progress=crash_after_first_chunk, session_factory=factory)
+        assert False, "Expected simulated crash"
+    except Crash:
+        pass
+
+    report = import_csv(csv_file, "exhibits", batch_size=2, session_factory=factory)
+    assert report.resumed_from == 2
+    assert report.created == 3
+    assert _count(factory, Exhibit) == 5
+
+def test_crash_before_commit_does_not_duplicate_the_chunk(tmp_path, monkeypatch):
+    csv_file = tmp_path / "exhibits.csv"
+    csv_file.write_text("title,start_date,end_date\n" + "".join(f"Ex{i},,\n" for i in range(5)), encoding="utf-8")
+    factory = _session_factory()
+
+    class Crash(Exception):
+        pass
+
+    save = csv_import._save_checkpoint
+    calls = []
+
+    def crash_on_second_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise Crash()  # the chunk is inserted but neither it nor its progress is committed
+        save(*args)
+
+    monkeypatch.setattr(csv_import, "_save_checkpoint", crash_on_second_chunk)
+    try:
+        import_csv(csv_file, "exhibits", batch_size=2, session_factory=factory)
+        assert False, "Expected simulated crash"
+    except Crash:
+        pass
+    assert _count(factory, Exhibit) == 2
+
+    monkeypatch.setattr(csv_import, "_save_checkpoint", save)
+    report = import_csv(csv_file, "exhibits", batch_size=2, session_factory=factory)
+    assert report.resumed_from == 2
+    assert report.created == 3
+    assert _count(factory, Exhibit) == 5
+    assert _count(factory, ImportProgress) == 0
+
+def test_import_artefacts_csv_raises_on_bad_rows(tmp_path, monkeypatch):
+    csv_file = tmp_path / "artefacts.csv"
+    csv_file.write_text("name,description,material,acquisition_date\nVase,,Clay,2020-01-01\nCoin,,Silver,not-a-date\n", encoding="utf-8")
+    factory = _session_factory()
+    monkeypatch.setattr(csv_import, "import_csv", lambda *a, **kw: import_csv(*a, session_factory=factory, **kw))
+
+    try:
+        import_artefacts_csv(csv_file)
+        assert False, "Expected CsvImportError"
+    except CsvImportError as e:
+        assert [err.line for err in e.report.errors] == [3]
+    assert _count(factory, Artefact) == 1
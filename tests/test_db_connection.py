@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from dal import repositories as repo
+from dal.cache import lookup_cache
+from database.db_init import install_schema
+from services import visitor_service
+from utils import db_connection
+from utils.db_connection import ConnectionPool
+
+def _pool(tmp_path, size=2, engine=None):
+    path = tmp_path / "museum.db"
+    install_schema(engine or create_engine(f"sqlite:///{path.as_posix()}", future=True))
+    return ConnectionPool(path=str(path), size=size, timeout=0.1)
+
+def test_pool_reuses_configured_connections(tmp_path):
+    pool = _pool(tmp_path)
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.connection() as conn:
+        assert conn is first
+
+    a, b = pool.acquire(), pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "Expected the exhausted pool to time out"
+    except TimeoutError:
+        pass
+    pool.release(a)
+    pool.release(b)
+    pool.close_all()
+
+def test_bulk_service_inserts_enforce_foreign_keys(tmp_path, monkeypatch):
+    pool = _pool(tmp_path)
+    monkeypatch.setattr(db_connection, "_pool", pool)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO exhibits (title) VALUES ('Ex')")
+
+    assert visitor_service.add_visitors_bulk([("A", "a@example.com"), ("B", "b@example.com")]) == 2
+    today = date.today().isoformat()
+    assert visitor_service.add_visits_bulk([(1, 1, today), (2, 1, today), (1, 1, today)]) == 3
+    assert [tuple(r) for r in visitor_service.get_visit_counts_by_exhibit()] == [("Ex", 3)]
+
+    try:
+        visitor_service.add_visits_bulk([(1, 1, today), (99, 1, today)])
+        assert False, "Expected FK violation"
+    except sqlite3.IntegrityError:
+        pass
+    assert [tuple(r) for r in visitor_service.get_visit_counts_by_exhibit()] == [("Ex", 3)]
+    pool.close_all()
+
+def test_acquire_after_close_all_opens_fresh_connections(tmp_path):
+    pool = _pool(tmp_path)
+    held = pool.acquire()
+    with pool.connection() as conn:
+        before = conn
+    pool.close_all()
+
+    with pool.connection() as conn:
+        assert conn is not before and conn.execute("SELECT COUNT(*) FROM visitors").fetchone()[0] == 0
+    pool.release(held)  # closed by close_all: its slot is freed, not the dead connection
+    a, b = pool.acquire(), pool.acquire()
+    assert held not in (a, b) and a.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    pool.release(a)
+    pool.release(b)
+    pool.close_all()
+
+def test_pool_uses_the_pragmas_it_is_given(tmp_path):
+    pool = ConnectionPool(path=str(tmp_path / "plain.db"), size=1, timeout=0.1, pragmas=["PRAGMA foreign_keys = OFF;"])
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 0
+    pool.close_all()
+
+def test_service_visitor_inserts_refresh_the_typeahead(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'museum.db').as_posix()}", future=True)
+    pool = _pool(tmp_path, engine=engine)
+    monkeypatch.setattr(db_connection, "_pool", pool)
+    lookup_cache.clear()
+
+    def names(q):
+        with Session(engine) as s:
+            return [r.full_name for r in repo.lookup_visitors(s, q)]
+
+    assert names("ana") == []  # cached for LOOKUP_CACHE_TTL
+    visitor_service.add_visitor("Ana", "ana@example.com")
+    assert names("ana") == ["Ana"]
+    visitor_service.add_visitors_bulk([("Anabel", "anabel@example.com")])
+    assert names("ana") == ["Ana", "Anabel"]
+    pool.close_all()
+
+def test_service_visit_inserts_update_the_unique_visitor_sketches(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'museum.db').as_posix()}", future=True)
+    pool = _pool(tmp_path, engine=engine)
+    monkeypatch.setattr(db_connection, "_pool", pool)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO exhibits (title) VALUES ('Ex')")
+        conn.execute("INSERT INTO visitors (full_name, email, region) VALUES ('A', 'a@example.com', 'North'), ('B', 'b@example.com', NULL)")
+
+    def unique(exact=False, **kw):
+        with Session(engine) as s:
+            return repo.unique_visitors(s, exact=exact, **kw).visitors
+
+    assert unique() == 0  # cached until the service inserts invalidate it
+    today = date.today()
+    visitor_service.add_visits_bulk([(1, 1, today.isoformat()), (1, 1, today.isoformat())])
+    assert unique() == unique(exact=True) == 1
+    visitor_service.add_visit(2, 1, today)
+    assert unique() == unique(exact=True) == 2
+    with Session(engine) as s:
+        assert {(r.region, r.visitors) for r in repo.unique_visitors_by_region(s)} == {(None, 1), ("North", 1)}
+    pool.close_all()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+
+from dal.db import PROFILES, _create_engines, get_profile
+
+def test_reader_pool_is_read_only_and_profiled(tmp_path):
+    url = f"sqlite:///{(tmp_path / 'm.db').as_posix()}"
+    writer, reader = _create_engines(url, PROFILES["performance"], split=True)
+    assert writer is not reader
+
+    with writer.begin() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    with reader.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -PROFILES["performance"].cache_size_kib
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        try:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+            assert False, "Expected the reader pool to reject writes"
+        except OperationalError:
+            pass
+
+def test_single_writer_connection(tmp_path):
+    url = f"sqlite:///{(tmp_path / 'm.db').as_posix()}"
+    writer, _ = _create_engines(url, replace(PROFILES["default"], write_wait_s=0.1), split=True)
+
+    with writer.connect():
+        try:
+            writer.connect()
+            assert False, "Expected the second writer to wait for the first"
+        except PoolTimeout:
+            pass
+
+def test_in_memory_url_shares_one_engine():
+    writer, reader = _create_engines("sqlite://", PROFILES["default"], split=True)
+    assert writer is reader
+
+def test_unknown_profile():
+    try:
+        get_profile("turbo")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
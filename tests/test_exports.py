@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from database.db_init import install_schema
+from integrations.exports import stream_export
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    s = Session()
+    v = repo.create_visitor(s, "Ana", "ana@example.org")
+    romans = repo.create_exhibit(s, "Romans", None, None)
+    vikings = repo.create_exhibit(s, "Vikings", None, None)
+    repo.record_visits_bulk(s, [
+        {"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": d}
+        for ex in (romans, vikings) for d in (date(2024, 1, 5), date(2024, 2, 5), date(2024, 3, 5))
+    ])
+    repo.record_ticket_purchases_bulk(s, [
+        {"visitor_id": v.visitor_id, "ticket_type": "Adult", "price": 18.5, "purchase_date": datetime(2024, 2, 29, 23, 59)},
+        {"visitor_id": v.visitor_id, "ticket_type": "Child", "price": 9, "purchase_date": datetime(2024, 3, 1, 0, 0)},
+    ])
+    repo.record_feedback(s, v.visitor_id, romans.exhibit_id, 5, "Loved the mosaics, 10/10")
+    s.commit()
+
+    @contextmanager
+    def factory():
+        yield s
+
+    return s, romans, factory
+
+def _read(chunks) -> bytes:
+    return b"".join(chunks)
+
+def test_csv_and_jsonl_stream_in_batches_with_filters():
+    _, romans, factory = _setup()
+    batches = []
+    chunks = list(stream_export("visits", "csv", batch_size=2, on_batch=batches.append, session_factory=factory))
+    assert batches == [2, 2, 2] and len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(_read(chunks).decode("utf-8"))))
+    assert [r["visit_id"] for r in rows] == ["1", "2", "3", "4", "5", "6"]
+    assert rows[0] == {"visit_id": "1", "visitor_id": "1", "exhibit_id": "1", "exhibit_title": "Romans", "visit_date": "2024-01-05"}
+
+    filtered = stream_export("visits", "jsonl", start=date(2024, 2, 1), end=date(2024, 3, 5), exhibit_id=romans.exhibit_id, session_factory=factory)
+    lines = [json.loads(line) for line in _read(filtered).decode("utf-8").splitlines()]
+    assert [(r["exhibit_title"], r["visit_date"]) for r in lines] == [("Romans", "2024-02-05"), ("Romans", "2024-03-05")]
+
+    # Inclusive end date on a timestamp column; prices stay numeric in JSON
+    tickets = _read(stream_export("tickets", "jsonl", end=date(2024, 2, 29), session_factory=factory))
+    assert [json.loads(line) for line in tickets.decode("utf-8").splitlines()] == [
+        {"purchase_id": 1, "visitor_id": 1, "ticket_type": "Adult", "price": 18.5, "purchase_date": "2024-02-29T23:59:00"},
+    ]
+
+    feedback = list(csv.reader(io.StringIO(_read(stream_export("feedback", session_factory=factory)).decode("utf-8"))))
+    assert feedback[1][4] == "Loved the mosaics, 10/10"  # quoted, not split on the comma
+
+def test_gzip_output_and_validation_before_streaming():
+    _, _, factory = _setup()
+    plain = _read(stream_export("feedback", "jsonl", session_factory=factory))
+    compressed = _read(stream_export("feedback", "jsonl", compress=True, session_factory=factory))
+    assert compressed[:2] == b"\x1f\x8b" and gzip.decompress(compressed) == plain
+
+    empty = _read(stream_export("visits", "csv", start=date(2030, 1, 1), session_factory=factory))
+    assert empty.decode("utf-8").strip() == "visit_id,visitor_id,exhibit_id,exhibit_title,visit_date"
+
+    def unused_factory():
+        raise AssertionError("no session should be opened for an invalid export")
+
+    for kwargs in ({"kind": "users"}, {"kind": "visits", "fmt": "xml"}, {"kind": "tickets", "exhibit_id": 1},
+                   {"kind": "visits", "start": date(2024, 2, 1), "end": date(2024, 1, 1)}):
+        with pytest.raises(ValueError):
+            stream_export(session_factory=unused_factory, **kwargs)
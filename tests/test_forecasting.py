@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from business.forecasting import TOTAL, ForecastPoint, fit_holt_winters, forecast_series, holt_winters_forecast, seasonal_naive_forecast
+
+def _seasonal_series(n_series=40, months=48, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(months)
+    base = rng.uniform(100, 400, n_series)[:, None]
+    return base * (1 + 0.3 * np.sin(2 * np.pi * t / 12)) + 2 * t + rng.normal(0, 5, (n_series, months))
+
+def test_batch_fit_beats_seasonal_naive_and_intervals_cover():
+    y = _seasonal_series()
+    history, actual = y[:, :36], y[:, 36:]
+    fit = fit_holt_winters(history, months_ahead=12)
+    assert fit.seasonal and fit.mean.shape == (40, 12)
+    hw_error = np.abs(fit.mean - actual).mean()
+    naive_error = np.abs(history[:, 24:36] - actual).mean()
+    assert hw_error < naive_error
+    assert np.all(fit.lower <= fit.mean) and np.all(fit.mean <= fit.upper)
+    assert np.all(np.diff(fit.upper - fit.lower, axis=1) >= -1e-9)  # intervals widen with the horizon
+    assert ((actual >= fit.lower) & (actual <= fit.upper)).mean() > 0.8
+
+def test_forecast_series_fills_gaps_and_adds_total():
+    rows = [(1, "2024-01", 10), (1, "2024-03", 14), (2, "2024-01", 5), (2, "2024-02", 6), (2, "2024-04", 8)]
+    result = forecast_series(rows, months_ahead=2, keys=[1, 2, 3])
+    assert result.keys == [1, 2, 3, TOTAL]
+    assert result.history_months == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    assert result.months == ["2024-05", "2024-06"]
+    assert [p.predicted_visits for p in result.points(3)] == [0, 0]  # no visits, no forecast
+    assert all(p.method == "holt_linear" for p in result.points(TOTAL))
+
+def test_facade_keeps_forecast_point_api():
+    monthly = [(f"2023-{m:02d}", 100 + m) for m in range(1, 13)] + [(f"2024-{m:02d}", 110 + m) for m in range(1, 13)]
+    points = holt_winters_forecast(monthly, months_ahead=3)
+    assert [p.year_month for p in points] == ["2025-01", "2025-02", "2025-03"]
+    assert all(isinstance(p, ForecastPoint) and p.method == "holt_winters" for p in points)
+    assert all(p.lower <= p.predicted_visits <= p.upper for p in points)
+    assert not math.isnan(points[0].predicted_visits)
+
+    short = [("2024-01", 10), ("2024-02", 12)]
+    assert holt_winters_forecast(short, 1) == seasonal_naive_forecast(short, 1)
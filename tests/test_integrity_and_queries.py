@@ -2,29 +2,19 @@ from __future__ import annotations
 
 from datetime import date, timedelta
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
 from dal.models import Base, Exhibit, Visitor
 
 from dal import repositories as repo
+from database.db_init import install_schema
 
 def _setup():
     engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
     with engine.begin() as conn:
         conn.execute(text("PRAGMA foreign_keys=ON;"))
-    Base.metadata.create_all(engine)
-
-    # triggers (same as database/db_init.py)
-    with engine.begin() as conn:
-        conn.execute(text("""
-        CREATE TRIGGER IF NOT EXISTS trg_no_future_visits
-        BEFORE INSERT ON visits
-        FOR EACH ROW
-        WHEN date(NEW.visit_date) > date('now')
-        BEGIN
-            SELECT RAISE(ABORT, 'visit_date cannot be in the future');
-        END;
-        """))
+    install_schema(engine)  # tables + triggers, same as database/db_init.py
     Session = sessionmaker(bind=engine, future=True)
     return Session()
 
@@ -58,3 +48,71 @@ def test_advanced_query_visit_counts():
 
     rows = repo.visit_counts_by_exhibit(s)
     assert rows[0].visit_count >= rows[1].visit_count
+
+def test_bulk_visits_single_statement():
+    s = _setup()
+    ex = repo.create_exhibit(s, "Bulk", None, None)
+    v = repo.create_visitor(s, "Carol", "carol@example.com")
+    s.commit()
+
+    today = date.today()
+    n = repo.record_visits_bulk(s, [{"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": today}] * 50)
+    s.commit()
+    assert n == 50
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 50
+
+    objs = repo.record_visits_bulk(s, [{"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": today}], return_objects=True)
+    assert objs[0].visit_id is not None
+
+def test_bulk_writes_enforce_constraints():
+    s = _setup()
+    ex = repo.create_exhibit(s, "Bulk", None, None)
+    v = repo.create_visitor(s, "Dan", "dan@example.com")
+    s.commit()
+
+    future = date.today() + timedelta(days=2)
+    bad_batches = [
+        (repo.record_visits_bulk, [{"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": future}]),
+        (repo.record_feedback_bulk, [{"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "rating": 6}]),
+        (repo.record_ticket_purchases_bulk, [{"visitor_id": v.visitor_id, "ticket_type": "Adult", "price": -1}]),
+    ]
+    for fn, rows in bad_batches:
+        try:
+            fn(s, rows)
+            s.commit()
+            assert False, f"Expected {fn.__name__} to reject the batch"
+        except IntegrityError:
+            s.rollback()
+
+    n = repo.record_ticket_purchases_bulk(s, [{"visitor_id": v.visitor_id, "ticket_type": "Adult", "price": 12.5, "purchase_date": date.today()}])
+    s.commit()
+    assert n == 1
+
+def test_visit_rollups_follow_inserts_and_deletes():
+    s = _setup()
+    ex1 = repo.create_exhibit(s, "Ex1", None, None)
+    ex2 = repo.create_exhibit(s, "Ex2", None, None)
+    v = repo.create_visitor(s, "Erin", "erin@example.com")
+    s.commit()
+
+    today = date.today()
+    last_month = today.replace(day=1) - timedelta(days=1)
+    visits = [repo.record_visit(s, v.visitor_id, ex1.exhibit_id, today) for _ in range(3)]
+    repo.record_visit(s, v.visitor_id, ex2.exhibit_id, last_month)
+    s.commit()
+
+    counts = {r.title: r.visit_count for r in repo.visit_counts_by_exhibit(s)}
+    assert counts == {"Ex1": 3, "Ex2": 1}
+    assert [r.title for r in repo.visit_counts_by_exhibit(s, start=today)] == ["Ex1"]
+    monthly = {r.ym: r.count for r in repo.monthly_visit_counts(s)}
+    assert monthly == {last_month.strftime("%Y-%m"): 1, today.strftime("%Y-%m"): 3}
+
+    s.delete(visits[0])
+    s.commit()
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 2
+
+    s.execute(text("DELETE FROM visit_daily_rollups"))
+    repo.rebuild_visit_rollups(s)
+    s.commit()
+    counts = {r.title: r.visit_count for r in repo.visit_counts_by_exhibit(s)}
+    assert counts == {"Ex1": 2, "Ex2": 1}
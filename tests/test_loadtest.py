@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import loadtest
+from benchmarks.loadtest import LOGIN, FlaskClient, Ids, classify, compare_load_reports, run_load
+from dal import repositories as repo
+from dal.cache import query_cache
+from dal.models import Feedback, TicketPurchase, User, Visit
+from database.db_init import install_schema
+from security import passwords
+from security.passwords import hash_password
+from web import create_app, routes
+
+def _app(monkeypatch, tmp_path):
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 4)
+    engine = create_engine(f"sqlite:///{(tmp_path / 'load.db').as_posix()}", future=True)
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL;"))
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True, expire_on_commit=False)
+    with Session() as s:
+        for i in range(5):
+            repo.create_visitor(s, f"V{i}", f"v{i}@example.org")
+        for i in range(2):
+            repo.create_exhibit(s, f"E{i}", None, None)
+        for role in ("front_desk", "curator", "admin"):
+            s.add(User(username=role, password_hash=hash_password("pw"), role=role))
+        s.commit()
+
+    @contextmanager
+    def fake_get_session(intent="write"):
+        session = Session()
+        try:
+            yield session
+            session.commit()
+        finally:
+            session.close()
+
+    writer = threading.Lock()  # stands in for the single group-commit worker
+
+    def fake_queued_write(op):
+        with writer, fake_get_session() as session:
+            return op(session)
+
+    monkeypatch.setattr(routes, "get_session", fake_get_session)
+    monkeypatch.setattr(routes, "_queued_write", fake_queued_write)
+    query_cache.clear()
+    return create_app(), Session
+
+def test_weighted_mix_runs_every_role_concurrently(monkeypatch, tmp_path):
+    app, Session = _app(monkeypatch, tmp_path)
+    logins = {role: (role, "pw") for role in ("front_desk", "curator", "admin")}
+    report = run_load(lambda: FlaskClient(app), logins, {"front_desk": 3, "curator": 1, "admin": 1}, Ids(visitors=5, exhibits=2), requests=120)
+
+    assert report["results"][LOGIN]["requests"] == 5 and report["results"][LOGIN]["errors"] == 0
+    assert report["total"]["login_errors"] == 0
+    total = report["total"]
+    assert total["requests"] == 120 and total["errors"] == 0 and total["lock_errors"] == 0
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"] <= total["max_ms"] and total["throughput_rps"] > 0
+    assert {"GET /dashboard", "GET /artefacts", "POST /visits/record"} <= set(report["results"])
+
+    # Every successful form post stored its row
+    with Session() as s:
+        stored = sum(s.scalar(select(func.count()).select_from(m)) for m in (Visit, TicketPurchase, Feedback))
+    assert stored == sum(report["results"].get(f"POST /{p}/record", {}).get("requests", 0) for p in ("visits", "tickets", "feedback"))
+
+def test_terminals_that_cannot_sign_in_give_up(monkeypatch):
+    class Rejecting:
+        def request(self, method, path, form=None):
+            return 200, '<div class="alert alert-danger">Invalid username or password</div>'
+
+    monkeypatch.setattr(loadtest, "LOGIN_ATTEMPTS", 3)
+    # A request budget alone (no deadline) used to leave these terminals retrying forever
+    report = run_load(Rejecting, {"front_desk": ("desk", "wrong")}, {"front_desk": 2}, Ids(visitors=5, exhibits=2), requests=10)
+    assert report["results"][LOGIN]["requests"] == report["results"][LOGIN]["errors"] == 6
+    assert report["total"] == {"requests": 0, "login_errors": 6}
+
+def test_outcomes_and_baseline_comparison():
+    assert classify("POST", 302, "") == "ok"
+    assert classify("POST", 200, '<div class="alert alert-danger">Could not record visit</div>') == "error"
+    assert classify("POST", 200, "Could not record visit: (sqlite3.OperationalError) database is locked") == "lock"
+    assert classify("GET", 302, "") == "error" and classify("GET", 500, "") == "error"
+
+    def report(p95, rps, locks):
+        return {"results": {"GET /dashboard": {"p95_ms": p95, "throughput_rps": rps, "lock_error_rate": locks}}}
+    base = report(100.0, 50.0, 0.0)
+    assert not compare_load_reports(report(110.0, 45.0, 0.0), base)[0]["regression"]
+    assert compare_load_reports(report(130.0, 50.0, 0.0), base)[0]["regression"]
+    assert compare_load_reports(report(100.0, 35.0, 0.0), base)[0]["regression"]
+    assert compare_load_reports(report(100.0, 50.0, 0.01), base)[0]["regression"]
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, func, inspect, select, text
+
+from dal.models import Base, Visit, VisitDailyRollup, VisitSketch
+from database import migrations
+from database.db_init import install_schema
+from database.migrations import LATEST_VERSION, Migration, current_version, migrate
+
+def _objects(engine) -> set[str]:
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")).scalars())
+
+def test_fresh_database_migrates_once_then_costs_one_read():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    assert [m.version for m in install_schema(engine)] == list(range(1, LATEST_VERSION + 1))
+    assert current_version(engine) == LATEST_VERSION
+    assert {"visits", "trg_visit_rollup_insert", "artefacts_fts", "visit_sketches"} <= _objects(engine)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+    assert install_schema(engine) == []
+    assert len(statements) == 1 and "schema_version" in statements[0]
+
+def test_pre_migration_database_is_upgraded_and_backfilled():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    # A database from before schema_version: core tables without the later generated columns
+    # and indexes, some rows, an unguarded rollup trigger
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE exhibits (exhibit_id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(200) NOT NULL, start_date DATE, end_date DATE)"))
+        conn.execute(text("CREATE TABLE visitors (visitor_id INTEGER NOT NULL PRIMARY KEY, full_name VARCHAR(200) NOT NULL, email VARCHAR(254) NOT NULL UNIQUE, age_band VARCHAR(50), region VARCHAR(80), membership_type VARCHAR(40))"))
+        conn.execute(text("CREATE TABLE visits (visit_id INTEGER NOT NULL PRIMARY KEY, visitor_id INTEGER NOT NULL, exhibit_id INTEGER NOT NULL, visit_date DATE NOT NULL)"))
+        conn.execute(text("INSERT INTO exhibits (exhibit_id, title) VALUES (1, 'Romans')"))
+        conn.execute(text("INSERT INTO visitors (visitor_id, full_name, email) VALUES (1, 'Ana', 'ana@example.org')"))
+        conn.execute(text("INSERT INTO visits (visitor_id, exhibit_id, visit_date) VALUES (1, 1, '2024-01-05'), (1, 1, '2024-01-06')"))
+        conn.execute(text("CREATE TRIGGER trg_visit_rollup_insert AFTER INSERT ON visits BEGIN SELECT 1; END"))
+    assert current_version(engine) == 0
+
+    assert len(migrate(engine)) == LATEST_VERSION
+    with engine.connect() as conn:
+        assert conn.execute(select(func.sum(VisitDailyRollup.visit_count))).scalar() == 2
+        assert conn.execute(select(func.count()).select_from(VisitSketch)).scalar() == 2
+        trigger = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'trg_visit_rollup_insert'")).scalar()
+        assert "maintenance_flags" in trigger  # replaced by the latest definition
+        assert conn.execute(text("SELECT visit_month FROM visits LIMIT 1")).scalar() == "2024-01"
+    with engine.begin() as conn:
+        conn.execute(Visit.__table__.insert().values(visitor_id=1, exhibit_id=1, visit_date=date(2024, 1, 5)))
+        assert conn.execute(select(func.sum(VisitDailyRollup.visit_count))).scalar() == 3
+
+def _schema(engine, tables) -> dict:
+    # What the app relies on, ignoring column order (ALTER TABLE appends) and DDL formatting
+    insp = inspect(engine)
+    return {
+        name: {
+            "columns": sorted((c["name"], str(c["type"]), c["nullable"], " ".join(str((c.get("computed") or {}).get("sqltext", "")).split())) for c in insp.get_columns(name)),
+            "primary_key": insp.get_pk_constraint(name)["constrained_columns"],
+            "foreign_keys": sorted((tuple(fk["constrained_columns"]), fk["referred_table"], fk["options"].get("ondelete")) for fk in insp.get_foreign_keys(name)),
+            "unique": sorted(tuple(u["column_names"]) for u in insp.get_unique_constraints(name)),
+            "checks": sorted(c["name"] for c in insp.get_check_constraints(name)),
+            "indexes": sorted((i["name"], tuple(i["column_names"])) for i in insp.get_indexes(name)),
+        }
+        for name in tables
+    }
+
+def test_migrations_build_the_schema_the_models_describe():
+    # Released migrations are frozen: a model change without a new migration fails here
+    models = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    Base.metadata.create_all(models)
+    migrated = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(migrated)
+    tables = sorted(Base.metadata.tables)
+    assert set(tables) <= set(inspect(migrated).get_table_names())
+    assert _schema(migrated, tables) == _schema(models, tables)
+
+def test_failed_migration_rolls_back_the_whole_run(monkeypatch):
+    def broken(conn):
+        conn.execute(text("CREATE TABLE half_done (x INTEGER)"))
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, Migration(LATEST_VERSION + 1, "broken", broken)])
+    monkeypatch.setattr(migrations, "LATEST_VERSION", LATEST_VERSION + 1)
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    with pytest.raises(RuntimeError):
+        migrate(engine)
+    assert _objects(engine) == set() and current_version(engine) == 0
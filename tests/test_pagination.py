@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    return Session()
+
+def _walk(fetch_page):
+    seen, cursor = [], None
+    while True:
+        page = fetch_page(cursor)
+        seen.extend(page.items)
+        if not page.next_cursor:
+            return seen
+        cursor = page.next_cursor
+
+def test_artefact_pages_cover_every_row_once():
+    s = _setup()
+    names = ["Urn", "Amulet", "Coin", "Amulet", "Bowl", "Coin", "Dagger"]
+    for i, name in enumerate(names):
+        repo.create_artefact(s, name, None, "Bronze" if i % 2 else "Clay", date(2000 + i, 1, 1))
+    s.commit()
+
+    by_id = _walk(lambda after: repo.page_artefacts(s, after=after, limit=3))
+    assert [r.artefact_id for r in by_id] == list(range(1, len(names) + 1))
+
+    by_name = _walk(lambda after: repo.page_artefacts(s, after=after, limit=2, order="name"))
+    assert [(r.name, r.artefact_id) for r in by_name] == sorted((n, i + 1) for i, n in enumerate(names))
+
+    clay_recent = _walk(lambda after: repo.page_artefacts(s, after=after, limit=1, material="Clay", acquired_from=date(2002, 1, 1)))
+    assert [r.artefact_id for r in clay_recent] == [3, 5, 7]
+
+def test_lookup_and_bad_cursor():
+    s = _setup()
+    for title in ["Egypt", "Egyptian Gold", "Vikings"]:
+        repo.create_exhibit(s, title, None, None)
+    s.commit()
+
+    assert [r.title for r in repo.lookup_exhibits(s, "Egy")] == ["Egypt", "Egyptian Gold"]
+    assert [r.title for r in repo.lookup_exhibits(s, "3")] == ["Vikings"]
+
+    for name, email in [("Ana Lima", "ana@example.org"), ("Bob Anand", "Anand.B@example.org"), ("ÁNGEL", "angel@example.org")]:
+        repo.create_visitor(s, name, email)
+    s.commit()
+    # Case-insensitive name matches come before email matches; each visitor once
+    assert [r.full_name for r in repo.lookup_visitors(s, "AN")] == ["Ana Lima", "Bob Anand", "ÁNGEL"]
+    assert [r.full_name for r in repo.lookup_visitors(s, "ana@")] == ["Ana Lima"]
+    assert [r.full_name for r in repo.lookup_visitors(s, "ÁN")] == ["ÁNGEL"]  # non-ASCII kept as typed
+    assert [r.full_name for r in repo.lookup_visitors(s, "Bob", limit=1)] == ["Bob Anand"]
+    assert [r.full_name for r in repo.lookup_visitors(s, "2")] == ["Bob Anand"]
+
+    try:
+        repo.page_exhibits(s, after="not-a-cursor")
+        assert False, "Expected ValueError for a corrupt cursor"
+    except ValueError:
+        pass
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import security.auth as auth
+import security.passwords as passwords
+from dal.models import Base, User
+from security.auth import AuthenticationError, authenticate, schedule_rehash, wait_for_rehashes
+from security.passwords import PasswordHasherPool, PasswordPoolBusy, hash_password, needs_rehash, verify_password
+
+def test_needs_rehash_tracks_configured_cost():
+    current = hash_password("pw", rounds=passwords.BCRYPT_ROUNDS)
+    assert verify_password("pw", current)
+    assert not needs_rehash(current)
+    assert needs_rehash(hash_password("pw", rounds=4))
+
+def test_needs_rehash_keeps_higher_cost_bcrypt_hashes(monkeypatch):
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 4)
+    assert not needs_rehash(hash_password("pw", rounds=5))
+
+def test_needs_rehash_replaces_malformed_pbkdf2_hashes(monkeypatch):
+    monkeypatch.setattr(passwords, "_HAS_BCRYPT", False)
+    assert not needs_rehash(hash_password("pw"))
+    assert needs_rehash(hash_password("pw", rounds=1_000))
+    for broken in ("pbkdf2$", "pbkdf2$abc$salt$dk", "pbkdf2$-5$salt$dk"):
+        assert needs_rehash(broken)
+
+def test_pool_runs_off_thread_and_applies_backpressure():
+    pool = PasswordHasherPool(workers=1, max_pending=1)
+    try:
+        h = pool.hash("secret")
+        assert pool.verify("secret", h)
+        assert not pool.verify("wrong", h)
+
+        assert pool._slots.acquire(blocking=False)  # simulate one operation in flight
+        try:
+            pool.verify("secret", h)
+            assert False, "Expected PasswordPoolBusy"
+        except PasswordPoolBusy:
+            pass
+        finally:
+            pool._slots.release()
+
+        pool.timeout = 0.0  # a result that does not arrive in time is "busy", not a server error
+        try:
+            pool.hash("secret")
+            assert False, "Expected PasswordPoolBusy"
+        except PasswordPoolBusy:
+            pass
+    finally:
+        pool.shutdown()
+
+def test_login_upgrades_weak_hash_in_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(passwords, "_pool", PasswordHasherPool(workers=0))
+    engine = create_engine(f"sqlite:///{(tmp_path / 'auth.db').as_posix()}", future=True)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, future=True)
+
+    @contextmanager
+    def factory():
+        with Session() as s:
+            yield s
+            s.commit()
+
+    weak = hash_password("admin123", rounds=4)
+    with factory() as s:
+        s.add(User(username="amy", password_hash=weak, role="curator"))
+
+    with factory() as s:
+        try:
+            authenticate(s, "amy", "wrong", rehash_session_factory=factory)
+            assert False, "Expected AuthenticationError"
+        except AuthenticationError:
+            pass
+        actor = authenticate(s, "amy", "admin123", rehash_session_factory=factory)
+    assert actor.role == "curator"
+
+    wait_for_rehashes(timeout=10)
+    with factory() as s:
+        upgraded = s.execute(select(User.password_hash).where(User.username == "amy")).scalar_one()
+    assert upgraded != weak
+    assert not needs_rehash(upgraded)
+    assert verify_password("admin123", upgraded)
+
+def test_rehash_queue_dedups_users_and_is_bounded(monkeypatch):
+    release = threading.Event()
+    done = []
+
+    def slow_rehash(username, old_hash, password, session_factory):
+        release.wait(10)
+        done.append(username)
+        return True
+
+    monkeypatch.setattr(auth, "_rehash", slow_rehash)
+    monkeypatch.setattr(auth, "REHASH_MAX_PENDING", 2)
+    try:
+        assert schedule_rehash("amy", "old", "pw") is not None
+        assert schedule_rehash("amy", "old", "pw") is None  # already pending
+        assert schedule_rehash("bob", "old", "pw") is not None
+        assert schedule_rehash("cat", "old", "pw") is None  # queue full: retried on a later login
+    finally:
+        release.set()
+        wait_for_rehashes(timeout=10)
+    assert sorted(done) == ["amy", "bob"]
+    monkeypatch.setattr(auth, "REHASH_MAX_PENDING", 3)  # done callbacks may still be clearing amy and bob
+    assert schedule_rehash("cat", "old", "pw").result(timeout=10)
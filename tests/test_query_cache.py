@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dal.cache import QueryCache, cache_stats, lookup_cache
+from dal import repositories as repo
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    return Session()
+
+def test_lru_ttl_and_generation():
+    now = [0.0]
+    cache = QueryCache(maxsize=2, ttl=10, clock=lambda: now[0])
+
+    cache.put(("a",), 1, cache.generation)
+    cache.put(("b",), 2, cache.generation)
+    assert cache.get(("a",)) == (True, 1)
+    cache.put(("c",), 3, cache.generation)  # evicts least recently used ("b")
+    assert cache.get(("b",)) == (False, None)
+
+    now[0] = 11
+    assert cache.get(("a",)) == (False, None)  # expired
+
+    cache.put(("d",), 4, cache.generation)
+    cache.bump()
+    assert cache.get(("d",)) == (False, None)  # invalidated by a write
+
+    stale_generation = cache.generation
+    cache.bump()
+    cache.put(("e",), 5, stale_generation)  # computed before the write: not stored
+    assert cache.get(("e",)) == (False, None)
+
+    stats = cache.stats()
+    assert (stats.hits, stats.evictions, stats.expirations) == (1, 1, 1)
+
+def test_repository_reads_hit_until_a_write_commits():
+    s = _setup()
+    ex = repo.create_exhibit(s, "Cached", None, None)
+    v = repo.create_visitor(s, "Fay", "fay@example.com")
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date.today())
+    s.commit()
+
+    before = cache_stats()
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 1
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 1
+    after = cache_stats()
+    assert after.hits - before.hits == 1
+    assert after.misses - before.misses == 1
+
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date.today())
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 2  # own uncommitted write is visible
+    s.commit()
+    assert cache_stats().generation > after.generation
+    assert repo.visit_counts_by_exhibit(s)[0].visit_count == 2
+
+def test_visitor_lookups_stay_cached_across_visits_but_not_visitor_writes():
+    s = _setup()
+    ex = repo.create_exhibit(s, "Cached", None, None)
+    v = repo.create_visitor(s, "Fay", "fay@example.com")
+    s.commit()
+
+    assert [r.full_name for r in repo.lookup_visitors(s, "fa")] == ["Fay"]
+    generation = cache_stats(lookup_cache).generation
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date.today())
+    s.commit()
+    assert cache_stats(lookup_cache).generation == generation  # visits don't touch visitors
+    hits = cache_stats(lookup_cache).hits
+    repo.lookup_visitors(s, "fa")
+    assert cache_stats(lookup_cache).hits == hits + 1
+
+    repo.create_visitors_bulk(s, [{"full_name": "Fatima", "email": "fatima@example.com"}])
+    assert [r.full_name for r in repo.lookup_visitors(s, "fa")] == ["Fatima", "Fay"]  # own write visible
+    s.commit()
+    assert cache_stats(lookup_cache).generation > generation
+    s.delete(v)
+    s.commit()
+    assert [r.full_name for r in repo.lookup_visitors(s, "fa")] == ["Fatima"]
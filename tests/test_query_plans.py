@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal.cache import query_cache
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    return engine, Session()
+
+def _plan(engine, session, fn, *args, **kwargs) -> str:
+    """EXPLAIN QUERY PLAN for the last statement fn runs."""
+    executed = []
+    listener = lambda conn, cursor, statement, params, context, many: executed.append((statement, params))
+    event.listen(engine, "before_cursor_execute", listener)
+    enabled, query_cache.enabled = query_cache.enabled, False
+    try:
+        fn(session, *args, **kwargs)
+    finally:
+        query_cache.enabled = enabled
+        event.remove(engine, "before_cursor_execute", listener)
+    statement, params = executed[-1]
+    rows = session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).all()
+    return "\n".join(r[3] for r in rows)
+
+@pytest.mark.parametrize("fn, args, index", [
+    (repo.monthly_visit_counts, (), "ix_visit_rollups_month"),
+    (repo.monthly_visit_counts, (date(2024, 1, 1), date(2024, 6, 30)), "ix_visit_rollups_month (visit_month>? AND visit_month<?)"),
+    (repo.monthly_visit_counts_by_exhibit, (), "ix_visit_rollups_exhibit_month"),
+    (repo.weekly_visit_counts, (), "ix_visits_week_exhibit"),
+    (repo.visit_counts_by_weekday, (), "ix_visits_dow_exhibit"),
+    (repo.monthly_ticket_sales, (), "ix_ticket_purchases_month_type"),
+    (repo.ticket_sales_by_weekday, (), "ix_ticket_purchases_dow_type"),
+    (repo.visit_counts_by_exhibit, (), "ix_visit_rollups_exhibit_month"),
+    (repo.top_visitors, (), "ix_visits_visitor_date"),
+    (repo.lookup_visitors, ("ana@",), "ix_visitors_email_lower (email_lower>? AND email_lower<?)"),
+])
+def test_hot_analytics_queries_use_bucket_indexes(fn, args, index):
+    engine, s = _setup()
+    plan = _plan(engine, s, fn, *args)
+    assert f"INDEX {index}" in plan, plan
+    assert "TEMP B-TREE FOR GROUP BY" not in plan, plan
+
+def test_bucket_values_and_grouping():
+    _, s = _setup()
+    v = repo.create_visitor(s, "Ana", "ana@example.org")
+    ex = repo.create_exhibit(s, "Romans", None, None)
+    # 2024-03-03 is a Sunday, 2024-03-04 a Monday
+    repo.record_visits_bulk(s, [{"visitor_id": v.visitor_id, "exhibit_id": ex.exhibit_id, "visit_date": d} for d in (date(2024, 3, 3), date(2024, 3, 4), date(2024, 3, 4), date(2024, 4, 1))])
+    repo.record_ticket_purchases_bulk(s, [
+        {"visitor_id": v.visitor_id, "ticket_type": "Adult", "price": 18, "purchase_date": datetime(2024, 3, 31, 23, 30)},
+        {"visitor_id": v.visitor_id, "ticket_type": "Adult", "price": 18, "purchase_date": datetime(2024, 4, 1, 9, 0)},
+    ])
+    s.commit()
+
+    assert [(r.ym, r.count) for r in repo.monthly_visit_counts(s)] == [("2024-03", 3), ("2024-04", 1)]
+    assert [(r.ym, r.count) for r in repo.monthly_visit_counts(s, start=date(2024, 3, 4))] == [("2024-03", 2), ("2024-04", 1)]
+    assert [(r.dow, r.count) for r in repo.visit_counts_by_weekday(s)] == [(0, 1), (1, 3)]
+    assert [(r.week, r.count) for r in repo.weekly_visit_counts(s)] == [("2024-09", 1), ("2024-10", 2), ("2024-14", 1)]
+    assert [(r.ym, r.tickets) for r in repo.monthly_ticket_sales(s, end=date(2024, 3, 31))] == [("2024-03", 1)]
+
+def test_install_schema_adds_bucket_columns_to_existing_tables():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE visitors (visitor_id INTEGER PRIMARY KEY, full_name VARCHAR(200) NOT NULL, email VARCHAR(254) NOT NULL UNIQUE, age_band VARCHAR(50), region VARCHAR(80), membership_type VARCHAR(40))"))
+        conn.execute(text("CREATE TABLE exhibits (exhibit_id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, start_date DATE, end_date DATE)"))
+        conn.execute(text("CREATE TABLE visits (visit_id INTEGER PRIMARY KEY, visitor_id INTEGER NOT NULL REFERENCES visitors (visitor_id) ON DELETE CASCADE, exhibit_id INTEGER NOT NULL REFERENCES exhibits (exhibit_id) ON DELETE CASCADE, visit_date DATE NOT NULL)"))
+        conn.execute(text("INSERT INTO visitors VALUES (1, 'Ana', 'ana@example.org', NULL, NULL, NULL)"))
+        conn.execute(text("INSERT INTO exhibits VALUES (1, 'Romans', NULL, NULL)"))
+        conn.execute(text("INSERT INTO visits VALUES (1, 1, 1, '2023-12-31')"))
+
+    install_schema(engine)
+    install_schema(engine)  # idempotent
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT visit_month, visit_week, visit_dow FROM visits")).one() == ("2023-12", "2023-52", 0)
+        assert conn.execute(text("SELECT visit_month, visit_count FROM visit_daily_rollups")).one() == ("2023-12", 1)
+    assert "ix_visits_month_exhibit" in {ix["name"] for ix in inspect(engine).get_indexes("visits")}
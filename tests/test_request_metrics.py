@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import pstats
+import random
+import tracemalloc
+
+from flask import Flask, render_template_string, request
+
+from web import metrics
+from web.profiling import RequestProfiler
+
+def _app(profiler):
+    app = Flask(__name__)
+
+    @app.before_request
+    def _health():
+        if request.path == "/health":
+            return "ok"  # answered before the metrics hooks start timing
+
+    @app.get("/items/<int:item_id>")
+    def item(item_id):
+        return render_template_string("<p>{{ n }}</p>", n=item_id)
+
+    metrics.init_app(app, profiler=profiler)
+    return app
+
+def test_route_latency_template_time_and_size(tmp_path):
+    metrics.route_stats.reset()
+    client = _app(RequestProfiler(sample_rate=0, slow_ms=0, out_dir=tmp_path)).test_client()
+    for i in range(5):
+        r = client.get(f"/items/{i}")
+        assert "tpl;dur=" in r.headers["Server-Timing"]
+    client.get("/missing")
+    assert "Server-Timing" not in client.get("/health").headers  # nothing timed: no empty header
+
+    snap = metrics.route_stats.snapshot()
+    route = snap["GET /items/<int:item_id>"]
+    assert route["count"] == 5 and route["statuses"] == {"200": 5}
+    assert route["bytes_max"] == len(b"<p>4</p>")
+    assert route["p99_ms"] >= route["p50_ms"] > 0
+    assert snap["GET <unmatched>"]["statuses"] == {"404": 1}
+    assert not list(tmp_path.iterdir())
+
+def test_sampled_requests_are_profiled_to_disk(tmp_path):
+    client = _app(RequestProfiler(mode="cprofile", sample_rate=0.5, out_dir=tmp_path, max_files=2, rng=random.Random(1))).test_client()
+    for i in range(8):
+        client.get(f"/items/{i}")
+    saved = sorted(tmp_path.glob("*.prof"))
+    assert len(saved) == 2  # pruned to max_files
+    assert "items_int_item_id" in saved[0].name
+    pstats.Stats(str(saved[0]))  # loadable for offline analysis
+
+def test_threshold_keeps_only_slow_requests(tmp_path):
+    profiler = RequestProfiler(mode="tracemalloc", slow_ms=60_000, out_dir=tmp_path)
+    capture = profiler.start()
+    assert profiler.finish(capture, "GET /dashboard", 5.0) is None
+    capture = profiler.start()
+    path = profiler.finish(capture, "GET /dashboard", 61_000.0)
+    assert path.read_text().startswith("GET /dashboard")
+    tracemalloc.stop()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    return Session()
+
+def test_search_is_ranked_paged_and_kept_in_sync():
+    s = _setup()
+    dagger = repo.create_artefact(s, "Bronze dagger", "Corroded blade from a burial", "Bronze", None)
+    repo.create_artefact(s, "Silver coin", "Struck in bronze-age style", "Silver", None)
+    repo.create_artefact(s, "Café sign", "Enamel", "Enamel", None)
+    repo.create_exhibit(s, "Bronze Age Britain", None, None)
+    s.commit()
+
+    hits = repo.search_catalogue(s, "bronze", kind="artefact").items
+    assert [h.id for h in hits] == [dagger.artefact_id, 2]  # name match outranks description match
+    assert "\x02Bronze\x03" in hits[0].snippet
+
+    seen, cursor = [], None
+    while True:
+        page = repo.search_catalogue(s, "bronze", after=cursor, limit=1)
+        seen += [(h.kind, h.id) for h in page.items]
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
+    assert sorted(seen) == [("artefact", 1), ("artefact", 2), ("exhibit", 1)]
+
+    assert [h.title for h in repo.search_catalogue(s, "cafe").items] == ["Café sign"]  # diacritics folded
+    assert [h.title for h in repo.search_catalogue(s, "bronze dag").items] == ["Bronze dagger"]  # last word is a prefix
+    assert repo.search_catalogue(s, '"; DROP TABLE artefacts; --').items == []
+    assert repo.search_catalogue(s, "   ").items == []
+
+    dagger.name = "Iron dagger"
+    s.delete(repo.list_exhibits(s)[0])
+    s.commit()
+    assert [h.title for h in repo.search_catalogue(s, "iron").items] == ["Iron dagger"]
+    assert [(h.kind, h.id) for h in repo.search_catalogue(s, "bronze").items] == [("artefact", 1), ("artefact", 2)]  # description still matches
+
+def test_rebuild_search_index_recovers_rows_written_without_triggers():
+    s = _setup()
+    s.execute(text("DROP TRIGGER trg_artefacts_fts_insert"))
+    repo.create_artefact(s, "Viking brooch", None, "Silver", None)
+    s.commit()
+    assert repo.search_catalogue(s, "viking").items == []
+    repo.rebuild_search_index(s, optimize=True)
+    s.commit()
+    assert [h.title for h in repo.search_catalogue(s, "viking").items] == ["Viking brooch"]
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal import sketches
+from dal.cache import query_cache
+from dal.models import Visit, VisitSketch
+from dal.sketches import Sketch, error_bound, estimate_groups, merge_blobs
+from database.db_init import install_schema
+
+def test_estimates_merge_and_round_trip_within_the_error_bound(monkeypatch):
+    for n in (1, 50, 3_000, 40_000):
+        sketch = Sketch.of(range(n))
+        estimate = sketch.estimate()
+        assert abs(estimate - n) <= error_bound(n), (n, estimate)
+        assert Sketch.from_bytes(sketch.to_bytes()).estimate() == estimate
+    assert len(Sketch.of(range(50)).to_bytes()) == 1 + 4 * 50  # sparse while small
+
+    # Overlapping sketches merge to the union, whichever way they are combined
+    parts = [Sketch.of(range(i * 10_000, i * 10_000 + 15_000)) for i in range(4)] + [Sketch.of(range(5))]
+    blobs = [p.to_bytes() for p in parts]
+    union = merge_blobs(blobs).estimate()
+    assert abs(union - 45_000) <= error_bound(45_000)
+    groups = {"all": blobs, "small": blobs[-1:], "pair": blobs[:2]}
+    vectorised = estimate_groups(groups)
+    assert vectorised["all"] == union and vectorised["small"] == 5
+    monkeypatch.setattr(sketches, "_HAS_NUMPY", False)
+    assert merge_blobs(blobs).estimate() == union
+    assert estimate_groups(groups) == vectorised
+    folded = Sketch()
+    for p in parts:
+        folded.merge(p)
+    assert folded.estimate() == union
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    query_cache.clear()
+    return Session()
+
+def _by_key(rows, attr):
+    return {getattr(r, attr) if attr != "exhibit_month" else (r.exhibit_id, r.ym): r.visitors for r in rows}
+
+def test_repository_estimates_match_exact_counts_and_rebuild():
+    s = _setup()
+    north = [repo.create_visitor(s, f"N{i}", f"n{i}@example.org", region="North") for i in range(30)]
+    south = [repo.create_visitor(s, f"S{i}", f"s{i}@example.org", region="South") for i in range(20)]
+    nowhere = repo.create_visitor(s, "X", "x@example.org")
+    romans = repo.create_exhibit(s, "Romans", None, None)
+    vikings = repo.create_exhibit(s, "Vikings", None, None)
+    # Repeat visits on several days: counts must be of distinct visitors
+    repo.record_visits_bulk(s, [
+        {"visitor_id": v.visitor_id, "exhibit_id": romans.exhibit_id, "visit_date": d}
+        for v in north for d in (date(2024, 1, 5), date(2024, 1, 20), date(2024, 2, 1))
+    ])
+    repo.record_visits_bulk(s, [{"visitor_id": v.visitor_id, "exhibit_id": vikings.exhibit_id, "visit_date": date(2024, 1, 5)} for v in south + north[:10]])
+    repo.record_visit(s, nowhere.visitor_id, vikings.exhibit_id, date(2024, 2, 1))
+    repo.record_visit(s, north[0].visitor_id, vikings.exhibit_id, date(2024, 1, 5))  # merges into an existing sketch
+    s.commit()
+
+    for exact in (False, True):
+        assert repo.unique_visitors(s, exact=exact).visitors == 51
+        assert repo.unique_visitors(s, exhibit_ids=[vikings.exhibit_id], exact=exact).visitors == 31
+        assert repo.unique_visitors(s, start=date(2024, 2, 1), exact=exact).visitors == 31
+        months = repo.unique_visitors_by_exhibit_month(s, exact=exact)
+        assert _by_key(months, "exhibit_month") == {
+            (romans.exhibit_id, "2024-01"): 30, (romans.exhibit_id, "2024-02"): 30,
+            (vikings.exhibit_id, "2024-01"): 30, (vikings.exhibit_id, "2024-02"): 1,
+        }
+        regions = repo.unique_visitors_by_region(s, exact=exact)
+        assert [(r.region, r.visitors) for r in regions] == [("North", 30), ("South", 20), (None, 1)]
+    estimate = repo.unique_visitors(s)
+    assert not estimate.exact and estimate.error == error_bound(51)
+    assert repo.unique_visitors(s, exact=True).error == 0
+
+    # Sketches only grow on deletes until rebuilt; the rebuild matches the incremental sketches otherwise
+    before = dict(s.execute(select(VisitSketch.exhibit_id, func.count()).group_by(VisitSketch.exhibit_id)).all())
+    s.execute(delete(Visit).where(Visit.exhibit_id == vikings.exhibit_id, Visit.visit_date == date(2024, 2, 1)))
+    s.commit()
+    assert repo.unique_visitors(s, exhibit_ids=[vikings.exhibit_id]).visitors == 31
+    assert repo.rebuild_visit_sketches(s) == 4
+    s.commit()
+    assert repo.unique_visitors(s, exhibit_ids=[vikings.exhibit_id]).visitors == 30
+    assert dict(s.execute(select(VisitSketch.exhibit_id, func.count()).group_by(VisitSketch.exhibit_id)).all()) == {**before, vikings.exhibit_id: 1}
+    assert [(r.region, r.visitors) for r in repo.unique_visitors_by_region(s)] == [("North", 30), ("South", 20)]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal.cache import query_cache
+from dal.snapshot import AnalyticsSnapshot
+from database.db_init import install_schema
+
+def _setup(tmp_path):
+    url = f"sqlite:///{(tmp_path / 'live.db').as_posix()}"
+    engine = create_engine(url, future=True)
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL;"))
+    install_schema(engine)
+    Session = sessionmaker(bind=engine, future=True)
+    s = Session()
+    v = repo.create_visitor(s, "Ana", "ana@example.org")
+    ex = repo.create_exhibit(s, "Romans", None, None)
+    repo.record_visit(s, v.visitor_id, ex.exhibit_id, date(2024, 1, 5))
+    s.commit()
+    query_cache.clear()
+    return url, s, v, ex
+
+def _visits(session) -> dict[str, int]:
+    return {r.title: r.visit_count for r in repo.visit_counts_by_exhibit(session)}
+
+def test_snapshot_lags_the_live_db_until_stale_or_forced(tmp_path):
+    url, live, v, ex = _setup(tmp_path)
+    snap = AnalyticsSnapshot(url, tmp_path / "snap.db", max_age=60)
+    try:
+        with snap.session() as s:
+            assert _visits(s) == {"Romans": 1}
+            with pytest.raises(OperationalError):
+                s.execute(text("DELETE FROM visits"))  # the copy is read-only
+
+        repo.record_visit(live, v.visitor_id, ex.exhibit_id, date(2024, 1, 6))
+        live.commit()
+        with snap.session() as s:
+            assert _visits(s) == {"Romans": 1}  # within max_age: still the old copy
+        assert snap.refresh() is False
+
+        assert snap.refresh(force=True) is True
+        with snap.session() as s:
+            assert _visits(s) == {"Romans": 2}
+
+        # Past max_age the next read refreshes first
+        repo.record_visit(live, v.visitor_id, ex.exhibit_id, date(2024, 1, 7))
+        live.commit()
+        old = time.time() - 120
+        os.utime(snap.path, (old, old))
+        assert snap.is_stale()
+        with snap.session() as s:
+            assert _visits(s) == {"Romans": 3}
+        assert snap.status().refreshes == 3 and snap.status().age_s < 60
+        assert not (tmp_path / "snap.db-wal").exists()
+    finally:
+        snap.close()
+
+def test_refresh_by_another_process_is_picked_up(tmp_path):
+    url, live, v, ex = _setup(tmp_path)
+    web = AnalyticsSnapshot(url, tmp_path / "snap.db", max_age=60)
+    maintenance = AnalyticsSnapshot(url, tmp_path / "snap.db", max_age=60)
+    try:
+        with web.session() as s:
+            assert _visits(s) == {"Romans": 1}
+        repo.record_visit(live, v.visitor_id, ex.exhibit_id, date(2024, 1, 6))
+        live.commit()
+        time.sleep(0.01)  # distinct mtime
+        maintenance.refresh(force=True)
+        with web.session() as s:
+            assert _visits(s) == {"Romans": 2}
+        assert web.status().refreshes == 1
+    finally:
+        web.close()
+        maintenance.close()
+
+def test_snapshot_needs_a_file_database():
+    with pytest.raises(ValueError):
+        AnalyticsSnapshot("sqlite+pysqlite:///:memory:", "unused.db")
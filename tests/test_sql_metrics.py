@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dal import repositories as repo
+from dal.instrumentation import format_report, instrument_engine, normalize_sql, redact_parameters, sql_stats
+from database.db_init import install_schema
+
+def _setup():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    install_schema(engine)
+    instrument_engine(engine)
+    instrument_engine(engine)  # idempotent
+    Session = sessionmaker(bind=engine, future=True)
+    return Session()
+
+def test_normalize_and_redact():
+    a = normalize_sql("SELECT * FROM visits WHERE visitor_id IN (1, 2, 3) AND note = 'it''s'")
+    b = normalize_sql("SELECT *  FROM visits\nWHERE visitor_id IN (?, ?) AND note = ?")
+    assert a == b == "SELECT * FROM visits WHERE visitor_id IN (?...) AND note = ?"
+    assert normalize_sql("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?...)"
+    assert normalize_sql("SELECT t1.a FROM t1") == "SELECT t1.a FROM t1"
+
+    assert redact_parameters(("alice@example.org", 5)) == "(str, int)"
+    assert redact_parameters([(1, "x"), (2, "y")], executemany=True) == "<2 rows of (int, str)>"
+
+def test_statement_timings_scopes_and_slow_log():
+    s = _setup()
+    sql_stats.reset()
+    old_slow, old_warn = sql_stats.slow_ms, sql_stats.repeat_warn
+    sql_stats.slow_ms, sql_stats.repeat_warn = 0, 3
+    try:
+        ex = repo.create_exhibit(s, "Romans", date(2024, 1, 1), None)
+        exhibit_id = ex.exhibit_id
+        s.commit()
+        with sql_stats.scope("GET /n-plus-one") as scope:
+            for _ in range(4):
+                s.get(type(ex), exhibit_id, populate_existing=True)
+        assert scope.count == 4
+        assert scope.repeated(3)[0][1] == 4
+
+        snap = sql_stats.snapshot()
+        totals = snap["scopes"]["GET /n-plus-one"]
+        assert totals["queries"] == 4 and totals["repeated_statement_scopes"] == 1
+        assert snap["executions"] >= 4
+        assert any(q["scope"] == "GET /n-plus-one" for q in snap["slow_queries"])
+        assert all("Romans" not in q["params"] for q in snap["slow_queries"])
+        assert "GET /n-plus-one" in format_report(snap)
+        # Only numeric columns sort; anything else (e.g. ?sort=buckets) falls back to total_ms
+        assert sql_stats.snapshot(sort="buckets")["statements"] == snap["statements"]
+        assert "GET /n-plus-one" in format_report(snap, sort="sql")
+    finally:
+        sql_stats.slow_ms, sql_stats.repeat_warn = old_slow, old_warn
+        sql_stats.reset()
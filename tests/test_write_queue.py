@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from dal.db import PROFILES, _create_engines
+from dal.models import Feedback, Visit
+from dal import repositories as repo
+from dal.write_queue import GroupCommitQueue, WritePending, wait_for_write
+from database.db_init import install_schema
+
+def _setup(tmp_path):
+    writer, _ = _create_engines(f"sqlite:///{(tmp_path / 'm.db').as_posix()}", PROFILES["default"], split=False)
+    install_schema(writer)
+    Session = sessionmaker(bind=writer, expire_on_commit=False, future=True)
+
+    @contextmanager
+    def factory():
+        s = Session()
+        try:
+            yield s
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+
+    with factory() as s:
+        ex = repo.create_exhibit(s, "Ex", None, None)
+        v = repo.create_visitor(s, "Gus", "gus@example.com")
+    return factory, ex.exhibit_id, v.visitor_id
+
+def test_concurrent_writes_are_grouped_and_failures_isolated(tmp_path):
+    factory, exhibit_id, visitor_id = _setup(tmp_path)
+    wq = GroupCommitQueue(session_factory=factory, max_batch=20, max_latency_ms=50)
+
+    def visit(_):
+        return wq.submit(lambda s: repo.record_visit(s, visitor_id, exhibit_id, date.today()).visit_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = list(pool.map(visit, range(40)))
+    bad = wq.submit(lambda s: repo.record_feedback(s, visitor_id, exhibit_id, rating=9).feedback_id)
+    good = wq.submit(lambda s: repo.record_feedback(s, visitor_id, exhibit_id, rating=4).feedback_id)
+
+    assert len({f.result(timeout=5) for f in futures}) == 40
+    assert good.result(timeout=5) is not None
+    try:
+        bad.result(timeout=5)
+        assert False, "Expected the out-of-range rating to fail"
+    except IntegrityError:
+        pass
+    wq.stop()
+
+    with factory() as s:
+        assert s.execute(select(func.count()).select_from(Visit)).scalar_one() == 40
+        assert s.execute(select(func.count()).select_from(Feedback)).scalar_one() == 1
+
+    m = wq.metrics()
+    assert (m.submitted, m.committed, m.failed) == (42, 41, 1)
+    assert m.batches < 42
+    assert m.max_batch_size <= 20
+
+def test_failed_session_open_fails_every_item_in_the_batch():
+    def broken_factory():
+        raise RuntimeError("database is locked")
+
+    wq = GroupCommitQueue(session_factory=broken_factory, max_batch=10, max_latency_ms=50)
+    futures = [wq.submit(lambda s: 1) for _ in range(3)]
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=5)
+    wq.stop()
+    assert (wq.metrics().committed, wq.metrics().failed) == (0, 3)
+
+def test_timed_out_writes_are_cancelled_or_reported_pending(tmp_path):
+    factory, exhibit_id, visitor_id = _setup(tmp_path)
+    wq = GroupCommitQueue(session_factory=factory, max_batch=1, max_latency_ms=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(s):
+        started.set()
+        release.wait(5)
+        return repo.record_visit(s, visitor_id, exhibit_id, date.today()).visit_id
+
+    running = wq.submit(slow)
+    assert started.wait(5)
+    queued = wq.submit(lambda s: repo.record_visit(s, visitor_id, exhibit_id, date.today()).visit_id)
+    with pytest.raises(TimeoutError):
+        wait_for_write(queued, 0.05)  # never started: cancelled, safe to retry
+    with pytest.raises(WritePending):
+        wait_for_write(running, 0.05)  # already running: it may still commit
+    release.set()
+    assert running.result(timeout=5) is not None
+    wq.stop()
+
+    with factory() as s:
+        assert s.execute(select(func.count()).select_from(Visit)).scalar_one() == 1
@@ -1,5 +1,11 @@
-import sqlite3
 import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import DB_PROFILE
+from utils.sqlite_profiles import get_profile, sqlite_pragmas
 
 DB_PATH = os.path.join(
     os.path.dirname(os.path.dirname(__file__)),
@@ -7,9 +13,127 @@ DB_PATH = os.path.join(
     "museum.db"
 )
 
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+# sqlite3 keeps this many prepared statements per connection (default is 128)
+CACHED_STATEMENTS = 512
+# Same PRAGMAs as the SQLAlchemy writer engine (foreign keys, WAL, profile tuning)
+PRAGMAS = sqlite_pragmas(get_profile(DB_PROFILE), readonly=False)
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+
+def _connect(path, pragmas=PRAGMAS):
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
+    for pragma in pragmas:
+        conn.execute(pragma)
     return conn
 
+
+def get_connection():
+    """Open a standalone connection; the caller must close it."""
+    return _connect(DB_PATH)
+
+
+class ConnectionPool:
+    """Thread-safe pool of configured sqlite3 connections.
+
+    Connections are opened lazily up to `size` and reused, so their statement
+    caches stay warm. A caller that finds the pool exhausted waits up to `timeout`.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT, pragmas=PRAGMAS):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = list(pragmas)
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)  # slot for a connection not opened yet
+        self._all = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No sqlite3 connection available after {self.timeout}s")
+        if conn is None:
+            try:
+                conn = _connect(self.path, self.pragmas)
+            except Exception:
+                self._idle.put(None)
+                raise
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            retired = conn not in self._all
+        if retired:
+            # Borrowed before close_all(), which already closed it: free the slot instead
+            self._idle.put(None)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every connection; the pool stays usable and reopens lazily."""
+        with self._lock:
+            borrowed = self.size
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                borrowed -= 1
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            for _ in range(self.size - borrowed):
+                self._idle.put(None)
+
+
+# Called with the names of the tables a pooled write changed, after it commits.
+# In-process caches register here (dal/cache.py) so this module needs no DAL import.
+_write_listeners = []
+
+
+def on_write(listener):
+    _write_listeners.append(listener)
+    return listener
+
+
+def notify_write(*tables):
+    for listener in list(_write_listeners):
+        listener(set(tables))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def pooled_connection():
+    return get_pool().connection()
@@ -1,8 +1,15 @@
 import logging
-from config import LOG_LEVEL
+from config import LOG_LEVEL, SLOW_QUERY_LOG_FILE
+
+FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
 
 def configure_logging() -> None:
     logging.basicConfig(
         level=getattr(logging, LOG_LEVEL.upper(), logging.INFO),
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        format=FORMAT,
     )
+    if SLOW_QUERY_LOG_FILE:
+        # Slow queries also go to their own file for offline review
+        handler = logging.FileHandler(SLOW_QUERY_LOG_FILE, encoding="utf-8")
+        handler.setFormatter(logging.Formatter(FORMAT))
+        logging.getLogger("dal.slow_query").addHandler(handler)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import bisect
+import threading
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+DEFAULT_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Exact percentile of a list of samples (nearest rank), for benchmark reports."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class Histogram:
+    """Fixed-bucket latency histogram: constant memory however many samples it sees.
+
+    Percentiles are estimated as the upper bound of the bucket holding the
+    requested rank (capped at the largest sample), which is accurate to one
+    bucket and plenty for spotting slow paths.
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BOUNDS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = pct / 100 * self.count
+            seen = 0
+            for i, n in enumerate(self.buckets):
+                seen += n
+                if seen >= rank and n:
+                    return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+            return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+            "buckets": {("inf" if i == len(self.bounds) else str(self.bounds[i])): n for i, n in enumerate(self.buckets) if n},
+        }
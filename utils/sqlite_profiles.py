@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from config import DB_PROFILE
+
+@dataclass(frozen=True)
+class EngineProfile:
+    cache_size_kib: int       # PRAGMA cache_size (page cache per connection)
+    mmap_size: int            # PRAGMA mmap_size in bytes (0 = off)
+    temp_store: str           # PRAGMA temp_store: DEFAULT / FILE / MEMORY
+    busy_timeout_ms: int      # PRAGMA busy_timeout
+    read_pool_size: int       # connections in the read-only pool
+    pool_pre_ping: bool
+    write_wait_s: float       # how long a writer waits for the single write connection
+
+PROFILES: dict[str, EngineProfile] = {
+    # SQLite defaults, close to the original single-engine setup
+    "default": EngineProfile(cache_size_kib=2_000, mmap_size=0, temp_store="DEFAULT", busy_timeout_ms=5_000, read_pool_size=5, pool_pre_ping=False, write_wait_s=30),
+    # Bigger page cache, memory-mapped reads and in-memory temp B-trees for report traffic
+    "performance": EngineProfile(cache_size_kib=64_000, mmap_size=256 * 1024 * 1024, temp_store="MEMORY", busy_timeout_ms=10_000, read_pool_size=8, pool_pre_ping=True, write_wait_s=30),
+    # Small hosts / CI
+    "low_memory": EngineProfile(cache_size_kib=1_000, mmap_size=0, temp_store="FILE", busy_timeout_ms=5_000, read_pool_size=2, pool_pre_ping=False, write_wait_s=30),
+}
+
+def get_profile(name: str = DB_PROFILE) -> EngineProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown DB_PROFILE '{name}' (expected one of {sorted(PROFILES)})")
+
+def sqlite_pragmas(prof: EngineProfile, readonly: bool) -> list[str]:
+    """PRAGMAs applied to every new connection (SQLAlchemy engines and utils/db_connection)."""
+    pragmas = [
+        "PRAGMA foreign_keys = ON;",  # Enable FK enforcement in SQLite
+        f"PRAGMA busy_timeout = {int(prof.busy_timeout_ms)};",
+        f"PRAGMA cache_size = -{int(prof.cache_size_kib)};",
+        f"PRAGMA mmap_size = {int(prof.mmap_size)};",
+        f"PRAGMA temp_store = {prof.temp_store};",
+    ]
+    if readonly:
+        # Reader pool: SQL-level read-only, so report/list traffic can never take the write lock
+        pragmas.append("PRAGMA query_only = ON;")
+    else:
+        pragmas += ["PRAGMA journal_mode = WAL;", "PRAGMA synchronous = NORMAL;"]
+    return pragmas
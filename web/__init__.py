@@ -11,4 +11,12 @@ def create_app() -> Flask:
     from web.routes import bp
     app.register_blueprint(bp)
 
+    from web import metrics
+    metrics.init_app(app)
+
+    from dal.snapshot import get_snapshot
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        snapshot.start()  # keep the analytics snapshot within ANALYTICS_SNAPSHOT_MAX_AGE
+
     return app
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import Flask, before_render_template, g, request, template_rendered
+
+from config import REQUEST_METRICS_ENABLED, SQL_METRICS_ENABLED
+from dal.instrumentation import instrument_engines, sql_stats
+from utils.metrics import Histogram
+from web.profiling import RequestProfiler
+
+def request_label() -> str:
+    rule = request.url_rule
+    return f"{request.method} {rule.rule}" if rule is not None else f"{request.method} <unmatched>"
+
+class _RouteTimings:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db = Histogram()
+        self.template = Histogram()
+        self.statuses: dict[int, int] = {}
+        self.bytes_total = 0
+        self.bytes_max = 0
+
+class RouteStats:
+    """Per-route latency percentiles, DB and template time, status codes and response size."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[str, _RouteTimings] = {}
+
+    def record(self, label: str, latency_ms: float, db_ms: float, template_ms: float, status: int, size: int | None) -> None:
+        with self._lock:
+            route = self._routes.setdefault(label, _RouteTimings())
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            if size is not None:
+                route.bytes_total += size
+                route.bytes_max = max(route.bytes_max, size)
+        route.latency.observe(latency_ms)
+        route.db.observe(db_ms)
+        route.template.observe(template_ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = list(self._routes.items())
+        out = {}
+        for label, r in sorted(routes):
+            latency = r.latency.snapshot()
+            latency.pop("buckets")
+            out[label] = {
+                **latency,
+                "db_ms_avg": r.db.snapshot()["avg_ms"],
+                "db_ms_p95": r.db.percentile(95),
+                "template_ms_avg": r.template.snapshot()["avg_ms"],
+                "template_ms_p95": r.template.percentile(95),
+                "statuses": {str(k): v for k, v in sorted(r.statuses.items())},
+                "bytes_avg": round(r.bytes_total / latency["count"]) if latency["count"] else 0,
+                "bytes_max": r.bytes_max,
+            }
+        return out
+
+route_stats = RouteStats()
+
+def _template_started(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def _template_finished(sender, template, context, **extra):
+    started = g.pop("template_started", None)
+    if started is not None:
+        g.template_ms = g.get("template_ms", 0.0) + (time.perf_counter() - started) * 1000
+
+def init_app(app: Flask, profiler: RequestProfiler | None = None) -> None:
+    """Time every request and SQL statement, and optionally profile sampled requests."""
+    if SQL_METRICS_ENABLED:
+        instrument_engines()
+    if not (SQL_METRICS_ENABLED or REQUEST_METRICS_ENABLED):
+        return
+    profiler = profiler or RequestProfiler()
+    if REQUEST_METRICS_ENABLED:
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+
+    @app.before_request
+    def _begin_request():
+        g.request_label = request_label()
+        g.request_started = time.perf_counter()
+        if SQL_METRICS_ENABLED:
+            g.query_scope, g.query_scope_token = sql_stats.begin_scope(g.request_label)
+        if REQUEST_METRICS_ENABLED and profiler.enabled:
+            g.profile_capture = profiler.start()
+
+    @app.after_request
+    def _timing_headers(response):
+        g.response_status = response.status_code
+        g.response_size = None if response.is_streamed else response.calculate_content_length()
+        scope = g.get("query_scope")
+        timings = []
+        if scope is not None:
+            response.headers["X-Query-Count"] = str(scope.count)
+            timings.append(f"db;dur={scope.total_ms:.1f}")
+        if "template_ms" in g:
+            timings.append(f"tpl;dur={g.template_ms:.1f}")
+        if "request_started" in g:
+            timings.append(f"app;dur={(time.perf_counter() - g.request_started) * 1000:.1f}")
+        if timings:
+            response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        started = g.pop("request_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        scope = g.pop("query_scope", None)
+        if scope is not None:
+            sql_stats.end_scope(scope, g.pop("query_scope_token"))
+        if REQUEST_METRICS_ENABLED:
+            profiler.finish(g.pop("profile_capture", None), g.request_label, elapsed_ms)
+            status = 500 if exc is not None else g.get("response_status", 500)
+            route_stats.record(g.request_label, elapsed_ms, scope.total_ms if scope else 0.0, g.get("template_ms", 0.0), status, g.get("response_size"))
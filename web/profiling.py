@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import random
+import re
+import threading
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from config import PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_MODE, PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Capture:
+    sampled: bool
+    profiler: cProfile.Profile | None = None
+    snapshot: tracemalloc.Snapshot | None = None
+
+class RequestProfiler:
+    """Opt-in profiling of a fraction of requests, or of requests slower than slow_ms.
+
+    mode is "cprofile" (saves .prof files for pstats/snakeviz) or "tracemalloc"
+    (saves the top allocation sites as text). Sampled requests are always saved.
+    With slow_ms set every request is profiled but only the slow ones are kept,
+    so the threshold is a diagnostic setting rather than something to leave on.
+    """
+
+    def __init__(self, mode: str = PROFILE_MODE, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS, out_dir: str | Path = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES, rng: random.Random | None = None):
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profile mode {mode!r}; expected 'cprofile' or 'tracemalloc'")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.out_dir = Path(out_dir)
+        self.max_files = max_files
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def start(self) -> _Capture | None:
+        sampled = self.sample_rate > 0 and self._rng.random() < self.sample_rate
+        if not sampled and self.slow_ms <= 0:
+            return None
+        capture = _Capture(sampled=sampled)
+        if self.mode == "cprofile":
+            capture.profiler = cProfile.Profile()
+            try:
+                capture.profiler.enable()
+            except ValueError:
+                return None  # another profiler is active (e.g. a concurrent request on 3.12+)
+        else:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            if sampled:
+                capture.snapshot = tracemalloc.take_snapshot()
+        return capture
+
+    def finish(self, capture: _Capture | None, label: str, elapsed_ms: float) -> Path | None:
+        if capture is None:
+            return None
+        if capture.profiler is not None:
+            capture.profiler.disable()
+        if not capture.sampled and elapsed_ms < self.slow_ms:
+            return None
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        stem = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{slug}_{elapsed_ms:.0f}ms"
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if capture.profiler is not None:
+            path = self.out_dir / f"{stem}.prof"
+            capture.profiler.dump_stats(path)
+        else:
+            path = self.out_dir / f"{stem}.tracemalloc.txt"
+            path.write_text(self._allocation_report(capture, label, elapsed_ms), encoding="utf-8")
+        logger.info("Saved %s profile of %s (%.0f ms) to %s", self.mode, label, elapsed_ms, path)
+        self._prune()
+        return path
+
+    @staticmethod
+    def _allocation_report(capture: _Capture, label: str, elapsed_ms: float, limit: int = 30) -> str:
+        after = tracemalloc.take_snapshot()
+        if capture.snapshot is not None:
+            title = "Allocation growth during the request"
+            stats = after.compare_to(capture.snapshot, "lineno")
+        else:
+            title = "Largest live allocations at the end of the request"
+            stats = after.statistics("lineno")
+        lines = [f"{label} {elapsed_ms:.1f} ms", title] + [str(s) for s in stats[:limit]]
+        return "\n".join(lines) + "\n"
+
+    def _prune(self) -> None:
+        with self._lock:
+            files = sorted(p for p in self.out_dir.iterdir() if p.is_file())
+            for old in files[:max(0, len(files) - self.max_files)]:
+                old.unlink(missing_ok=True)
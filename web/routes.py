@@ -1,14 +1,27 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+import hashlib
+import hmac
+import time
+from dataclasses import asdict
+from datetime import date, datetime, timezone
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, session, jsonify
+from markupsafe import Markup, escape
 
+from config import ANALYTICS_API_TOKEN, METRICS_TOKEN, WRITE_QUEUE_RESULT_TIMEOUT
+from dal.cache import cache_stats, lookup_cache, query_cache
 from dal.db import get_session
+from dal.instrumentation import sql_stats
+from dal.snapshot import get_snapshot, snapshot_status
 from dal import repositories as repo
+from dal.write_queue import WritePending, get_write_queue, submit_write, wait_for_write
+from integrations import exports
+from web.metrics import route_stats
 from security.auth import authenticate, AuthenticationError
+from security.passwords import PasswordPoolBusy
 from security.rbac import require_role, PermissionError as RBACPermissionError, Actor
-from business.forecasting import seasonal_naive_forecast
+from business.forecasting import TOTAL, forecast_series, holt_winters_forecast
 
 bp = Blueprint("web", __name__)
 
@@ -58,7 +71,7 @@ def login():
     if request.method == "POST":
         username = request.form.get("username","").strip()
         password = request.form.get("password","")
-        with get_session() as db:
+        with get_session("read") as db:
             try:
                 actor = authenticate(db, username, password)
                 session["username"] = actor.username
@@ -68,6 +81,9 @@ def login():
                 return redirect(nxt or url_for("web.dashboard"))
             except AuthenticationError:
                 flash("Invalid username or password", "error")
+            except PasswordPoolBusy:
+                flash("Too many sign-ins at once, please try again in a moment", "error")
+                return render_template("login.html"), 503
     return render_template("login.html")
 
 @bp.get("/logout")
@@ -76,36 +92,148 @@ def logout():
     flash("Logged out.", "success")
     return redirect(url_for("web.login"))
 
+DASHBOARD_DUE_ROWS = 10
+
 @bp.get("/dashboard")
 @login_required()
 def dashboard():
     actor = current_actor()
-    with get_session() as db:
+    with get_session("analytics") as db:
         visits_by_exhibit = repo.visit_counts_by_exhibit(db)
         avg_ratings = repo.average_rating_by_exhibit(db)
-        due_soon = repo.conservation_due_soon(db, days=30)
+        due_soon = repo.conservation_due_soon(db, days=30, limit=DASHBOARD_DUE_ROWS + 1)
+        due_by_condition = repo.conservation_due_by_condition(db, within_days=30)
         monthly = repo.monthly_visit_counts(db)
         # monthly is list of Row(ym, count) - convert to tuples
         monthly_tuples = [(row.ym, int(row.count)) for row in monthly]
-        forecast = seasonal_naive_forecast(monthly_tuples, months_ahead=3) if monthly_tuples else []
+        forecast = holt_winters_forecast(monthly_tuples, months_ahead=3)
 
     return render_template(
         "dashboard.html",
         actor=actor,
         visits_by_exhibit=visits_by_exhibit,
         avg_ratings=avg_ratings,
-        due_soon=due_soon,
+        due_soon=due_soon[:DASHBOARD_DUE_ROWS],
+        due_more=len(due_soon) > DASHBOARD_DUE_ROWS,
+        due_by_condition=due_by_condition,
         monthly=monthly_tuples,
         forecast=forecast,
+        snapshot=snapshot_status(),
     )
 
+@bp.post("/analytics/refresh")
+@role_required("admin")
+def analytics_refresh():
+    """Force a fresh analytics snapshot (admin)."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        flash("Analytics snapshot mode is off; the dashboard already reads live data.", "info")
+    else:
+        snapshot.refresh(force=True)
+        flash("Analytics snapshot refreshed.", "success")
+    return redirect(url_for("web.dashboard"))
+
+@bp.get("/forecast")
+@login_required()
+def forecast():
+    """Per-exhibit visit forecasts with prediction intervals (staffing planning)."""
+    try:
+        months = max(1, min(int(request.args.get("months", 3)), 24))
+    except ValueError:
+        months = 3
+    with get_session("analytics") as db:
+        exhibits = repo.list_exhibits(db)
+        rows = [(r.exhibit_id, r.ym, int(r.count)) for r in repo.monthly_visit_counts_by_exhibit(db)]
+    result = None
+    try:
+        result = forecast_series(rows, months_ahead=months, keys=[e.exhibit_id for e in exhibits])
+    except ValueError:
+        pass  # under 3 months of history; the page says so
+    except RuntimeError as e:
+        flash(f"Forecast unavailable: {e}", "error")
+    titles = {e.exhibit_id: e.title for e in exhibits}
+    titles[TOTAL] = "All exhibits"
+    return render_template("forecast.html", actor=current_actor(), result=result, titles=titles, months=months)
+
+def _form_intent() -> str:
+    # Form pages only need the writer connection when they are submitted
+    return "write" if request.method == "POST" else "read"
+
+def _page_limit() -> int:
+    try:
+        return int(request.args.get("limit", 50))
+    except ValueError:
+        return 50
+
 # -------------------- Artefacts --------------------
 @bp.get("/artefacts")
 @login_required()
 def artefacts():
-    with get_session() as db:
-        items = repo.list_artefacts(db)
-    return render_template("artefacts.html", actor=current_actor(), artefacts=items)
+    filters = {
+        "sort": request.args.get("sort", "id"),
+        "material": request.args.get("material", "").strip(),
+        "acquired_from": request.args.get("acquired_from", "").strip(),
+        "acquired_to": request.args.get("acquired_to", "").strip(),
+    }
+    try:
+        acquired_from = date.fromisoformat(filters["acquired_from"]) if filters["acquired_from"] else None
+        acquired_to = date.fromisoformat(filters["acquired_to"]) if filters["acquired_to"] else None
+        with get_session("read") as db:
+            page = repo.page_artefacts(
+                db,
+                after=request.args.get("after") or None,
+                limit=_page_limit(),
+                order="name" if filters["sort"] == "name" else "id",
+                material=filters["material"] or None,
+                acquired_from=acquired_from,
+                acquired_to=acquired_to,
+            )
+    except ValueError as e:
+        flash(f"Invalid filter: {e}", "error")
+        return redirect(url_for("web.artefacts"))
+    return render_template("artefacts.html", actor=current_actor(), artefacts=page.items, next_cursor=page.next_cursor, filters=filters)
+
+@bp.get("/artefacts/lookup")
+@login_required()
+def artefacts_lookup():
+    with get_session("read") as db:
+        rows = repo.lookup_artefacts(db, request.args.get("q", ""))
+    return jsonify([{"artefact_id": r.artefact_id, "name": r.name} for r in rows])
+
+# -------------------- Search --------------------
+def _highlight(snippet: str) -> Markup:
+    html = str(escape(snippet))
+    return Markup(html.replace(repo.HIGHLIGHT_START, "<mark>").replace(repo.HIGHLIGHT_END, "</mark>"))
+
+@bp.get("/search")
+@login_required()
+def search():
+    q = request.args.get("q", "").strip()
+    kind = request.args.get("kind") or None
+    try:
+        with get_session("read") as db:
+            page = repo.search_catalogue(db, q, kind=kind, after=request.args.get("after") or None, limit=_page_limit())
+    except ValueError as e:
+        flash(f"Invalid search: {e}", "error")
+        return redirect(url_for("web.search", q=q))
+    hits = [(hit, _highlight(hit.snippet)) for hit in page.items]
+    return render_template("search.html", actor=current_actor(), q=q, kind=kind, hits=hits, next_cursor=page.next_cursor)
+
+@bp.get("/search.json")
+@login_required()
+def search_json():
+    try:
+        with get_session("read") as db:
+            page = repo.search_catalogue(db, request.args.get("q", ""), kind=request.args.get("kind") or None, after=request.args.get("after") or None, limit=_page_limit())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "items": [
+            {"kind": h.kind, "id": h.id, "title": h.title, "snippet_html": str(_highlight(h.snippet)), "rank": h.rank}
+            for h in page.items
+        ],
+        "next_cursor": page.next_cursor,
+    })
 
 @bp.route("/artefacts/new", methods=["GET","POST"])
 @role_required("admin","curator")
@@ -133,9 +261,21 @@ def artefact_new():
 @bp.get("/exhibits")
 @login_required()
 def exhibits():
-    with get_session() as db:
-        items = repo.list_exhibits(db)
-    return render_template("exhibits.html", actor=current_actor(), exhibits=items)
+    sort = "title" if request.args.get("sort") == "title" else "id"
+    try:
+        with get_session("read") as db:
+            page = repo.page_exhibits(db, after=request.args.get("after") or None, limit=_page_limit(), order=sort)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("web.exhibits"))
+    return render_template("exhibits.html", actor=current_actor(), exhibits=page.items, next_cursor=page.next_cursor, sort=sort)
+
+@bp.get("/exhibits/lookup")
+@login_required()
+def exhibits_lookup():
+    with get_session("read") as db:
+        rows = repo.lookup_exhibits(db, request.args.get("q", ""))
+    return jsonify([{"exhibit_id": r.exhibit_id, "title": r.title} for r in rows])
 
 @bp.route("/exhibits/new", methods=["GET","POST"])
 @role_required("admin","curator")
@@ -162,23 +302,22 @@ def exhibit_new():
 @bp.route("/exhibits/link-artefact", methods=["GET","POST"])
 @role_required("admin","curator")
 def exhibit_link_artefact():
-    with get_session() as db:
-        exhibits = repo.list_exhibits(db)
-        artefacts = repo.list_artefacts(db)
-        if request.method == "POST":
-            exhibit_id = int(request.form.get("exhibit_id"))
-            artefact_id = int(request.form.get("artefact_id"))
+    # Exhibit and artefact are chosen with search-driven pickers (see /exhibits/lookup, /artefacts/lookup)
+    if request.method == "POST":
+        exhibit_id = int(request.form.get("exhibit_id"))
+        artefact_id = int(request.form.get("artefact_id"))
+        with get_session() as db:
             repo.link_artefact_to_exhibit(db, exhibit_id=exhibit_id, artefact_id=artefact_id)
-            flash("Linked artefact to exhibit.", "success")
-            return redirect(url_for("web.exhibits"))
-    return render_template("exhibit_link_artefact.html", actor=current_actor(), exhibits=exhibits, artefacts=artefacts)
+        flash("Linked artefact to exhibit.", "success")
+        return redirect(url_for("web.exhibits"))
+    return render_template("exhibit_link_artefact.html", actor=current_actor())
 
 # -------------------- Visitors / Visits / Tickets / Feedback --------------------
 @bp.get("/visitors")
 @login_required()
 def visitors():
     # simple list based on visits/top visitors
-    with get_session() as db:
+    with get_session("read") as db:
         top = repo.top_visitors(db, limit=25)
     return render_template("visitors.html", actor=current_actor(), top_visitors=top)
 
@@ -204,68 +343,89 @@ def visitor_new():
         return redirect(url_for("web.visitors"))
     return render_template("visitor_new.html", actor=current_actor())
 
+@bp.get("/visitors/lookup")
+@role_required("admin","front_desk","curator")
+def visitors_lookup():
+    """Typeahead for the visit, ticket and feedback forms: id, name or email prefix."""
+    with get_session("read") as db:
+        rows = repo.lookup_visitors(db, request.args.get("q", ""))
+    return jsonify([{"visitor_id": r.visitor_id, "full_name": r.full_name, "email": r.email, "label": f"{r.full_name} <{r.email}>"} for r in rows])
+
+def _queued_write(op):
+    # Front-desk writes go through the group-commit queue; wait for this item's outcome
+    return wait_for_write(submit_write(op), WRITE_QUEUE_RESULT_TIMEOUT)
+
+def _write_pending(what):
+    # Not a failure: the write may still commit, so a retry could store it twice
+    flash(f"{what} is still being saved. Check the dashboard before recording it again.", "info")
+    return redirect(url_for("web.dashboard"))
+
 @bp.route("/visits/record", methods=["GET","POST"])
 @role_required("admin","front_desk")
 def visit_record():
-    with get_session() as db:
+    # For picking visitor, we can accept visitor_id directly (simple) or email
+    if request.method == "POST":
+        visitor_id = int(request.form.get("visitor_id"))
+        exhibit_id = int(request.form.get("exhibit_id"))
+        visit_date = request.form.get("visit_date","").strip()
+        try:
+            vd = date.fromisoformat(visit_date) if visit_date else date.today()
+            _queued_write(lambda db: repo.record_visit(db, visitor_id=visitor_id, exhibit_id=exhibit_id, visit_date=vd).visit_id)
+            flash("Visit recorded.", "success")
+            return redirect(url_for("web.dashboard"))
+        except WritePending:
+            return _write_pending("Visit")
+        except Exception as e:
+            flash(f"Could not record visit: {e}", "error")
+    with get_session("read") as db:
         exhibits = repo.list_exhibits(db)
-        # For picking visitor, we can accept visitor_id directly (simple) or email
-        if request.method == "POST":
-            visitor_id = int(request.form.get("visitor_id"))
-            exhibit_id = int(request.form.get("exhibit_id"))
-            visit_date = request.form.get("visit_date","").strip()
-            try:
-                vd = date.fromisoformat(visit_date) if visit_date else date.today()
-                repo.record_visit(db, visitor_id=visitor_id, exhibit_id=exhibit_id, visit_date=vd)
-                flash("Visit recorded.", "success")
-                return redirect(url_for("web.dashboard"))
-            except Exception as e:
-                flash(f"Could not record visit: {e}", "error")
     return render_template("visit_record.html", actor=current_actor(), exhibits=exhibits)
 
 @bp.route("/tickets/record", methods=["GET","POST"])
 @role_required("admin","front_desk")
 def ticket_record():
-    with get_session() as db:
-        if request.method == "POST":
-            visitor_id = int(request.form.get("visitor_id"))
-            ticket_type = request.form.get("ticket_type","").strip() or "standard"
-            price = request.form.get("price","").strip()
-            purchase_date = request.form.get("purchase_date","").strip()
-            try:
-                pr = float(price)
-                pd = date.fromisoformat(purchase_date) if purchase_date else date.today()
-                repo.record_ticket_purchase(db, visitor_id=visitor_id, ticket_type=ticket_type, price=pr, purchase_date=pd)
-                flash("Ticket purchase recorded.", "success")
-                return redirect(url_for("web.dashboard"))
-            except Exception as e:
-                flash(f"Could not record ticket: {e}", "error")
+    if request.method == "POST":
+        visitor_id = int(request.form.get("visitor_id"))
+        ticket_type = request.form.get("ticket_type","").strip() or "standard"
+        price = request.form.get("price","").strip()
+        purchase_date = request.form.get("purchase_date","").strip()
+        try:
+            pr = float(price)
+            pd = date.fromisoformat(purchase_date) if purchase_date else date.today()
+            _queued_write(lambda db: repo.record_ticket_purchase(db, visitor_id=visitor_id, ticket_type=ticket_type, price=pr, purchase_date=pd).purchase_id)
+            flash("Ticket purchase recorded.", "success")
+            return redirect(url_for("web.dashboard"))
+        except WritePending:
+            return _write_pending("Ticket purchase")
+        except Exception as e:
+            flash(f"Could not record ticket: {e}", "error")
     return render_template("ticket_record.html", actor=current_actor())
 
 @bp.route("/feedback/record", methods=["GET","POST"])
 @role_required("admin","front_desk","curator")
 def feedback_record():
-    with get_session() as db:
+    if request.method == "POST":
+        visitor_id = int(request.form.get("visitor_id"))
+        exhibit_id = int(request.form.get("exhibit_id"))
+        rating = int(request.form.get("rating"))
+        comments = request.form.get("comments","").strip() or None
+        try:
+            _queued_write(lambda db: repo.record_feedback(db, visitor_id=visitor_id, exhibit_id=exhibit_id, rating=rating, comments=comments).feedback_id)
+            flash("Feedback recorded.", "success")
+            return redirect(url_for("web.dashboard"))
+        except WritePending:
+            return _write_pending("Feedback")
+        except Exception as e:
+            flash(f"Could not record feedback: {e}", "error")
+    with get_session("read") as db:
         exhibits = repo.list_exhibits(db)
-        if request.method == "POST":
-            visitor_id = int(request.form.get("visitor_id"))
-            exhibit_id = int(request.form.get("exhibit_id"))
-            rating = int(request.form.get("rating"))
-            comments = request.form.get("comments","").strip() or None
-            try:
-                repo.record_feedback(db, visitor_id=visitor_id, exhibit_id=exhibit_id, rating=rating, comments=comments)
-                flash("Feedback recorded.", "success")
-                return redirect(url_for("web.dashboard"))
-            except Exception as e:
-                flash(f"Could not record feedback: {e}", "error")
     return render_template("feedback_record.html", actor=current_actor(), exhibits=exhibits)
 
 # -------------------- Conservation --------------------
 @bp.route("/conservation/new", methods=["GET","POST"])
 @role_required("admin","curator")
 def conservation_new():
-    with get_session() as db:
-        artefacts = repo.list_artefacts(db)
+    with get_session(_form_intent()) as db:
         if request.method == "POST":
             artefact_id = int(request.form.get("artefact_id"))
             condition = request.form.get("condition","").strip()
@@ -273,11 +433,209 @@ def conservation_new():
             due_date = request.form.get("due_date","").strip()
             notes = request.form.get("notes","").strip() or None
             conservator = request.form.get("conservator","").strip() or None
+            if conservator:
+                # conservation_records has no conservator column; keep the name with the notes
+                notes = f"Conservator: {conservator}" + (f"\n{notes}" if notes else "")
             try:
                 dd = date.fromisoformat(due_date) if due_date else None
-                repo.add_conservation_record(db, artefact_id=artefact_id, condition=condition, treatment=treatment, due_date=dd, notes=notes, conservator=conservator)
+                repo.add_conservation_record(db, artefact_id=artefact_id, condition=condition, treatment=treatment, due_date=dd, notes=notes)
                 flash("Conservation record added.", "success")
                 return redirect(url_for("web.dashboard"))
             except Exception as e:
                 flash(f"Could not add conservation record: {e}", "error")
-    return render_template("conservation_new.html", actor=current_actor(), artefacts=artefacts)
+    return render_template("conservation_new.html", actor=current_actor())
+
+@bp.get("/conservation/due")
+@login_required()
+def conservation_due():
+    filters = {
+        "days": request.args.get("days", "30").strip(),
+        "condition": request.args.get("condition", "").strip(),
+    }
+    try:
+        within_days = max(0, min(int(filters["days"]), 3650))
+        with get_session("read") as db:
+            page = repo.page_conservation_due(
+                db,
+                within_days=within_days,
+                condition=filters["condition"] or None,
+                after=request.args.get("after") or None,
+                limit=_page_limit(),
+            )
+            by_condition = repo.conservation_due_by_condition(db, within_days=within_days)
+    except ValueError as e:
+        flash(f"Invalid filter: {e}", "error")
+        return redirect(url_for("web.conservation_due"))
+    return render_template("conservation_due.html", actor=current_actor(), rows=page.items, next_cursor=page.next_cursor, by_condition=by_condition, filters=filters)
+
+# -------------------- Exports --------------------
+@bp.get("/exports")
+@role_required("admin")
+def exports_page():
+    with get_session("read") as db:
+        exhibits = repo.list_exhibits(db)
+    return render_template("exports.html", actor=current_actor(), kinds=sorted(repo.EXPORTS), formats=sorted(exports.FORMATS), exhibits=exhibits)
+
+@bp.get("/exports/<kind>")
+@role_required("admin")
+def export_download(kind: str):
+    """Stream a CSV/JSONL extract; rows are read and encoded batch by batch as the client downloads."""
+    fmt = request.args.get("format", "csv")
+    compress = request.args.get("gzip") == "1"
+    try:
+        start = date.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = date.fromisoformat(request.args["end"]) if request.args.get("end") else None
+        exhibit_id = int(request.args["exhibit_id"]) if request.args.get("exhibit_id") else None
+        chunks = exports.stream_export(kind, fmt, start=start, end=end, exhibit_id=exhibit_id, compress=compress)
+    except ValueError as e:
+        flash(f"Invalid export: {e}", "error")
+        return redirect(url_for("web.exports_page"))
+    filename = exports.export_filename(kind, fmt, compress)
+    return Response(
+        chunks,
+        mimetype="application/gzip" if compress else exports.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# -------------------- Analytics API --------------------
+def _api_allowed() -> bool:
+    if current_actor():
+        return True
+    auth = request.headers.get("Authorization", "")
+    return bool(ANALYTICS_API_TOKEN) and hmac.compare_digest(auth, f"Bearer {ANALYTICS_API_TOKEN}")
+
+def _api_int(name: str, default: int, low: int, high: int) -> int:
+    value = int(request.args.get(name, default))
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+def _api_dates() -> tuple[date | None, date | None]:
+    start = date.fromisoformat(request.args["start"]) if request.args.get("start") else None
+    end = date.fromisoformat(request.args["end"]) if request.args.get("end") else None
+    return start, end
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+def _api_visits_by_exhibit():
+    start, end = _api_dates()
+    return lambda db: [{"exhibit_id": r.exhibit_id, "title": r.title, "visits": int(r.visit_count)} for r in repo.visit_counts_by_exhibit(db, start, end)]
+
+def _api_top_visitors():
+    limit = _api_int("limit", 5, 1, 100)
+    # No email: the token is shared by kiosks and BI tools, which only need the ranking
+    return lambda db: [{"visitor_id": r.visitor_id, "full_name": r.full_name, "visits": r.visits} for r in repo.top_visitors(db, limit)]
+
+def _api_ratings():
+    return lambda db: [{"exhibit_id": r.exhibit_id, "title": r.title, "avg_rating": round(float(r.avg_rating), 2), "num_feedback": r.num_feedback} for r in repo.average_rating_by_exhibit(db)]
+
+def _api_conservation_due():
+    within_days = _api_int("within_days", 30, 0, 3650)
+    limit = _api_int("limit", 100, 1, 1000)
+    return lambda db: [{k: _iso(v) for k, v in r._asdict().items()} for r in repo.conservation_due_soon(db, within_days=within_days, limit=limit)]
+
+def _api_monthly_visits():
+    start, end = _api_dates()
+    return lambda db: [{"ym": r.ym, "visits": int(r.count)} for r in repo.monthly_visit_counts(db, start, end)]
+
+def _api_forecast():
+    months = _api_int("months", 3, 1, 24)
+    def build(db):
+        monthly = [(r.ym, int(r.count)) for r in repo.monthly_visit_counts(db)]
+        return [asdict(fp) for fp in holt_winters_forecast(monthly, months_ahead=months)]
+    return build
+
+# name -> parses the query string (ValueError on bad input) and returns a builder run against the session
+ANALYTICS_API = {
+    "visits-by-exhibit": _api_visits_by_exhibit,
+    "top-visitors": _api_top_visitors,
+    "ratings": _api_ratings,
+    "conservation-due": _api_conservation_due,
+    "monthly-visits": _api_monthly_visits,
+    "forecast": _api_forecast,
+}
+
+def analytics_version() -> tuple[str, datetime]:
+    """(ETag, Last-Modified) of the data the analytics API would return now.
+
+    In snapshot mode this is the snapshot's mtime. Otherwise it is the query
+    cache generation, bumped by every write committed in this process; writes
+    from other processes (CLI, imports) show up when the current QUERY_CACHE_TTL
+    window ends, as they do for cached results. Today's date is included
+    because due dates and forecasts move with it.
+    """
+    today = date.today().isoformat()
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        changed = snapshot.version()
+        token = ("snapshot", changed, today)
+    else:
+        ttl = max(query_cache.ttl, 1.0)
+        window = ttl * (time.time() // ttl)
+        changed = max(query_cache.changed_at, window)
+        token = ("live", query_cache.generation, query_cache.changed_at, window, today)
+    etag = hashlib.sha1(repr(token).encode()).hexdigest()[:20]
+    return etag, datetime.fromtimestamp(int(changed), timezone.utc)
+
+def _settled(modified: datetime) -> bool:
+    # Last-Modified has whole-second resolution. Until the change's second is over,
+    # another write can land in it with the same date, so only the ETag is exact.
+    return modified < datetime.now(timezone.utc).replace(microsecond=0)
+
+def _not_modified(etag: str, modified: datetime) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)  # If-Modified-Since is ignored when both are sent
+    return request.if_modified_since is not None and _settled(modified) and modified <= request.if_modified_since
+
+@bp.get("/api/analytics/<name>")
+def analytics_api(name: str):
+    """Dashboard analytics as JSON with ETag / Last-Modified; unchanged data is a 304 with no queries run."""
+    if not _api_allowed():
+        return jsonify({"error": "forbidden"}), 403
+    if name not in ANALYTICS_API:
+        return jsonify({"error": f"unknown analytics '{name}'", "available": sorted(ANALYTICS_API)}), 404
+    try:
+        build = ANALYTICS_API[name]()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    etag, modified = analytics_version()
+    if _not_modified(etag, modified):
+        resp = Response(status=304)
+    else:
+        with get_session("analytics") as db:
+            resp = jsonify({"name": name, "as_of": modified.isoformat(), "rows": build(db)})
+    resp.set_etag(etag)
+    if _settled(modified):
+        resp.last_modified = modified  # never handed out for a second that can still change
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True  # always revalidate; a 304 costs no queries
+    return resp
+
+# -------------------- Metrics --------------------
+def _metrics_allowed() -> bool:
+    actor = current_actor()
+    if actor and actor.role == "admin":
+        return True
+    auth = request.headers.get("Authorization", "")
+    return bool(METRICS_TOKEN) and hmac.compare_digest(auth, f"Bearer {METRICS_TOKEN}")
+
+@bp.get("/metrics")
+def metrics():
+    """Route latencies, SQL timings, query counts, cache and write-queue stats (admins or METRICS_TOKEN)."""
+    if not _metrics_allowed():
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        top = max(1, min(int(request.args.get("top", 25)), 500))
+    except ValueError:
+        top = 25
+    cache = cache_stats()
+    lookups = cache_stats(lookup_cache)
+    return jsonify({
+        "routes": route_stats.snapshot(),
+        "sql": sql_stats.snapshot(top=top, sort=request.args.get("sort", "total_ms")),
+        "query_cache": {**asdict(cache), "hit_ratio": round(cache.hit_ratio, 4)},
+        "lookup_cache": {**asdict(lookups), "hit_ratio": round(lookups.hit_ratio, 4)},
+        "write_queue": asdict(get_write_queue().metrics()),
+        "analytics_snapshot": asdict(snapshot_status()),
+    })